@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from apps.common.admin import EstimatedCountPaginator, PerformanceModelAdmin
 from .models import User, Profile
 from django.utils.translation import gettext_lazy as _
 
 
 class UserAdmin(BaseUserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     # Fields shown in the admin list view
     list_display = ('email', 'username', 'first_name', 'last_name', 'user_type', 'is_verified', 'is_staff')
     list_filter = ('user_type', 'is_verified', 'is_staff', 'is_superuser')
@@ -29,10 +33,12 @@ class UserAdmin(BaseUserAdmin):
     ordering = ('email',)
 
 
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(PerformanceModelAdmin):
     list_display = ('user', 'city', 'state', 'country', 'postal_code')
     search_fields = ('user__email', 'user__username', 'city', 'state', 'country')
     list_filter = ('country', 'state')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
 
 
 # Register the customized User admin and Profile admin
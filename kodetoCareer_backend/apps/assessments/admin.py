@@ -1,12 +1,18 @@
 from django.contrib import admin
+from apps.common.admin import PerformanceModelAdmin
 from .models import (
     Assessment,
+    QuestionBank,
+    PaperRule,
     Question,
     QuestionOption,
+    AcceptedAnswer,
     StudentAssessment,
     StudentAnswer,
     CourseNote,
 )
+from .grading import regrade_attempts
+from .regrade import regrade_assessment
 
 # Inline for QuestionOption within Question
 class QuestionOptionInline(admin.TabularInline):
@@ -14,6 +20,18 @@ class QuestionOptionInline(admin.TabularInline):
     extra = 2
 
 
+# Inline for AcceptedAnswer within Question (short answer auto-grading key)
+class AcceptedAnswerInline(admin.TabularInline):
+    model = AcceptedAnswer
+    extra = 1
+
+
+# Inline for PaperRule within Assessment (randomized papers drawn from question banks)
+class PaperRuleInline(admin.TabularInline):
+    model = PaperRule
+    extra = 1
+
+
 # Inline for Questions within Assessment
 class QuestionInline(admin.StackedInline):
     model = Question
@@ -27,42 +45,100 @@ class AssessmentAdmin(admin.ModelAdmin):
     list_display = ('title', 'course', 'assessment_type', 'total_marks', 'is_published', 'due_date')
     list_filter = ('assessment_type', 'is_published', 'course')
     search_fields = ('title', 'description', 'course__title')
-    inlines = [QuestionInline]
+    list_select_related = ('course',)
+    autocomplete_fields = ('course',)
+    inlines = [QuestionInline, PaperRuleInline]
+    actions = ['preview_regrade', 'regrade_answer_key']
+    
+    def _report_regrade(self, request, queryset, dry_run):
+        for assessment in queryset:
+            report = regrade_assessment(assessment.id, dry_run=dry_run)
+            prefix = "[Dry run] " if dry_run else ""
+            self.message_user(
+                request,
+                f"{prefix}{assessment.title}: {report['answers_changed']} answers "
+                f"({report['answers_now_correct']} now correct, {report['answers_now_incorrect']} now incorrect), "
+                f"{report['attempts_changed']} attempt totals, marks delta {report['marks_delta']}."
+            )
+    
+    def preview_regrade(self, request, queryset):
+        self._report_regrade(request, queryset, dry_run=True)
+    preview_regrade.short_description = "Preview regrade against current answer key (dry run)"
+    
+    def regrade_answer_key(self, request, queryset):
+        self._report_regrade(request, queryset, dry_run=False)
+    regrade_answer_key.short_description = "Regrade selected assessments against current answer key"
+
+
+@admin.register(QuestionBank)
+class QuestionBankAdmin(admin.ModelAdmin):
+    list_display = ('title', 'course', 'created_at', 'updated_at')
+    list_filter = ('course',)
+    search_fields = ('title', 'description', 'course__title')
+    list_select_related = ('course',)
+    autocomplete_fields = ('course',)
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('question_text', 'assessment', 'question_type', 'marks', 'order')
-    list_filter = ('question_type', 'assessment__title')
+class QuestionAdmin(PerformanceModelAdmin):
+    list_display = ('question_text', 'assessment', 'bank', 'topic', 'difficulty', 'question_type', 'marks', 'order')
+    list_filter = ('question_type', 'difficulty', 'bank', 'assessment__title')
     search_fields = ('question_text',)
-    inlines = [QuestionOptionInline]
+    list_select_related = ('assessment__course', 'bank__course')
+    autocomplete_fields = ('assessment', 'bank')
+    inlines = [QuestionOptionInline, AcceptedAnswerInline]
 
 
 @admin.register(QuestionOption)
-class QuestionOptionAdmin(admin.ModelAdmin):
+class QuestionOptionAdmin(PerformanceModelAdmin):
     list_display = ('option_text', 'question', 'is_correct', 'order')
     list_filter = ('is_correct',)
     search_fields = ('option_text', 'question__question_text')
+    list_select_related = ('question',)
+    autocomplete_fields = ('question',)
+
+
+@admin.register(AcceptedAnswer)
+class AcceptedAnswerAdmin(PerformanceModelAdmin):
+    list_display = ('answer_text', 'question', 'match_type', 'numeric_tolerance', 'max_edit_distance')
+    list_filter = ('match_type',)
+    search_fields = ('answer_text', 'question__question_text')
+    list_select_related = ('question',)
+    autocomplete_fields = ('question',)
 
 
 @admin.register(StudentAssessment)
-class StudentAssessmentAdmin(admin.ModelAdmin):
+class StudentAssessmentAdmin(PerformanceModelAdmin):
     list_display = (
         'student', 'assessment', 'attempt_number', 'status',
         'obtained_marks', 'started_at', 'submitted_at'
     )
     list_filter = ('status', 'assessment__title')
     search_fields = ('student__email', 'assessment__title')
+    list_select_related = ('student', 'assessment')
+    autocomplete_fields = ('student', 'assessment')
+    actions = ['regrade_selected']
+    
+    def regrade_selected(self, request, queryset):
+        summary = regrade_attempts(queryset)
+        self.message_user(
+            request,
+            f"{summary['attempts']} attempts regraded, "
+            f"{summary['answers_changed']} answers and {summary['attempts_changed']} totals changed."
+        )
+    regrade_selected.short_description = "Re-run auto-grading for selected attempts"
 
 
 @admin.register(StudentAnswer)
-class StudentAnswerAdmin(admin.ModelAdmin):
+class StudentAnswerAdmin(PerformanceModelAdmin):
     list_display = (
         'student_assessment', 'question', 'selected_option',
         'is_correct', 'marks_awarded'
     )
     list_filter = ('is_correct', 'question__assessment__title')
     search_fields = ('student_assessment__student__email', 'question__question_text')
+    list_select_related = ('student_assessment__student', 'student_assessment__assessment', 'question', 'selected_option__question')
+    autocomplete_fields = ('student_assessment', 'question', 'selected_option')
 
 
 @admin.register(CourseNote)
@@ -70,5 +146,7 @@ class CourseNoteAdmin(admin.ModelAdmin):
     list_display = ('title', 'course', 'uploaded_by', 'file_size', 'is_active', 'download_count', 'created_at')
     list_filter = ('is_active', 'course')
     search_fields = ('title', 'course__title', 'uploaded_by__username', 'uploaded_by__email')
+    list_select_related = ('course', 'uploaded_by')
+    autocomplete_fields = ('course', 'uploaded_by')
     readonly_fields = ('download_count', 'created_at', 'updated_at')
 
@@ -0,0 +1,203 @@
+# apps/assessments/analytics.py
+import numpy as np
+from django.core.cache import cache
+
+from .models import Question, QuestionOption, StudentAssessment, StudentAnswer
+from .papers import assessment_question_filter
+
+ITEM_ANALYSIS_CACHE_TIMEOUT = 60 * 60 * 24
+ANSWER_CHUNK_SIZE = 10000
+COMPLETED_STATUSES = ('submitted', 'graded')
+
+
+def item_analysis_cache_key(assessment_id):
+    return f"assessments:item_analysis:{assessment_id}"
+
+
+def invalidate_item_analysis(assessment_id):
+    """Drop the cached report once new submissions or regrades land"""
+    cache.delete(item_analysis_cache_key(assessment_id))
+
+
+def get_item_analysis(assessment):
+    """Return the cached item analysis report, building it on a miss"""
+    key = item_analysis_cache_key(assessment.id)
+    report = cache.get(key)
+    if report is None:
+        report = build_item_analysis(assessment)
+        cache.set(key, report, ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return report
+
+
+def _rounded(value, digits=4):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _per_item(columns, weights, n_questions):
+    return np.bincount(columns, weights=weights, minlength=n_questions)
+
+
+def build_item_analysis(assessment):
+    """
+    Classical test theory statistics per question: difficulty (p-value),
+    corrected point-biserial discrimination, option distribution and average
+    time. Each question is measured only over the attempts it was served to
+    (its drawn paper, or the fixed list), so questions drawn from a bank are
+    not marked wrong by attempts that never saw them. Answers are loaded
+    once into sparse (attempt, question) pairs, one per served question.
+    """
+    question_filter = assessment_question_filter(assessment)
+    questions = list(
+        Question.objects.filter(question_filter).order_by('order', 'id')
+        .values('id', 'assessment_id', 'question_text', 'question_type', 'marks')
+    )
+    options = list(
+        QuestionOption.objects.filter(question__in=Question.objects.filter(question_filter))
+        .order_by('question_id', 'order', 'id')
+        .values('id', 'question_id', 'option_text', 'is_correct')
+    )
+    n_questions = len(questions)
+    question_column = {question['id']: column for column, question in enumerate(questions)}
+    option_position = {option['id']: position for position, option in enumerate(options)}
+    fixed_columns = np.asarray(
+        [column for column, question in enumerate(questions) if question['assessment_id'] == assessment.id],
+        dtype=np.int64,
+    )
+
+    attempt_ids, offered_rows, offered_columns = [], [], []
+    attempts = (
+        StudentAssessment.objects.filter(assessment=assessment, status__in=COMPLETED_STATUSES)
+        .order_by('id').values_list('id', 'paper').iterator(chunk_size=ANSWER_CHUNK_SIZE)
+    )
+    for row, (attempt_id, paper) in enumerate(attempts):
+        attempt_ids.append(attempt_id)
+        if paper:
+            drawn = [question_column[question_id] for question_id in paper if question_id in question_column]
+            served = np.asarray(drawn, dtype=np.int64)
+        else:
+            served = fixed_columns
+        offered_rows.append(np.full(len(served), row, dtype=np.int64))
+        offered_columns.append(served)
+    attempt_ids = np.asarray(attempt_ids, dtype=np.int64)
+    n_attempts = len(attempt_ids)
+
+    rows, columns, correct_flags, marks, times, chosen = [], [], [], [], [], []
+    answers = StudentAnswer.objects.filter(
+        student_assessment__assessment=assessment,
+        student_assessment__status__in=COMPLETED_STATUSES,
+    ).values_list(
+        'student_assessment_id', 'question_id', 'selected_option_id',
+        'is_correct', 'marks_awarded', 'time_spent_seconds',
+    ).iterator(chunk_size=ANSWER_CHUNK_SIZE)
+
+    for attempt_id, question_id, option_id, is_correct, marks_awarded, time_spent in answers:
+        column = question_column.get(question_id)
+        if column is None:
+            continue
+        rows.append(attempt_id)
+        columns.append(column)
+        correct_flags.append(is_correct)
+        marks.append(marks_awarded)
+        times.append(np.nan if time_spent is None else time_spent)
+        chosen.append(option_position.get(option_id, -1))
+
+    # Map attempt ids to matrix rows, dropping answers of attempts submitted mid-build
+    answer_attempts = np.asarray(rows, dtype=np.int64)
+    rows = np.searchsorted(attempt_ids, answer_attempts)
+    known = rows < n_attempts
+    known[known] = attempt_ids[rows[known]] == answer_attempts[known]
+
+    rows = rows[known]
+    columns = np.asarray(columns, dtype=np.int64)[known]
+    times = np.asarray(times, dtype=np.float64)[known]
+    chosen = np.asarray(chosen, dtype=np.int64)[known]
+
+    # One key per served (attempt, question) pair; an answer counts as served even if the paper changed since
+    width = max(n_questions, 1)
+    answer_keys = rows * width + columns
+    offered_keys = np.concatenate(offered_rows + [np.empty(0, dtype=np.int64)]) * width + np.concatenate(
+        offered_columns + [np.empty(0, dtype=np.int64)]
+    )
+    pair_keys = np.union1d(offered_keys, answer_keys)
+    pair_rows, pair_columns = pair_keys // width, pair_keys % width
+    answered = np.searchsorted(pair_keys, answer_keys)
+
+    correct = np.zeros(len(pair_keys), dtype=np.float64)
+    scores = np.zeros(len(pair_keys), dtype=np.float64)
+    correct[answered] = np.asarray(correct_flags, dtype=np.float64)[known]
+    scores[answered] = np.asarray(marks, dtype=np.float64)[known]
+    response_counts = np.bincount(columns, minlength=n_questions)
+    offered_counts = np.bincount(pair_columns, minlength=n_questions)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        offered = np.where(offered_counts > 0, offered_counts, np.nan)
+        p_values = _per_item(pair_columns, correct, n_questions) / offered
+        average_marks = _per_item(pair_columns, scores, n_questions) / offered
+
+        # Correlate each item with the total score excluding that item, over the attempts served it
+        rest_scores = np.bincount(pair_rows, weights=scores, minlength=n_attempts)[pair_rows] - scores
+        item_dev = correct - p_values[pair_columns]
+        rest_dev = rest_scores - (_per_item(pair_columns, rest_scores, n_questions) / offered)[pair_columns]
+        denominator = np.sqrt(
+            _per_item(pair_columns, item_dev ** 2, n_questions) * _per_item(pair_columns, rest_dev ** 2, n_questions)
+        )
+        discrimination = np.where(
+            denominator > 0, _per_item(pair_columns, item_dev * rest_dev, n_questions) / denominator, np.nan
+        )
+
+    timed = ~np.isnan(times)
+    time_totals = np.bincount(columns[timed], weights=times[timed], minlength=n_questions)
+    time_counts = np.bincount(columns[timed], minlength=n_questions)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_times = np.where(time_counts > 0, time_totals / time_counts, np.nan)
+
+    option_counts = np.bincount(chosen[chosen >= 0], minlength=len(options))
+
+    options_by_question = {}
+    for position, option in enumerate(options):
+        options_by_question.setdefault(option['question_id'], []).append((position, option))
+
+    items = []
+    for column, question in enumerate(questions):
+        responses = int(response_counts[column])
+        distribution = [
+            {
+                'option_id': option['id'],
+                'option_text': option['option_text'],
+                'is_correct': option['is_correct'],
+                'count': int(option_counts[position]),
+                'proportion': round(int(option_counts[position]) / responses, 4) if responses else 0,
+            }
+            for position, option in options_by_question.get(question['id'], [])
+        ]
+
+        flags = []
+        if not np.isnan(discrimination[column]) and discrimination[column] < 0:
+            flags.append('negative_discrimination')
+        correct_picks = [choice['count'] for choice in distribution if choice['is_correct']]
+        distractor_picks = [choice['count'] for choice in distribution if not choice['is_correct']]
+        if correct_picks and distractor_picks and max(distractor_picks) > max(correct_picks):
+            flags.append('distractor_outdraws_key')
+
+        items.append({
+            'question_id': question['id'],
+            'question_text': question['question_text'],
+            'question_type': question['question_type'],
+            'marks': question['marks'],
+            'offered': int(offered_counts[column]),
+            'responses': responses,
+            'omitted': int(offered_counts[column]) - responses,
+            'p_value': _rounded(p_values[column]),
+            'discrimination': _rounded(discrimination[column]),
+            'average_marks': _rounded(average_marks[column]),
+            'average_time_seconds': _rounded(average_times[column], 1),
+            'options': distribution,
+            'flags': flags,
+        })
+
+    return {
+        'assessment_id': assessment.id,
+        'attempts_analyzed': n_attempts,
+        'items': items,
+    }
@@ -0,0 +1,93 @@
+# apps/assessments/deadlines.py
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .analytics import invalidate_item_analysis
+from .grading import ATTEMPT_CLOSE_FIELDS, compile_questions, prepare_attempt_close
+from .models import Question, StudentAssessment, StudentAnswer
+
+
+def _invalidate_reports(assessment_ids):
+    for assessment_id in assessment_ids:
+        invalidate_item_analysis(assessment_id)
+
+
+def submission_grace():
+    return timedelta(seconds=getattr(settings, 'ASSESSMENT_SUBMISSION_GRACE_SECONDS', 60))
+
+
+def attempt_deadline(assessment, started_at):
+    """An attempt ends after duration_minutes, or at the due date if that comes first"""
+    deadline = started_at + timedelta(minutes=assessment.duration_minutes)
+    if assessment.due_date and assessment.due_date < deadline:
+        deadline = assessment.due_date
+    return deadline
+
+
+def expire_overdue_attempts(batch_size=200, now=None):
+    """
+    Auto-submit in-progress attempts whose deadline (plus grace) has passed,
+    grading each from its saved draft. Uses the (status, expires_at) index, so
+    each run only reads expired rows. Returns the number of attempts closed.
+    """
+    cutoff = (now or timezone.now()) - submission_grace()
+    compiled = {}
+    closed = 0
+
+    while True:
+        with transaction.atomic():
+            # skip_locked lets a concurrent submit_assessment win the row instead of blocking
+            attempts = list(
+                StudentAssessment.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('assessment')
+                .filter(status='in_progress', expires_at__lte=cutoff)
+                .order_by('expires_at')[:batch_size]
+            )
+            if not attempts:
+                break
+
+            # Compile every question the batch can touch once, then scope it per attempt
+            fixed_ids = {attempt.assessment_id for attempt in attempts if not attempt.paper}
+            paper_ids = {question_id for attempt in attempts for question_id in attempt.paper}
+            missing = Question.objects.filter(Q(assessment_id__in=fixed_ids) | Q(id__in=paper_ids)).exclude(
+                id__in=list(compiled)
+            )
+            compiled.update(compile_questions(missing))
+
+            answers = []
+            for attempt in attempts:
+                if attempt.paper:
+                    attempt_compiled = {
+                        question_id: compiled[question_id]
+                        for question_id in attempt.paper if question_id in compiled
+                    }
+                else:
+                    attempt_compiled = {
+                        question_id: key for question_id, key in compiled.items()
+                        if key.assessment_id == attempt.assessment_id
+                    }
+                answers.extend(prepare_attempt_close(
+                    attempt,
+                    attempt.draft_answers or [],
+                    attempt_compiled,
+                    submitted_at=attempt.expires_at,
+                    strict=False,
+                    auto_submitted=True,
+                ))
+                attempt.updated_at = timezone.now()
+
+            StudentAnswer.objects.bulk_create(answers)
+            StudentAssessment.objects.bulk_update(attempts, ATTEMPT_CLOSE_FIELDS)
+
+            transaction.on_commit(partial(_invalidate_reports, {attempt.assessment_id for attempt in attempts}))
+
+        closed += len(attempts)
+        if len(attempts) < batch_size:
+            break
+
+    return closed
@@ -0,0 +1,308 @@
+# apps/assessments/grading.py
+import re
+import unicodedata
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .analytics import invalidate_item_analysis
+from .models import AcceptedAnswer, Question, QuestionOption, StudentAssessment, StudentAnswer
+
+AUTO_GRADED_TYPES = ('mcq', 'true_false', 'short_answer')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_NUMBER_RE = re.compile(r'^[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?$')
+MAX_NUMBER_EXPONENT = 1000
+
+
+def normalize_answer(text):
+    """Case-fold, strip punctuation and collapse whitespace"""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = ''.join(
+        ' ' if unicodedata.category(ch).startswith('P') else ch
+        for ch in text
+    )
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def parse_number(text):
+    """
+    Parse a numeric answer such as '1,024' or '3.5e2' to a Decimal, or return
+    None. Decimal keeps answers on the edge of a tolerance exact (3.13 is
+    within 0.01 of 3.14, which float subtraction gets wrong).
+    """
+    cleaned = (text or '').strip().replace(',', '').replace(' ', '')
+    if not _NUMBER_RE.match(cleaned):
+        return None
+    value = Decimal(cleaned)
+    # Exponents like 1e999999999 would overflow when compared against a key
+    return value if abs(value.adjusted()) <= MAX_NUMBER_EXPONENT else None
+
+
+def edit_distance_within(a, b, max_distance):
+    """Return True if the Levenshtein distance between a and b is <= max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        # Every path through this row already costs more than allowed
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+
+class CompiledQuestion:
+    """Answer key for one question, precompiled for repeated matching"""
+
+    def __init__(self, question, accepted_answers=(), correct_option_ids=()):
+        self.question_id = question.id
+        self.assessment_id = question.assessment_id
+        self.question_type = question.question_type
+        self.marks = Decimal(question.marks)
+        self.correct_option_ids = set(correct_option_ids)
+        self.exact = set()
+        self.normalized = set()
+        self.numeric = []
+        self.patterns = []
+        self.fuzzy = []
+        self._verdicts = {}
+
+        for accepted in accepted_answers:
+            if accepted.match_type == 'exact':
+                self.exact.add(accepted.answer_text.strip())
+            elif accepted.match_type == 'numeric':
+                target = parse_number(accepted.answer_text)
+                if target is not None:
+                    self.numeric.append((target, Decimal(accepted.numeric_tolerance)))
+            elif accepted.match_type == 'regex':
+                try:
+                    self.patterns.append(re.compile(accepted.answer_text, re.IGNORECASE))
+                except re.error:
+                    continue
+            elif accepted.match_type == 'fuzzy':
+                self.fuzzy.append((normalize_answer(accepted.answer_text), accepted.max_edit_distance))
+            else:
+                self.normalized.add(normalize_answer(accepted.answer_text))
+
+    @property
+    def is_auto_gradable(self):
+        if self.question_type == 'short_answer':
+            return bool(self.exact or self.normalized or self.numeric or self.patterns or self.fuzzy)
+        return self.question_type in AUTO_GRADED_TYPES
+
+    def match_text(self, text):
+        """Check a free-text answer against every accepted answer"""
+        # Identical responses are common across a cohort, so memoize verdicts
+        if text in self._verdicts:
+            return self._verdicts[text]
+
+        stripped = (text or '').strip()
+        normalized = normalize_answer(stripped)
+        verdict = (
+            stripped in self.exact
+            or normalized in self.normalized
+            or any(pattern.fullmatch(stripped) for pattern in self.patterns)
+            or any(edit_distance_within(normalized, target, distance) for target, distance in self.fuzzy)
+        )
+        if not verdict and self.numeric:
+            value = parse_number(stripped)
+            verdict = value is not None and any(
+                abs(value - target) <= tolerance for target, tolerance in self.numeric
+            )
+
+        self._verdicts[text] = verdict
+        return verdict
+
+    def is_correct(self, answer):
+        if self.question_type in ('mcq', 'true_false'):
+            return answer.selected_option_id in self.correct_option_ids
+        return self.match_text(answer.answer_text)
+
+
+def compile_questions(questions):
+    """Build {question_id: CompiledQuestion} for a queryset or list of questions"""
+    questions = list(questions)
+    question_ids = [question.id for question in questions]
+
+    accepted_by_question = defaultdict(list)
+    for accepted in AcceptedAnswer.objects.filter(question_id__in=question_ids):
+        accepted_by_question[accepted.question_id].append(accepted)
+
+    correct_options = defaultdict(set)
+    for question_id, option_id in QuestionOption.objects.filter(
+        question_id__in=question_ids, is_correct=True
+    ).values_list('question_id', 'id'):
+        correct_options[question_id].add(option_id)
+
+    return {
+        question.id: CompiledQuestion(
+            question,
+            accepted_by_question[question.id],
+            correct_options[question.id],
+        )
+        for question in questions
+    }
+
+
+def grade_answers(answers, compiled):
+    """
+    Grade StudentAnswer instances in memory in a single pass.
+    Answers to essay/code questions (or short answers without a key) are left
+    untouched so manual marks are preserved. Returns the answers that changed.
+    """
+    changed = []
+    for answer in answers:
+        key = compiled.get(answer.question_id)
+        if key is None or not key.is_auto_gradable:
+            continue
+
+        is_correct = key.is_correct(answer)
+        marks_awarded = key.marks if is_correct else Decimal('0')
+        if answer.is_correct != is_correct or Decimal(answer.marks_awarded) != marks_awarded:
+            answer.is_correct = is_correct
+            answer.marks_awarded = marks_awarded
+            changed.append(answer)
+    return changed
+
+
+ATTEMPT_CLOSE_FIELDS = [
+    'submitted_at', 'obtained_marks', 'status', 'time_taken_minutes',
+    'draft_answers', 'auto_submitted', 'updated_at',
+]
+
+
+def normalize_answer_payload(answers_data):
+    """
+    Reduce submitted or draft answers to plain ids, keeping the last answer
+    given for each question. Accepts serializer output or stored draft JSON.
+    """
+    by_question = {}
+    for data in answers_data:
+        question = data.get('question')
+        option = data.get('selected_option')
+        question_id = getattr(question, 'pk', question)
+        by_question[question_id] = {
+            'question': question_id,
+            'selected_option': getattr(option, 'pk', option),
+            'answer_text': data.get('answer_text') or '',
+            'time_spent_seconds': data.get('time_spent_seconds'),
+        }
+    return list(by_question.values())
+
+
+def prepare_attempt_close(student_assessment, answers_data, compiled, submitted_at, strict=True, auto_submitted=False):
+    """
+    Grade answers for an in-progress attempt and set its closing fields in
+    memory. Nothing is saved; callers persist the returned answers and the
+    attempt (ATTEMPT_CLOSE_FIELDS) singly or in bulk. With strict, an answer
+    to a question outside the assessment raises ValueError; otherwise it is
+    dropped, which is what auto-submission of stale drafts wants.
+    """
+    answers = []
+    for data in normalize_answer_payload(answers_data):
+        if data['question'] not in compiled:
+            if strict:
+                raise ValueError(f"Question {data['question']} does not belong to this assessment")
+            continue
+        answers.append(StudentAnswer(
+            student_assessment=student_assessment,
+            question_id=data['question'],
+            selected_option_id=data['selected_option'],
+            answer_text=data['answer_text'],
+            time_spent_seconds=data['time_spent_seconds'],
+        ))
+
+    grade_answers(answers, compiled)
+
+    assessment_type = student_assessment.assessment.assessment_type
+    student_assessment.submitted_at = submitted_at
+    student_assessment.obtained_marks = sum((Decimal(answer.marks_awarded) for answer in answers), Decimal('0'))
+    student_assessment.status = 'submitted' if assessment_type in ['assignment', 'project'] else 'graded'
+    student_assessment.time_taken_minutes = max(
+        int((submitted_at - student_assessment.started_at).total_seconds() // 60), 0
+    )
+    student_assessment.draft_answers = []
+    student_assessment.auto_submitted = auto_submitted
+    return answers
+
+
+def finalize_attempt(student_assessment, answers_data, compiled, submitted_at, **kwargs):
+    """Grade, persist and close a single attempt"""
+    answers = prepare_attempt_close(student_assessment, answers_data, compiled, submitted_at, **kwargs)
+    StudentAnswer.objects.bulk_create(answers)
+    student_assessment.save(update_fields=ATTEMPT_CLOSE_FIELDS)
+    assessment_id = student_assessment.assessment_id
+    transaction.on_commit(lambda: invalidate_item_analysis(assessment_id))
+    return answers
+
+
+def regrade_attempts(student_assessments, chunk_size=500, dry_run=False):
+    """
+    Re-run the auto-grader over submitted attempts in chunks and refresh their
+    obtained_marks. Returns a summary of how many answers and attempts changed.
+    """
+    summary = {'attempts': 0, 'answers_changed': 0, 'attempts_changed': 0}
+    compiled = {}
+
+    attempt_ids = list(
+        student_assessments.exclude(status__in=['not_started', 'in_progress'])
+        .order_by('id').values_list('id', flat=True)
+    )
+
+    for start in range(0, len(attempt_ids), chunk_size):
+        chunk_ids = attempt_ids[start:start + chunk_size]
+        attempts = {
+            attempt.id: attempt
+            for attempt in StudentAssessment.objects.filter(id__in=chunk_ids).only(
+                'id', 'assessment_id', 'obtained_marks'
+            )
+        }
+
+        answers = list(StudentAnswer.objects.filter(student_assessment_id__in=chunk_ids).only(
+            'id', 'student_assessment_id', 'question_id', 'selected_option_id',
+            'answer_text', 'marks_awarded', 'is_correct'
+        ))
+
+        # Attempts may draw different questions from a bank, so compile by question
+        missing = {answer.question_id for answer in answers} - compiled.keys()
+        if missing:
+            compiled.update(compile_questions(Question.objects.filter(id__in=missing)))
+
+        changed = grade_answers(answers, compiled)
+
+        totals = defaultdict(Decimal)
+        for answer in answers:
+            totals[answer.student_assessment_id] += Decimal(answer.marks_awarded)
+
+        changed_attempts = []
+        for attempt_id, attempt in attempts.items():
+            total = totals[attempt_id]
+            if Decimal(attempt.obtained_marks) != total:
+                attempt.obtained_marks = total
+                changed_attempts.append(attempt)
+
+        if not dry_run:
+            with transaction.atomic():
+                StudentAnswer.objects.bulk_update(changed, ['marks_awarded', 'is_correct'])
+                StudentAssessment.objects.bulk_update(changed_attempts, ['obtained_marks'])
+            if changed:
+                for assessment_id in {attempt.assessment_id for attempt in attempts.values()}:
+                    invalidate_item_analysis(assessment_id)
+
+        summary['attempts'] += len(attempts)
+        summary['answers_changed'] += len(changed)
+        summary['attempts_changed'] += len(changed_attempts)
+
+    return summary
+
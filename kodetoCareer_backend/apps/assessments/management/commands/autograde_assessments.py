@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.assessments.grading import regrade_attempts
+from apps.assessments.models import StudentAssessment
+
+
+class Command(BaseCommand):
+    help = "Re-run the auto-grader over submitted attempts and refresh their totals"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assessment', type=int, action='append', dest='assessment_ids',
+                            help='Assessment id to regrade (repeatable). Defaults to all assessments.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        attempts = StudentAssessment.objects.all()
+        if options['assessment_ids']:
+            attempts = attempts.filter(assessment_id__in=options['assessment_ids'])
+
+        summary = regrade_attempts(
+            attempts,
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{summary['attempts']} attempts checked, "
+            f"{summary['answers_changed']} answers and {summary['attempts_changed']} totals changed"
+        ))
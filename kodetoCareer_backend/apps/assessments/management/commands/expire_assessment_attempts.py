@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.assessments.deadlines import expire_overdue_attempts
+
+
+class Command(BaseCommand):
+    help = "Auto-submit in-progress attempts whose time limit has passed (run every minute)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        closed = expire_overdue_attempts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{closed} expired attempts auto-submitted"))
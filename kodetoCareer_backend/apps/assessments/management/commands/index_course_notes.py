@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.assessments.models import CourseNote
+from apps.assessments.note_search import extract_note_text
+
+
+class Command(BaseCommand):
+    help = "Extract searchable page text for course notes that have not been indexed yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-extract every note, not only pending and failed ones')
+
+    def handle(self, *args, **options):
+        notes = CourseNote.objects.all()
+        if not options['all']:
+            notes = notes.exclude(text_status='ready')
+
+        note_ids = list(notes.values_list('id', flat=True))
+        for note_id in note_ids:
+            extract_note_text(note_id)
+
+        failed = CourseNote.objects.filter(id__in=note_ids, text_status='failed').count()
+        self.stdout.write(self.style.SUCCESS(f"{len(note_ids)} notes indexed, {failed} failed"))
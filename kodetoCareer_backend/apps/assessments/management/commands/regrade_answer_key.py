@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assessments.regrade import regrade_assessment, regrade_questions, run_pending_regrades
+
+
+class Command(BaseCommand):
+    help = "Recompute answer marks and attempt totals after an answer key change"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assessment', type=int, help='Regrade every question of this assessment')
+        parser.add_argument('--question', type=int, action='append', dest='question_ids',
+                            help='Regrade only this question (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print the diff report without writing')
+        parser.add_argument('--pending', action='store_true',
+                            help='Finish key changes whose background regrade was lost (run every 15 minutes)')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            regraded = run_pending_regrades()
+            self.stdout.write(self.style.SUCCESS(f"{regraded} pending question regrades finished"))
+            return
+
+        kwargs = {'chunk_size': options['chunk_size'], 'dry_run': options['dry_run']}
+        if options['question_ids']:
+            report = regrade_questions(options['question_ids'], **kwargs)
+        elif options['assessment']:
+            report = regrade_assessment(options['assessment'], **kwargs)
+        else:
+            raise CommandError("Pass --assessment, --question or --pending")
+
+        prefix = '[dry run] ' if report['dry_run'] else ''
+        self.stdout.write(
+            f"{prefix}{len(report['questions'])} questions, {report['answers_changed']} answers changed "
+            f"({report['answers_now_correct']} now correct, {report['answers_now_incorrect']} now incorrect), "
+            f"marks delta {report['marks_delta']}, {report['attempts_changed']} attempt totals changed"
+        )
+        for sample in report['sample_attempts']:
+            self.stdout.write(
+                f"  attempt {sample['student_assessment_id']}: {sample['old_marks']} -> {sample['new_marks']}"
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.assessments.models import CourseNote
+from apps.assessments.note_previews import render_note_previews
+
+
+class Command(BaseCommand):
+    help = "Render WebP previews for course notes that do not have them yet"
+
+    def handle(self, *args, **options):
+        note_ids = list(CourseNote.objects.filter(preview_count=0).values_list('id', flat=True))
+        for note_id in note_ids:
+            render_note_previews(note_id)
+
+        missing = CourseNote.objects.filter(id__in=note_ids, preview_count=0).count()
+        self.stdout.write(self.style.SUCCESS(f"{len(note_ids) - missing} notes rendered, {missing} without previews"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0002_coursenote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcceptedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('answer_text', models.CharField(max_length=500)),
+                ('match_type', models.CharField(choices=[('exact', 'Exact'), ('normalized', 'Normalized Text'), ('numeric', 'Numeric'), ('regex', 'Regular Expression'), ('fuzzy', 'Fuzzy (Edit Distance)')], default='normalized', max_length=20)),
+                ('numeric_tolerance', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('max_edit_distance', models.IntegerField(default=1)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accepted_answers', to='assessments.question')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
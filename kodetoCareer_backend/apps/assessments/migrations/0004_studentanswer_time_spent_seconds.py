@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0003_acceptedanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentanswer',
+            name='time_spent_seconds',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:02
+
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_expires_at(apps, schema_editor):
+    """Give attempts that are still running a deadline so the expiry job can close them"""
+    Assessment = apps.get_model('assessments', 'Assessment')
+    StudentAssessment = apps.get_model('assessments', 'StudentAssessment')
+    for assessment_id, duration_minutes in Assessment.objects.values_list('id', 'duration_minutes'):
+        StudentAssessment.objects.filter(
+            assessment_id=assessment_id,
+            status='in_progress',
+            expires_at__isnull=True,
+        ).update(expires_at=F('started_at') + timedelta(minutes=duration_minutes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0004_studentanswer_time_spent_seconds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentassessment',
+            name='auto_submitted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='studentassessment',
+            name='draft_answers',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='studentassessment',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='studentassessment',
+            index=models.Index(fields=['status', 'expires_at'], name='assessments_status_79a23f_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
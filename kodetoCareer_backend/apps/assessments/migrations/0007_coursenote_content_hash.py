@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0006_question_bank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursenote',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FTS = [
+    # External-content FTS5 table kept in step with the page rows by triggers
+    "CREATE VIRTUAL TABLE assessments_coursenotepage_fts USING fts5("
+    "text, content='assessments_coursenotepage', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER assessments_coursenotepage_fts_ai AFTER INSERT ON assessments_coursenotepage BEGIN "
+    "INSERT INTO assessments_coursenotepage_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER assessments_coursenotepage_fts_ad AFTER DELETE ON assessments_coursenotepage BEGIN "
+    "INSERT INTO assessments_coursenotepage_fts(assessments_coursenotepage_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER assessments_coursenotepage_fts_au AFTER UPDATE ON assessments_coursenotepage BEGIN "
+    "INSERT INTO assessments_coursenotepage_fts(assessments_coursenotepage_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO assessments_coursenotepage_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS assessments_coursenotepage_fts_ai",
+    "DROP TRIGGER IF EXISTS assessments_coursenotepage_fts_ad",
+    "DROP TRIGGER IF EXISTS assessments_coursenotepage_fts_au",
+    "DROP TABLE IF EXISTS assessments_coursenotepage_fts",
+]
+POSTGRES_FTS = [
+    # Must match the expression note_search queries with, or the planner will not use it
+    "CREATE INDEX assessments_coursenotepage_tsv ON assessments_coursenotepage "
+    "USING gin (to_tsvector('english', text))",
+]
+POSTGRES_FTS_DROP = [
+    "DROP INDEX IF EXISTS assessments_coursenotepage_tsv",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FTS)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FTS)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FTS_DROP)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FTS_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0007_coursenote_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursenote',
+            name='text_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='CourseNotePage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='assessments.coursenote')),
+            ],
+            options={
+                'ordering': ['note', 'page_number'],
+                'unique_together': {('note', 'page_number')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
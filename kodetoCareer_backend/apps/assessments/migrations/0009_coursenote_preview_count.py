@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0008_coursenote_text_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursenote',
+            name='preview_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0009_coursenote_preview_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRegrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('key', 'Answer key or marks'), ('answers', 'Accepted answers')], max_length=20)),
+                ('requested_at', models.DateTimeField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_regrades', to='assessments.question')),
+            ],
+            options={
+                'unique_together': {('question', 'kind')},
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from apps.common.counters import BufferedCounter
 from apps.common.models import TimeStampedModel
 from apps.courses.models import Course
 
@@ -28,6 +29,15 @@ class Assessment(TimeStampedModel):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+class QuestionBank(TimeStampedModel):
+    """A pool of questions that randomized assessment papers are drawn from"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='question_banks')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"{self.course.title} - {self.title}"
+
 class Question(TimeStampedModel):
     QUESTION_TYPES = (
         ('mcq', 'Multiple Choice'),
@@ -37,7 +47,17 @@ class Question(TimeStampedModel):
         ('code', 'Code'),
     )
     
-    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='questions')
+    DIFFICULTY_LEVELS = (
+        ('easy', 'Easy'),
+        ('medium', 'Medium'),
+        ('hard', 'Hard'),
+    )
+    
+    # A question either belongs to a fixed assessment or sits in a question bank
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='questions', null=True, blank=True)
+    bank = models.ForeignKey(QuestionBank, on_delete=models.CASCADE, related_name='questions', null=True, blank=True)
+    topic = models.CharField(max_length=100, blank=True)
+    difficulty = models.CharField(max_length=20, choices=DIFFICULTY_LEVELS, blank=True)
     question_text = models.TextField()
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES)
     marks = models.IntegerField()
@@ -46,6 +66,9 @@ class Question(TimeStampedModel):
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['bank', 'topic', 'difficulty']),
+        ]
     
     def __str__(self):
         return f"Q{self.order}: {self.question_text[:50]}..."
@@ -62,6 +85,44 @@ class QuestionOption(TimeStampedModel):
     def __str__(self):
         return f"{self.question.question_text[:30]}... - {self.option_text}"
 
+class PaperRule(TimeStampedModel):
+    """Draw `question_count` questions from a bank bucket for every attempt of an assessment"""
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='paper_rules')
+    bank = models.ForeignKey(QuestionBank, on_delete=models.CASCADE, related_name='paper_rules')
+    topic = models.CharField(max_length=100, blank=True, help_text='Leave blank to draw from any topic')
+    difficulty = models.CharField(max_length=20, choices=Question.DIFFICULTY_LEVELS, blank=True,
+                                  help_text='Leave blank to draw from any difficulty')
+    question_count = models.IntegerField(default=1)
+    order = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['order', 'id']
+    
+    def __str__(self):
+        return f"{self.assessment.title} - {self.question_count} x {self.topic or 'any topic'}/{self.difficulty or 'any'}"
+
+class AcceptedAnswer(TimeStampedModel):
+    """An accepted response used to auto-grade short answer questions"""
+    MATCH_TYPES = (
+        ('exact', 'Exact'),
+        ('normalized', 'Normalized Text'),
+        ('numeric', 'Numeric'),
+        ('regex', 'Regular Expression'),
+        ('fuzzy', 'Fuzzy (Edit Distance)'),
+    )
+    
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='accepted_answers')
+    answer_text = models.CharField(max_length=500)
+    match_type = models.CharField(max_length=20, choices=MATCH_TYPES, default='normalized')
+    numeric_tolerance = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    max_edit_distance = models.IntegerField(default=1)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.question.question_text[:30]}... - {self.answer_text} ({self.match_type})"
+
 class StudentAssessment(TimeStampedModel):
     STATUS_CHOICES = (
         ('not_started', 'Not Started'),
@@ -79,13 +140,29 @@ class StudentAssessment(TimeStampedModel):
     obtained_marks = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='not_started')
     feedback = models.TextField(blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    draft_answers = models.JSONField(default=list, blank=True)
+    auto_submitted = models.BooleanField(default=False)
+    # Question ids drawn for this attempt when the assessment uses paper rules
+    paper = models.JSONField(default=list, blank=True)
     
     class Meta:
         unique_together = ['student', 'assessment', 'attempt_number']
         ordering = ['-started_at']
+        indexes = [
+            # Lets the deadline job find expired in-progress attempts without a table scan
+            models.Index(fields=['status', 'expires_at']),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.assessment.title} - Attempt {self.attempt_number}"
+    
+    def is_expired(self, grace_seconds=0):
+        from datetime import timedelta
+        from django.utils import timezone
+        if self.expires_at is None:
+            return False
+        return timezone.now() > self.expires_at + timedelta(seconds=grace_seconds)
 
 class StudentAnswer(TimeStampedModel):
     student_assessment = models.ForeignKey(StudentAssessment, on_delete=models.CASCADE, related_name='answers')
@@ -94,22 +171,49 @@ class StudentAnswer(TimeStampedModel):
     answer_text = models.TextField(blank=True)
     marks_awarded = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     is_correct = models.BooleanField(default=False)
+    time_spent_seconds = models.IntegerField(null=True, blank=True)
     
     class Meta:
         unique_together = ['student_assessment', 'question']
     
     def __str__(self):
         return f"{self.student_assessment.student.username} - {self.question.question_text[:30]}..."
-    
+
+class PendingRegrade(TimeStampedModel):
+    """A key or marks change whose regrade has not finished; deleted once it has"""
+    KINDS = (
+        ('key', 'Answer key or marks'),  # recomputed in SQL by regrade_questions
+        ('answers', 'Accepted answers'),  # re-run through the auto-grader
+    )
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='pending_regrades')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    requested_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['question', 'kind']
+
+    def __str__(self):
+        return f"Regrade question {self.question_id} ({self.kind})"
+
 class CourseNote(TimeStampedModel):
+    TEXT_STATUSES = (
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='notes')
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     pdf_file = models.FileField(upload_to='course_notes/pdfs/')
     file_size = models.IntegerField()  # in bytes
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of pdf_file
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_notes')
     is_active = models.BooleanField(default=True)
     download_count = models.IntegerField(default=0)
+    text_status = models.CharField(max_length=20, choices=TEXT_STATUSES, default='pending')
+    preview_count = models.PositiveSmallIntegerField(default=0)  # rendered WebP pages, 0 until ready
     
     class Meta:
         ordering = ['-created_at']
@@ -120,3 +224,20 @@ class CourseNote(TimeStampedModel):
     
     def get_file_size_mb(self):
         return round(self.file_size / (1024 * 1024), 2)
+
+
+class CourseNotePage(models.Model):
+    """Extracted text of one PDF page, indexed for full-text search by note_search"""
+    note = models.ForeignKey(CourseNote, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.PositiveIntegerField()
+    text = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['note', 'page_number']
+        unique_together = ['note', 'page_number']
+    
+    def __str__(self):
+        return f"{self.note.title} - page {self.page_number}"
+
+
+note_downloads = BufferedCounter(CourseNote, 'download_count')
@@ -0,0 +1,87 @@
+# apps/assessments/note_previews.py
+import logging
+import os
+import threading
+from io import BytesIO
+
+import pypdfium2 as pdfium
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import CourseNote
+
+logger = logging.getLogger(__name__)
+
+MAX_PREVIEW_PAGES = 10
+
+# pdfium is not thread-safe and renders run on the shared background pool,
+# so only one thread may be inside it at a time
+_pdfium_lock = threading.Lock()
+
+
+def preview_settings():
+    pages = getattr(settings, 'NOTE_PREVIEW_PAGES', 1)
+    width = getattr(settings, 'NOTE_PREVIEW_WIDTH', 320)
+    return min(pages, MAX_PREVIEW_PAGES), width
+
+
+def preview_name(pdf_name, page_number):
+    """Previews sit next to their PDF, so identical content-addressed PDFs share them"""
+    return f"{os.path.splitext(pdf_name)[0]}.p{page_number}.webp"
+
+
+def preview_names(note):
+    return [preview_name(note.pdf_file.name, number) for number in range(1, note.preview_count + 1)]
+
+
+def _render_pages(data, pages, numbers, width):
+    """(pages the PDF has, up to pages; WebP bytes of each requested page that exists)"""
+    document = pdfium.PdfDocument(data)
+    try:
+        count = min(pages, len(document))
+        images = []
+        for number in numbers:
+            if number > count:
+                break
+            page = document[number - 1]
+            image = page.render(scale=width / page.get_width()).to_pil()
+            buffer = BytesIO()
+            image.save(buffer, 'WEBP', quality=75, method=4)
+            images.append((number, buffer.getvalue()))
+        return count, images
+    finally:
+        document.close()
+
+
+def render_note_previews(note_id):
+    """Rasterize the first pages of a note's PDF to WebP once; already stored previews are reused"""
+    try:
+        note = CourseNote.objects.get(id=note_id)
+    except CourseNote.DoesNotExist:
+        return
+
+    pages, width = preview_settings()
+    pdf_name = note.pdf_file.name
+    try:
+        with note.pdf_file.open('rb') as pdf_file:
+            data = pdf_file.read()
+        missing = [number for number in range(1, pages + 1) if not default_storage.exists(preview_name(pdf_name, number))]
+        with _pdfium_lock:
+            count, images = _render_pages(data, pages, missing, width)
+        for number, image in images:
+            default_storage.save(preview_name(pdf_name, number), ContentFile(image))
+    except Exception:
+        logger.exception(f"Preview rendering failed for course note {note_id}")
+        return
+
+    # Only publish the previews if the PDF was not replaced while rendering
+    CourseNote.objects.filter(id=note_id, pdf_file=pdf_name).update(preview_count=count)
+
+
+def delete_previews(pdf_name):
+    for number in range(1, MAX_PREVIEW_PAGES + 1):
+        name = preview_name(pdf_name, number)
+        if not default_storage.exists(name):
+            break
+        default_storage.delete(name)
@@ -0,0 +1,193 @@
+# apps/assessments/note_search.py
+import html
+import logging
+import re
+from functools import reduce
+from operator import and_
+
+from django.db import connection, transaction
+from django.db.models import Q
+from pypdf import PdfReader
+
+from apps.courses.models import Enrollment
+from .models import CourseNote, CourseNotePage
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULTS = 50
+SNIPPET_WORDS = 24
+HIGHLIGHT = ('<mark>', '</mark>')
+# The databases mark matches with these private-use characters; the snippet is
+# HTML-escaped first and only then are they swapped for HIGHLIGHT, so text
+# from an uploaded PDF can never reach the client as markup
+MARKERS = ('\ue000', '\ue001')
+FALLBACK_SCAN_LIMIT = 500
+
+_word = re.compile(r'\w+', re.UNICODE)
+
+
+def extract_note_text(note_id):
+    """
+    Extract per-page text from a note's PDF into CourseNotePage rows. Notes
+    sharing a content hash share text, so identical PDFs are parsed once.
+    """
+    try:
+        note = CourseNote.objects.get(id=note_id)
+    except CourseNote.DoesNotExist:
+        return
+
+    twin = None
+    if note.content_hash:
+        twin = CourseNote.objects.filter(
+            content_hash=note.content_hash, text_status='ready'
+        ).exclude(id=note.id).first()
+
+    try:
+        if twin:
+            texts = list(twin.pages.order_by('page_number').values_list('text', flat=True))
+        else:
+            with note.pdf_file.open('rb') as pdf:
+                texts = [_strip_markers(page.extract_text() or '') for page in PdfReader(pdf).pages]
+    except Exception:
+        logger.exception(f"Text extraction failed for course note {note_id}")
+        CourseNote.objects.filter(id=note_id).update(text_status='failed')
+        return
+
+    with transaction.atomic():
+        CourseNotePage.objects.filter(note_id=note_id).delete()
+        CourseNotePage.objects.bulk_create(
+            CourseNotePage(note_id=note_id, page_number=number, text=text)
+            for number, text in enumerate(texts, start=1)
+        )
+        CourseNote.objects.filter(id=note_id).update(text_status='ready')
+
+
+def _strip_markers(text):
+    return text.replace(MARKERS[0], '').replace(MARKERS[1], '')
+
+
+def _render_snippet(snippet):
+    escaped = html.escape(snippet or '')
+    return escaped.replace(MARKERS[0], HIGHLIGHT[0]).replace(MARKERS[1], HIGHLIGHT[1])
+
+
+def accessible_course_ids(user):
+    """Course ids whose notes a user may search, or None for every course"""
+    if user.user_type == 'admin':
+        return None
+    return list(
+        Enrollment.objects.filter(student=user, is_active=True).values_list('course_id', flat=True)
+    )
+
+
+def _sqlite_search(query, course_ids, limit):
+    terms = _word.findall(query)
+    if not terms:
+        return []
+    # Quote every term so user input can never be read as FTS5 query syntax
+    match = ' '.join(f'"{term}"' for term in terms)
+
+    sql = (
+        "SELECT p.note_id, p.page_number, "
+        "snippet(assessments_coursenotepage_fts, 0, %s, %s, '…', %s), "
+        "bm25(assessments_coursenotepage_fts) AS rank "
+        "FROM assessments_coursenotepage_fts "
+        "JOIN assessments_coursenotepage p ON p.id = assessments_coursenotepage_fts.rowid "
+        "JOIN assessments_coursenote n ON n.id = p.note_id "
+        "WHERE assessments_coursenotepage_fts MATCH %s AND n.is_active"
+    )
+    params = [*MARKERS, SNIPPET_WORDS, match]
+    if course_ids is not None:
+        sql += f" AND n.course_id IN ({', '.join(['%s'] * len(course_ids))})"
+        params.extend(course_ids)
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # bm25 is lower-is-better; flip it so both backends rank descending
+        return [(note_id, page, snippet, -rank) for note_id, page, snippet, rank in cursor.fetchall()]
+
+
+def _postgres_search(query, course_ids, limit):
+    # Headlines are expensive, so rank and limit first and only highlight the winners
+    sql = (
+        "SELECT hit.note_id, hit.page_number, "
+        "ts_headline('english', hit.text, hit.query, %s), hit.rank "
+        "FROM ("
+        "SELECT p.note_id, p.page_number, p.text, q.query, "
+        "ts_rank(to_tsvector('english', p.text), q.query) AS rank "
+        "FROM assessments_coursenotepage p "
+        "JOIN assessments_coursenote n ON n.id = p.note_id "
+        "CROSS JOIN websearch_to_tsquery('english', %s) AS q(query) "
+        "WHERE to_tsvector('english', p.text) @@ q.query AND n.is_active"
+    )
+    options = f"StartSel={MARKERS[0]}, StopSel={MARKERS[1]}, MaxWords={SNIPPET_WORDS}, MinWords=8"
+    params = [options, query]
+    if course_ids is not None:
+        sql += " AND n.course_id = ANY(%s)"
+        params.append(course_ids)
+    sql += " ORDER BY rank DESC LIMIT %s) AS hit ORDER BY hit.rank DESC"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _fallback_search(query, course_ids, limit):
+    # Backends without a full-text index get a bounded substring scan, ranked by term hits
+    terms = [term.lower() for term in _word.findall(query)]
+    if not terms:
+        return []
+    pages = CourseNotePage.objects.filter(
+        reduce(and_, (Q(text__icontains=term) for term in terms)), note__is_active=True
+    )
+    if course_ids is not None:
+        pages = pages.filter(note__course_id__in=course_ids)
+
+    rows = []
+    for note_id, page_number, text in pages.values_list('note_id', 'page_number', 'text')[:FALLBACK_SCAN_LIMIT]:
+        words = text.split()
+        hits = {index for index, word in enumerate(words) if any(term in word.lower() for term in terms)}
+        start = max(0, min(hits, default=0) - SNIPPET_WORDS // 2)
+        snippet = ' '.join(
+            f"{MARKERS[0]}{word}{MARKERS[1]}" if index in hits else word
+            for index, word in enumerate(words[start:start + SNIPPET_WORDS], start=start)
+        )
+        rows.append((note_id, page_number, snippet, len(hits)))
+    rows.sort(key=lambda row: -row[3])
+    return rows[:limit]
+
+
+def search_notes(user, query, limit=20):
+    """
+    Ranked page hits for query across the notes of courses the user can
+    access, as dicts with the note, page number, highlighted snippet and rank.
+    """
+    limit = max(1, min(limit, MAX_RESULTS))
+    course_ids = accessible_course_ids(user)
+    if course_ids == [] or not query.strip():
+        return []
+
+    if connection.vendor == 'postgresql':
+        rows = _postgres_search(query, course_ids, limit)
+    elif connection.vendor == 'sqlite':
+        rows = _sqlite_search(query, course_ids, limit)
+    else:
+        rows = _fallback_search(query, course_ids, limit)
+
+    notes = CourseNote.objects.select_related('course').in_bulk({row[0] for row in rows})
+    return [
+        {
+            'note_id': note_id,
+            'note_title': notes[note_id].title,
+            'course_id': notes[note_id].course_id,
+            'course_name': notes[note_id].course.title,
+            'page_number': page_number,
+            'snippet': _render_snippet(snippet),
+            'rank': round(float(rank), 4),
+        }
+        for note_id, page_number, snippet, rank in rows
+        if note_id in notes
+    ]
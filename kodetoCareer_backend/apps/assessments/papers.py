@@ -0,0 +1,78 @@
+# apps/assessments/papers.py
+import random
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Question
+
+BUCKET_CACHE_TIMEOUT = 60 * 60
+
+_random = random.SystemRandom()
+
+
+def bucket_cache_key(bank, topic, difficulty):
+    # Keyed on the bank's updated_at, which question changes bump, so edits never serve stale ids
+    return f"assessments:bank:{bank.id}:{bank.updated_at.timestamp()}:{topic}:{difficulty}"
+
+
+def bucket_question_ids(bank, topic='', difficulty=''):
+    """Candidate question ids for one bank bucket, read through the cache"""
+    key = bucket_cache_key(bank, topic, difficulty)
+    ids = cache.get(key)
+    if ids is None:
+        questions = Question.objects.filter(bank=bank)
+        if topic:
+            questions = questions.filter(topic=topic)
+        if difficulty:
+            questions = questions.filter(difficulty=difficulty)
+        ids = list(questions.order_by('id').values_list('id', flat=True))
+        cache.set(key, ids, BUCKET_CACHE_TIMEOUT)
+    return ids
+
+
+def generate_paper(assessment, rng=None):
+    """
+    Draw question ids for a new attempt, question_count per paper rule,
+    sampling without replacement in memory. Returns [] for assessments that
+    use a fixed question list. Raises ValueError if a bucket is too small.
+    """
+    rng = rng or _random
+    paper = []
+    drawn = set()
+
+    for rule in assessment.paper_rules.select_related('bank'):
+        candidates = [
+            question_id for question_id in bucket_question_ids(rule.bank, rule.topic, rule.difficulty)
+            if question_id not in drawn
+        ]
+        if len(candidates) < rule.question_count:
+            raise ValueError(
+                f"Question bank '{rule.bank.title}' has only {len(candidates)} questions "
+                f"for {rule.topic or 'any topic'}/{rule.difficulty or 'any difficulty'}, "
+                f"{rule.question_count} required"
+            )
+        picked = rng.sample(candidates, rule.question_count)
+        paper.extend(picked)
+        drawn.update(picked)
+
+    return paper
+
+
+def attempt_questions(student_assessment):
+    """The questions an attempt is answering: its drawn paper, or the assessment's fixed list"""
+    if student_assessment.paper:
+        return Question.objects.filter(id__in=student_assessment.paper)
+    return Question.objects.filter(assessment_id=student_assessment.assessment_id)
+
+
+def paper_questions_in_order(paper):
+    """Drawn questions with their options, in the order they were drawn"""
+    questions = Question.objects.filter(id__in=paper).prefetch_related('options')
+    position = {question_id: index for index, question_id in enumerate(paper)}
+    return sorted(questions, key=lambda question: position[question.id])
+
+
+def assessment_question_filter(assessment):
+    """Q matching every question an assessment's attempts can contain"""
+    return Q(assessment=assessment) | Q(bank__in=assessment.paper_rules.values('bank'))
@@ -0,0 +1,213 @@
+# apps/assessments/regrade.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case, Count, DecimalField, Exists, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.common.background import run_in_background
+from .analytics import invalidate_item_analysis
+from .grading import regrade_attempts
+from .papers import assessment_question_filter
+from .models import (
+    AcceptedAnswer, Assessment, PendingRegrade, Question, QuestionOption, StudentAssessment, StudentAnswer,
+)
+
+OPTION_QUESTION_TYPES = ('mcq', 'true_false')
+GRADED_STATUSES = ('submitted', 'graded')
+MARKS_FIELD = DecimalField(max_digits=6, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=MARKS_FIELD)
+# A pending regrade this old lost its background task (or is still running; regrading twice is harmless)
+STALE_AFTER = timedelta(minutes=30)
+
+
+def _regradable_questions(questions):
+    """Split questions into option-based and keyed short answer id lists"""
+    option_ids, short_answer_ids = [], []
+    keyed = set(AcceptedAnswer.objects.filter(question__in=questions).values_list('question_id', flat=True))
+    for question_id, question_type in questions.values_list('id', 'question_type'):
+        if question_type in OPTION_QUESTION_TYPES:
+            option_ids.append(question_id)
+        elif question_type == 'short_answer' and question_id in keyed:
+            # Manually graded short answers may carry partial credit; leave them alone
+            short_answer_ids.append(question_id)
+    return option_ids, short_answer_ids
+
+
+def _projected_answer_expressions(option_ids, short_answer_ids):
+    """SQL expressions for an answer's is_correct / marks_awarded under the current key"""
+    picked_correct = Exists(QuestionOption.objects.filter(pk=OuterRef('selected_option_id'), is_correct=True))
+    question_marks = Subquery(
+        Question.objects.filter(pk=OuterRef('question_id')).values('marks')[:1],
+        output_field=MARKS_FIELD,
+    )
+    is_correct = Case(
+        When(question_id__in=option_ids, then=picked_correct),
+        default=F('is_correct'),
+    )
+    marks = Case(
+        When(picked_correct, question_id__in=option_ids, then=question_marks),
+        When(question_id__in=option_ids, then=ZERO),
+        When(question_id__in=short_answer_ids, is_correct=True, then=question_marks),
+        When(question_id__in=short_answer_ids, then=ZERO),
+        default=F('marks_awarded'),
+        output_field=MARKS_FIELD,
+    )
+    return is_correct, marks
+
+
+def _id_ranges(queryset, chunk_size):
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+        yield start, start + chunk_size
+
+
+def regrade_questions(question_ids, chunk_size=5000, dry_run=False, sample_size=20):
+    """
+    Recompute StudentAnswer.is_correct / marks_awarded for the given questions
+    and the obtained_marks of every affected attempt, entirely in SQL.
+
+    Work is split into primary-key ranges so each UPDATE stays short. With
+    dry_run the same expressions are only aggregated into a diff report.
+    """
+    questions = Question.objects.filter(id__in=question_ids)
+    option_ids, short_answer_ids = _regradable_questions(questions)
+    regradable_ids = option_ids + short_answer_ids
+
+    report = {
+        'dry_run': dry_run,
+        'questions': regradable_ids,
+        'answers_changed': 0,
+        'answers_now_correct': 0,
+        'answers_now_incorrect': 0,
+        'marks_delta': Decimal('0'),
+        'attempts_changed': 0,
+        'sample_attempts': [],
+    }
+    if not regradable_ids:
+        return report
+
+    is_correct, marks = _projected_answer_expressions(option_ids, short_answer_ids)
+    answers = StudentAnswer.objects.filter(
+        question_id__in=regradable_ids,
+        student_assessment__status__in=GRADED_STATUSES,
+    )
+
+    for start, end in _id_ranges(answers, chunk_size):
+        chunk = answers.filter(id__gte=start, id__lt=end)
+        diff = chunk.annotate(new_is_correct=is_correct, new_marks=marks).aggregate(
+            changed=Count('id', filter=~Q(is_correct=F('new_is_correct')) | ~Q(marks_awarded=F('new_marks'))),
+            now_correct=Count('id', filter=Q(is_correct=False, new_is_correct=True)),
+            now_incorrect=Count('id', filter=Q(is_correct=True, new_is_correct=False)),
+            delta=Sum(F('new_marks') - F('marks_awarded'), output_field=MARKS_FIELD),
+        )
+        report['answers_changed'] += diff['changed']
+        report['answers_now_correct'] += diff['now_correct']
+        report['answers_now_incorrect'] += diff['now_incorrect']
+        report['marks_delta'] += diff['delta'] or 0
+
+        if not dry_run and diff['changed']:
+            chunk.update(is_correct=is_correct, marks_awarded=marks)
+
+    # In a dry run the answers are untouched, so total the projected marks instead
+    answer_marks = marks if dry_run else F('marks_awarded')
+    attempt_total = Coalesce(
+        Subquery(
+            StudentAnswer.objects.filter(student_assessment=OuterRef('pk'))
+            .annotate(projected=answer_marks)
+            .values('student_assessment')
+            .annotate(total=Sum('projected'))
+            .values('total')[:1],
+            output_field=MARKS_FIELD,
+        ),
+        ZERO,
+    )
+    # Bank questions are shared across assessments, so find attempts through their answers
+    attempts = StudentAssessment.objects.filter(
+        Exists(StudentAnswer.objects.filter(student_assessment=OuterRef('pk'), question_id__in=regradable_ids)),
+        status__in=GRADED_STATUSES,
+    )
+
+    for start, end in _id_ranges(attempts, chunk_size):
+        changed = attempts.filter(id__gte=start, id__lt=end).annotate(
+            new_total=attempt_total
+        ).exclude(obtained_marks=F('new_total'))
+
+        remaining = sample_size - len(report['sample_attempts'])
+        if remaining > 0:
+            report['sample_attempts'].extend(
+                {'student_assessment_id': pk, 'old_marks': old, 'new_marks': new}
+                for pk, old, new in changed.order_by('id').values_list('id', 'obtained_marks', 'new_total')[:remaining]
+            )
+
+        if dry_run:
+            report['attempts_changed'] += changed.count()
+        else:
+            report['attempts_changed'] += attempts.filter(id__gte=start, id__lt=end).filter(
+                id__in=changed.values('id')
+            ).update(obtained_marks=attempt_total)
+
+    if not dry_run and report['answers_changed']:
+        for assessment_id in attempts.order_by().values_list('assessment_id', flat=True).distinct():
+            invalidate_item_analysis(assessment_id)
+
+    return report
+
+
+def regrade_assessment(assessment_id, **kwargs):
+    """Regrade every question of an assessment, including its bank questions, against the current key"""
+    assessment = Assessment.objects.get(id=assessment_id)
+    question_ids = list(
+        Question.objects.filter(assessment_question_filter(assessment)).values_list('id', flat=True)
+    )
+    return regrade_questions(question_ids, **kwargs)
+
+
+def request_regrade(kind, question_ids):
+    """
+    Record that question_ids need a regrade of this kind ('key' or
+    'answers') and run it off the request thread. The record outlives the
+    background task, which is lost if the process exits first, so
+    run_pending_regrades can finish the work.
+    """
+    now = timezone.now()
+    PendingRegrade.objects.bulk_create(
+        [PendingRegrade(question_id=question_id, kind=kind, requested_at=now) for question_id in question_ids],
+        update_conflicts=True,
+        unique_fields=['question', 'kind'],
+        update_fields=['requested_at', 'updated_at'],
+    )
+    run_in_background(run_regrade, kind, question_ids)
+
+
+def run_regrade(kind, question_ids):
+    """Regrade question_ids and clear their pending records, unless they were requested again meanwhile"""
+    started = timezone.now()
+    if kind == 'answers':
+        # Text matching needs Python, so short answer keys go through the batch grader
+        regrade_attempts(StudentAssessment.objects.filter(answers__question_id__in=question_ids).distinct())
+    else:
+        regrade_questions(question_ids)
+    PendingRegrade.objects.filter(kind=kind, question_id__in=question_ids, requested_at__lte=started).delete()
+
+
+def run_pending_regrades(now=None):
+    """Finish regrades requested over STALE_AFTER ago; returns how many questions were regraded"""
+    now = now or timezone.now()
+    stale = list(PendingRegrade.objects.filter(requested_at__lt=now - STALE_AFTER).values_list('id', 'kind', 'question_id'))
+    pending = {}
+    for _, kind, question_id in stale:
+        pending.setdefault(kind, []).append(question_id)
+    # Claim them, so a concurrent run leaves them alone for another STALE_AFTER
+    claimed_at = timezone.now()
+    PendingRegrade.objects.filter(id__in=[row[0] for row in stale]).update(
+        requested_at=claimed_at, updated_at=claimed_at
+    )
+    for kind, question_ids in pending.items():
+        run_regrade(kind, question_ids)
+    return sum(len(question_ids) for question_ids in pending.values())
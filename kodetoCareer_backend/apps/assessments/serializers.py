@@ -3,11 +3,16 @@ from .models import Assessment, Question, QuestionOption, StudentAssessment, Stu
 from django.db import models
 from django.contrib.auth import get_user_model
 from apps.common.models import TimeStampedModel
+from apps.common.serializers import BufferedCountField, BufferedCountListSerializer
 from apps.courses.models import Course
-from .models import CourseNote
+from .models import CourseNote, note_downloads
 import base64
+import binascii
 import os
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .note_previews import delete_previews, preview_names
+from .uploads import MAX_PDF_SIZE, is_pdf, release_content, store_content_addressed
 from rest_framework import serializers
 
 User = get_user_model()
@@ -42,7 +47,7 @@ class AssessmentListSerializer(serializers.ModelSerializer):
 class StudentAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentAnswer
-        fields = ['question', 'selected_option', 'answer_text']
+        fields = ['question', 'selected_option', 'answer_text', 'time_spent_seconds']
         read_only_fields = ['marks_awarded', 'is_correct']
 
 class StudentAssessmentSerializer(serializers.ModelSerializer):
@@ -52,7 +57,7 @@ class StudentAssessmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentAssessment
         fields = '__all__'
-        read_only_fields = ['student', 'started_at', 'obtained_marks', 'status']
+        read_only_fields = ['student', 'started_at', 'obtained_marks', 'status', 'expires_at', 'auto_submitted', 'paper']
 
 class AssessmentSubmissionSerializer(serializers.Serializer):
     assessment_id = serializers.IntegerField()
@@ -66,106 +71,118 @@ class AssessmentSubmissionSerializer(serializers.Serializer):
             return value
         except Assessment.DoesNotExist:
             raise serializers.ValidationError("Assessment not found")
+
+class AssessmentDraftSerializer(serializers.Serializer):
+    answers = StudentAnswerSerializer(many=True)
         
 # serializers.py
 
+class FormBooleanField(serializers.BooleanField):
+    """BooleanField that falls back to its default when a multipart form omits it"""
+    default_empty_html = serializers.empty
+
+
 class CourseNoteSerializer(serializers.ModelSerializer):
     pdf_base64 = serializers.CharField(write_only=True, required=False)
+    is_active = FormBooleanField(default=True)
     file_size_mb = serializers.SerializerMethodField(read_only=True)
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
     course_name = serializers.CharField(source='course.title', read_only=True)
+    download_count = BufferedCountField(note_downloads)
     
     class Meta:
         model = CourseNote
         fields = [
             'id', 'course', 'title', 'description', 'pdf_file', 'pdf_base64',
-            'file_size', 'file_size_mb', 'uploaded_by', 'uploaded_by_name',
+            'file_size', 'file_size_mb', 'content_hash', 'uploaded_by', 'uploaded_by_name',
             'course_name', 'is_active', 'download_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['uploaded_by', 'file_size', 'download_count', 'created_at', 'updated_at']
+        read_only_fields = [
+            'uploaded_by', 'file_size', 'content_hash', 'download_count', 'created_at', 'updated_at'
+        ]
+        extra_kwargs = {'pdf_file': {'required': False}}
+        list_serializer_class = BufferedCountListSerializer
     
     def get_file_size_mb(self, obj):
         return obj.get_file_size_mb()
     
     def validate_pdf_base64(self, value):
+        # Compatibility path for JSON clients; multipart pdf_file uploads are preferred
         if not value:
-            return value
+            return None
         
         try:
-            # Check if base64 string is valid
-            base64.b64decode(value)
-        except Exception:
+            decoded_file = base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
             raise serializers.ValidationError("Invalid base64 encoding")
         
-        # Decode to check file size (max 10MB)
-        decoded_file = base64.b64decode(value)
-        file_size = len(decoded_file)
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
-            raise serializers.ValidationError("File size cannot exceed 10MB")
-        
-        return value
+        # Hand the decoded bytes on so create/update never decode again
+        return ContentFile(decoded_file, name='note.pdf')
     
     def validate_course(self, value):
         if not value:
             raise serializers.ValidationError("Course is required")
         return value
     
-    def create(self, validated_data):
-        pdf_base64 = validated_data.pop('pdf_base64', None)
+    def validate(self, attrs):
+        pdf_file = attrs.pop('pdf_base64', None) or attrs.get('pdf_file')
+        if pdf_file is None:
+            if self.instance is None:
+                raise serializers.ValidationError({'pdf_file': 'A PDF file is required'})
+            return attrs
         
-        if pdf_base64:
-            # Decode base64 file
-            decoded_file = base64.b64decode(pdf_base64)
-            file_size = len(decoded_file)
-            
-            # Generate filename
-            filename = f"{validated_data['title'].replace(' ', '_')}.pdf"
-            
-            # Create ContentFile
-            pdf_file = ContentFile(decoded_file, name=filename)
-            
-            # Set file and size
-            validated_data['pdf_file'] = pdf_file
-            validated_data['file_size'] = file_size
+        if pdf_file.size > MAX_PDF_SIZE:
+            raise serializers.ValidationError({'pdf_file': 'File size cannot exceed 10MB'})
+        if not is_pdf(pdf_file):
+            raise serializers.ValidationError({'pdf_file': 'File must be a PDF'})
         
+        attrs['pdf_file'] = pdf_file
+        return attrs
+    
+    def _store_pdf(self, validated_data):
+        pdf_file = validated_data.get('pdf_file')
+        if pdf_file is not None:
+            name, sha256 = store_content_addressed(pdf_file)
+            validated_data['pdf_file'] = name
+            validated_data['file_size'] = pdf_file.size
+            validated_data['content_hash'] = sha256
+    
+    def create(self, validated_data):
+        self._store_pdf(validated_data)
         return super().create(validated_data)
     
     def update(self, instance, validated_data):
-        pdf_base64 = validated_data.pop('pdf_base64', None)
-        
-        if pdf_base64:
-            # Delete old file if exists
-            if instance.pdf_file:
-                instance.pdf_file.delete()
-            
-            # Decode new base64 file
-            decoded_file = base64.b64decode(pdf_base64)
-            file_size = len(decoded_file)
-            
-            # Generate filename
-            filename = f"{validated_data.get('title', instance.title).replace(' ', '_')}.pdf"
-            
-            # Create ContentFile
-            pdf_file = ContentFile(decoded_file, name=filename)
-            
-            # Set file and size
-            validated_data['pdf_file'] = pdf_file
-            validated_data['file_size'] = file_size
+        old_name = instance.pdf_file.name
+        self._store_pdf(validated_data)
+        instance = super().update(instance, validated_data)
         
-        return super().update(instance, validated_data)
+        # Stored PDFs are shared between identical notes, so only drop unreferenced ones
+        if old_name != instance.pdf_file.name:
+            if release_content(old_name, CourseNote.objects.filter(pdf_file=old_name)):
+                delete_previews(old_name)
+        return instance
 
 class CourseNoteListSerializer(serializers.ModelSerializer):
     file_size_mb = serializers.SerializerMethodField()
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
     course_name = serializers.CharField(source='course.title', read_only=True)
+    download_count = BufferedCountField(note_downloads)
+    preview_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = CourseNote
         fields = [
             'id', 'title', 'description', 'file_size_mb', 'uploaded_by_name',
-            'course_name', 'is_active', 'download_count', 'created_at'
+            'course_name', 'is_active', 'download_count', 'preview_urls', 'created_at'
         ]
+        list_serializer_class = BufferedCountListSerializer
     
     def get_file_size_mb(self, obj):
         return obj.get_file_size_mb()
+    
+    def get_preview_urls(self, obj):
+        request = self.context.get('request')
+        urls = [default_storage.url(name) for name in preview_names(obj)]
+        if request is not None:
+            urls = [request.build_absolute_uri(url) for url in urls]
+        return urls
@@ -0,0 +1,76 @@
+# apps/assessments/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.common.background import run_in_background
+from .models import AcceptedAnswer, CourseNote, Question, QuestionBank, QuestionOption
+
+
+def _remember_previous(instance, *fields):
+    """Stash the stored values of fields so post_save can tell what changed"""
+    previous = {}
+    if instance.pk:
+        previous = type(instance).objects.filter(pk=instance.pk).values(*fields).first() or {}
+    instance._previous = previous
+
+
+@receiver(pre_save, sender=QuestionOption)
+def remember_option_key(sender, instance, **kwargs):
+    _remember_previous(instance, 'is_correct')
+
+
+@receiver(post_save, sender=QuestionOption)
+def regrade_on_option_key_change(sender, instance, created, **kwargs):
+    if not created and instance._previous.get('is_correct') != instance.is_correct:
+        from .regrade import request_regrade
+        request_regrade('key', [instance.question_id])
+
+
+@receiver(pre_save, sender=Question)
+def remember_question_state(sender, instance, **kwargs):
+    _remember_previous(instance, 'marks', 'bank_id')
+
+
+@receiver(post_save, sender=Question)
+def handle_question_change(sender, instance, created, **kwargs):
+    if not created and instance._previous.get('marks') != instance.marks:
+        from .regrade import request_regrade
+        request_regrade('key', [instance.id])
+
+    # Bumping updated_at rotates the bank's cached bucket ids
+    bank_ids = {instance.bank_id, instance._previous.get('bank_id')} - {None}
+    if bank_ids:
+        QuestionBank.objects.filter(pk__in=bank_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Question)
+def handle_question_delete(sender, instance, **kwargs):
+    if instance.bank_id:
+        QuestionBank.objects.filter(pk=instance.bank_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=AcceptedAnswer)
+@receiver(post_delete, sender=AcceptedAnswer)
+def regrade_on_accepted_answer_change(sender, instance, origin=None, **kwargs):
+    # Deleted along with its question (or course), whose answers go too: nothing to regrade
+    if origin is not None and getattr(origin, 'model', type(origin)) is not AcceptedAnswer:
+        return
+    from .regrade import request_regrade
+    request_regrade('answers', [instance.question_id])
+
+
+@receiver(pre_save, sender=CourseNote)
+def remember_note_file(sender, instance, **kwargs):
+    _remember_previous(instance, 'pdf_file')
+
+
+@receiver(post_save, sender=CourseNote)
+def process_note_file(sender, instance, created, **kwargs):
+    if created or instance._previous.get('pdf_file') != instance.pdf_file.name:
+        from .note_previews import render_note_previews
+        from .note_search import extract_note_text
+        # Marked pending first, so index_course_notes and render_note_previews finish work lost to a restart
+        CourseNote.objects.filter(pk=instance.pk).update(text_status='pending', preview_count=0)
+        run_in_background(extract_note_text, instance.pk)
+        run_in_background(render_note_previews, instance.pk)
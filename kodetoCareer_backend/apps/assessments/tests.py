@@ -1,3 +1,238 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.courses.models import Category, Course
+from .grading import (
+    CompiledQuestion, edit_distance_within, grade_answers, normalize_answer, parse_number, regrade_attempts,
+)
+from .models import (
+    AcceptedAnswer, Assessment, PendingRegrade, Question, QuestionOption, StudentAnswer, StudentAssessment,
+)
+from .regrade import regrade_questions, run_pending_regrades
+
+
+def short_answer_key(*accepted, marks=2):
+    question = Question(id=1, question_type='short_answer', marks=marks)
+    return CompiledQuestion(question, [AcceptedAnswer(answer_text=text, **options) for text, options in accepted])
+
+
+class AnswerNormalizationTests(SimpleTestCase):
+    def test_normalize_answer_folds_case_punctuation_and_whitespace(self):
+        self.assertEqual(normalize_answer('  The  Eiffel-Tower!! '), 'the eiffel tower')
+        self.assertEqual(normalize_answer('STRASSE'), normalize_answer('straße'))
+        self.assertEqual(normalize_answer('ｆｕｌｌ width'), 'full width')
+        self.assertEqual(normalize_answer(None), '')
+
+    def test_parse_number_accepts_grouping_and_exponents(self):
+        self.assertEqual(parse_number('1,024'), Decimal('1024'))
+        self.assertEqual(parse_number(' -3.5e2 '), Decimal('-350'))
+        self.assertEqual(parse_number('.5'), Decimal('0.5'))
+        self.assertIsNone(parse_number('12 apples'))
+        self.assertIsNone(parse_number(''))
+        self.assertIsNone(parse_number('1e999999999'))
+
+    def test_edit_distance_within(self):
+        self.assertTrue(edit_distance_within('kitten', 'sitting', 3))
+        self.assertFalse(edit_distance_within('kitten', 'sitting', 2))
+        self.assertTrue(edit_distance_within('', 'ab', 2))
+        self.assertFalse(edit_distance_within('a', 'abcd', 2))
+
+
+class CompiledQuestionTests(SimpleTestCase):
+    def test_exact_match_only_ignores_surrounding_whitespace(self):
+        key = short_answer_key(('Paris', {'match_type': 'exact'}))
+        self.assertTrue(key.match_text(' Paris '))
+        self.assertFalse(key.match_text('paris'))
+
+    def test_normalized_match(self):
+        key = short_answer_key(('New York', {'match_type': 'normalized'}))
+        self.assertTrue(key.match_text('new   york.'))
+        self.assertFalse(key.match_text('New Jersey'))
+
+    def test_numeric_match_within_tolerance(self):
+        key = short_answer_key(('3.14', {'match_type': 'numeric', 'numeric_tolerance': Decimal('0.01')}))
+        self.assertTrue(key.match_text('3.145'))
+        # Exactly on the tolerance, which float subtraction would overshoot
+        self.assertTrue(key.match_text('3.13'))
+        self.assertFalse(key.match_text('3.2'))
+        self.assertFalse(key.match_text('pi'))
+        self.assertFalse(key.match_text('1e999999999'))
+
+    def test_regex_must_match_the_whole_answer_case_insensitively(self):
+        key = short_answer_key((r'colou?r', {'match_type': 'regex'}))
+        self.assertTrue(key.match_text('Color'))
+        self.assertTrue(key.match_text('colour'))
+        self.assertFalse(key.match_text('colors'))
+
+    def test_invalid_regex_is_skipped(self):
+        key = short_answer_key(('([', {'match_type': 'regex'}))
+        self.assertFalse(key.is_auto_gradable)
+        self.assertFalse(key.match_text('(['))
+
+    def test_fuzzy_match_within_edit_distance(self):
+        key = short_answer_key(('photosynthesis', {'match_type': 'fuzzy', 'max_edit_distance': 2}))
+        self.assertTrue(key.match_text('Photosynthesys'))
+        self.assertFalse(key.match_text('photo synthesis process'))
+
+    def test_short_answer_without_key_is_not_auto_gradable(self):
+        self.assertFalse(short_answer_key().is_auto_gradable)
+
+    def test_option_questions_match_correct_options(self):
+        key = CompiledQuestion(Question(id=2, question_type='mcq', marks=1), correct_option_ids=[7])
+        self.assertTrue(key.is_correct(StudentAnswer(question_id=2, selected_option_id=7)))
+        self.assertFalse(key.is_correct(StudentAnswer(question_id=2, selected_option_id=8)))
+
+
+class GradeAnswersTests(SimpleTestCase):
+    def test_awards_full_marks_or_nothing_and_reports_changes(self):
+        compiled = {1: short_answer_key(('Paris', {}), marks=3)}
+        right = StudentAnswer(question_id=1, answer_text='paris')
+        wrong = StudentAnswer(question_id=1, answer_text='London', marks_awarded=0, is_correct=False)
+
+        changed = grade_answers([right, wrong], compiled)
+
+        self.assertEqual(changed, [right])
+        self.assertTrue(right.is_correct)
+        self.assertEqual(right.marks_awarded, Decimal('3'))
+
+    def test_leaves_manually_graded_answers_alone(self):
+        compiled = {
+            1: short_answer_key(marks=5),
+            2: CompiledQuestion(Question(id=2, question_type='essay', marks=5)),
+        }
+        answers = [
+            StudentAnswer(question_id=1, answer_text='anything', marks_awarded=Decimal('2.5')),
+            StudentAnswer(question_id=2, answer_text='essay', marks_awarded=Decimal('4')),
+            StudentAnswer(question_id=3, answer_text='no key', marks_awarded=Decimal('1')),
+        ]
+
+        self.assertEqual(grade_answers(answers, compiled), [])
+        self.assertEqual([answer.marks_awarded for answer in answers], [Decimal('2.5'), Decimal('4'), Decimal('1')])
+
+
+class RegradeTests(TestCase):
+    """
+    Two graded attempts and one in progress. The MCQ key is wrong (the
+    second option is the right answer) and the short answer key lacks
+    'London'. Essay marks are manual.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Geography')
+        course = Course.objects.create(
+            category=category, title='Capitals', slug='capitals', description='Capitals',
+            price=100, duration_hours=1,
+        )
+        assessment = Assessment.objects.create(
+            course=course, title='Quiz', description='Quiz', assessment_type='quiz',
+            total_marks=10, passing_marks=5, duration_minutes=10,
+        )
+        self.mcq = Question.objects.create(assessment=assessment, question_text='Capital of France?', question_type='mcq', marks=2)
+        self.keyed = QuestionOption.objects.create(question=self.mcq, option_text='Lyon', is_correct=True)
+        self.right = QuestionOption.objects.create(question=self.mcq, option_text='Paris', is_correct=False)
+        self.short = Question.objects.create(assessment=assessment, question_text='Capital of the UK?', question_type='short_answer', marks=3)
+        AcceptedAnswer.objects.create(question=self.short, answer_text='Londres')
+        self.essay = Question.objects.create(assessment=assessment, question_text='Why?', question_type='essay', marks=5)
+
+        def attempt(username, status, answers):
+            student = User.objects.create_user(username=username, email=f"{username}@example.com", password='pw')
+            attempt = StudentAssessment.objects.create(student=student, assessment=assessment, status=status)
+            for question, fields in answers:
+                StudentAnswer.objects.create(student_assessment=attempt, question=question, **fields)
+            StudentAssessment.objects.filter(pk=attempt.pk).update(
+                obtained_marks=sum((Decimal(fields.get('marks_awarded', 0)) for _, fields in answers), Decimal('0'))
+            )
+            return attempt
+
+        self.first = attempt('first', 'graded', [
+            (self.mcq, {'selected_option': self.keyed, 'is_correct': True, 'marks_awarded': 2}),
+            (self.short, {'answer_text': 'london', 'marks_awarded': 0}),
+            (self.essay, {'answer_text': 'Because', 'marks_awarded': 4}),
+        ])
+        self.second = attempt('second', 'graded', [
+            (self.mcq, {'selected_option': self.right, 'marks_awarded': 0}),
+            (self.short, {'answer_text': 'Paris', 'marks_awarded': 0}),
+        ])
+        self.open = attempt('open', 'in_progress', [
+            (self.mcq, {'selected_option': self.keyed, 'is_correct': True, 'marks_awarded': 2}),
+        ])
+        PendingRegrade.objects.all().delete()
+
+    def fix_mcq_key(self):
+        # update() rather than save(), so the signal does not queue a regrade of its own
+        QuestionOption.objects.filter(pk=self.keyed.pk).update(is_correct=False)
+        QuestionOption.objects.filter(pk=self.right.pk).update(is_correct=True)
+
+    def marks(self, attempt):
+        attempt.refresh_from_db()
+        answers = dict(attempt.answers.values_list('question_id', 'marks_awarded'))
+        return attempt.obtained_marks, answers
+
+    def test_regrade_questions_applies_a_fixed_key_across_id_ranges(self):
+        self.fix_mcq_key()
+
+        report = regrade_questions([self.mcq.id], chunk_size=1)
+
+        self.assertEqual(report['answers_changed'], 2)
+        self.assertEqual(report['answers_now_correct'], 1)
+        self.assertEqual(report['answers_now_incorrect'], 1)
+        self.assertEqual(report['marks_delta'], Decimal('0'))
+        self.assertEqual(report['attempts_changed'], 2)
+        self.assertEqual(self.marks(self.first)[0], Decimal('4'))
+        self.assertEqual(self.marks(self.second)[0], Decimal('2'))
+        # Attempts still in progress are graded when they are submitted
+        self.assertEqual(self.marks(self.open), (Decimal('2'), {self.mcq.id: Decimal('2')}))
+
+    def test_regrade_questions_picks_up_a_marks_change(self):
+        Question.objects.filter(pk=self.mcq.pk).update(marks=3)
+
+        report = regrade_questions([self.mcq.id])
+
+        self.assertEqual(report['marks_delta'], Decimal('1'))
+        self.assertEqual(self.marks(self.first)[0], Decimal('7'))
+
+    def test_regrade_questions_dry_run_reports_without_writing(self):
+        self.fix_mcq_key()
+
+        report = regrade_questions([self.mcq.id], dry_run=True)
+
+        self.assertEqual(report['answers_changed'], 2)
+        self.assertEqual(report['attempts_changed'], 2)
+        self.assertEqual(
+            sorted((row['student_assessment_id'], row['old_marks'], row['new_marks']) for row in report['sample_attempts']),
+            [(self.first.id, Decimal('6'), Decimal('4')), (self.second.id, Decimal('0'), Decimal('2'))],
+        )
+        self.assertEqual(self.marks(self.first)[0], Decimal('6'))
+
+    def test_regrade_attempts_applies_a_new_accepted_answer(self):
+        AcceptedAnswer.objects.create(question=self.short, answer_text='London')
+
+        summary = regrade_attempts(StudentAssessment.objects.all(), chunk_size=1)
+
+        self.assertEqual(summary, {'attempts': 2, 'answers_changed': 1, 'attempts_changed': 1})
+        total, answers = self.marks(self.first)
+        self.assertEqual(total, Decimal('9'))
+        self.assertEqual(answers[self.short.id], Decimal('3'))
+        self.assertEqual(self.marks(self.second)[0], Decimal('0'))
+
+    def test_regrade_attempts_keeps_manual_marks(self):
+        regrade_attempts(StudentAssessment.objects.all())
+
+        self.assertEqual(self.marks(self.first), (
+            Decimal('6'), {self.mcq.id: Decimal('2'), self.short.id: Decimal('0'), self.essay.id: Decimal('4')},
+        ))
+
+    def test_run_pending_regrades_finishes_requests_whose_task_was_lost(self):
+        self.fix_mcq_key()
+        now = timezone.now()
+        PendingRegrade.objects.create(question=self.mcq, kind='key', requested_at=now - timedelta(hours=1))
+        PendingRegrade.objects.create(question=self.short, kind='answers', requested_at=now)
+
+        self.assertEqual(run_pending_regrades(), 1)
+
+        self.assertEqual(self.marks(self.first)[0], Decimal('4'))
+        self.assertEqual(list(PendingRegrade.objects.values_list('question_id', flat=True)), [self.short.id])
@@ -0,0 +1,78 @@
+# apps/assessments/uploads.py
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+PDF_STORAGE_PREFIX = 'course_notes/pdfs/sha256'
+PDF_MAGIC = b'%PDF-'
+MAX_PDF_SIZE = 10 * 1024 * 1024  # 10MB
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spool multipart uploads to a temporary file chunk by chunk, computing the
+    SHA-256 on the way so the upload never has to be held or re-read in memory.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+class StreamingUploadMixin:
+    """Install HashingFileUploadHandler before DRF parses the request body"""
+
+    def initial(self, request, *args, **kwargs):
+        request._request.upload_handlers = [HashingFileUploadHandler(request._request)]
+        super().initial(request, *args, **kwargs)
+
+
+def file_sha256(file):
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def is_pdf(file):
+    file.seek(0)
+    header = file.read(len(PDF_MAGIC))
+    file.seek(0)
+    return header == PDF_MAGIC
+
+
+def content_path(sha256):
+    return f"{PDF_STORAGE_PREFIX}/{sha256[:2]}/{sha256}.pdf"
+
+
+def store_content_addressed(file):
+    """
+    Store file under its SHA-256 and return (storage name, sha256). Identical
+    uploads resolve to the same name, so each distinct PDF is written once.
+    """
+    sha256 = getattr(file, 'sha256', None) or file_sha256(file)
+    name = content_path(sha256)
+    if not default_storage.exists(name):
+        file.seek(0)
+        name = default_storage.save(name, file)
+    return name, sha256
+
+
+def release_content(name, referencing_queryset):
+    """Delete a stored blob once no remaining row references it; returns whether it was deleted"""
+    if name and not referencing_queryset.exists():
+        default_storage.delete(name)
+        return True
+    return False
@@ -14,7 +14,9 @@ urlpatterns = [
     path('my-assessments/', views.StudentAssessmentListView.as_view(), name='my-assessments'),
     path('assessment/<int:assessment_id>/start/', views.start_assessment, name='start-assessment'),
     path('assessment/submit/', views.submit_assessment, name='submit-assessment'),
+    path('assessment/<int:assessment_id>/draft/', views.save_assessment_draft, name='save-assessment-draft'),
     path('assessment/<int:assessment_id>/results/', views.assessment_results, name='assessment-results'),
+    path('assessment/<int:assessment_id>/item-analysis/', views.assessment_item_analysis, name='assessment-item-analysis'),
     
     # Include router URLs for CourseNoteViewSet
     path('', include(router.urls)),
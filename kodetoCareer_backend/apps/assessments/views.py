@@ -4,18 +4,24 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.db import transaction
 from .models import Assessment, Question, QuestionOption, StudentAssessment, StudentAnswer
+from .grading import compile_questions, finalize_attempt, normalize_answer_payload
+from .deadlines import attempt_deadline, submission_grace
+from .papers import attempt_questions, generate_paper, paper_questions_in_order
+from .analytics import get_item_analysis
 from .serializers import (
     AssessmentSerializer, AssessmentListSerializer, StudentAssessmentSerializer,
-    AssessmentSubmissionSerializer
+    AssessmentSubmissionSerializer, AssessmentDraftSerializer, QuestionSerializer
 )
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, Http404
+from django.http import FileResponse, Http404
 from django.db.models import Q
-from .models import CourseNote, Course
+from .models import CourseNote, Course, note_downloads
+from .uploads import StreamingUploadMixin
+from .note_search import search_notes
 class AssessmentListView(generics.ListAPIView):
     serializer_class = AssessmentListSerializer
     permission_classes = [IsAuthenticated]
@@ -48,6 +54,15 @@ class StudentAssessmentListView(generics.ListAPIView):
     def get_queryset(self):
         return StudentAssessment.objects.filter(student=self.request.user)
 
+def attempt_assessment_data(student_assessment):
+    """Assessment payload for an attempt, listing its drawn questions if it has a paper"""
+    data = AssessmentSerializer(student_assessment.assessment).data
+    if student_assessment.paper:
+        data['questions'] = QuestionSerializer(
+            paper_questions_in_order(student_assessment.paper), many=True
+        ).data
+    return data
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def start_assessment(request, assessment_id):
@@ -58,27 +73,58 @@ def start_assessment(request, assessment_id):
         if not request.user.enrollments.filter(course=assessment.course, is_active=True).exists():
             return Response({'error': 'You are not enrolled in this course'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Check if user has attempts left
-        attempts_count = StudentAssessment.objects.filter(
-            student=request.user,
-            assessment=assessment
-        ).count()
-        
-        if attempts_count >= assessment.max_attempts:
-            return Response({'error': 'Maximum attempts reached'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create new assessment attempt
-        student_assessment = StudentAssessment.objects.create(
-            student=request.user,
-            assessment=assessment,
-            attempt_number=attempts_count + 1,
-            status='in_progress'
-        )
+        with transaction.atomic():
+            # Resume an attempt that is still running; close one whose time ran out
+            current = StudentAssessment.objects.select_for_update().filter(
+                student=request.user,
+                assessment=assessment,
+                status='in_progress'
+            ).first()
+            if current and not current.is_expired(submission_grace().total_seconds()):
+                return Response({
+                    'message': 'Assessment resumed',
+                    'student_assessment_id': current.id,
+                    'expires_at': current.expires_at,
+                    'draft_answers': current.draft_answers,
+                    'assessment': attempt_assessment_data(current)
+                })
+            if current:
+                finalize_attempt(
+                    current, current.draft_answers, compile_questions(attempt_questions(current)),
+                    submitted_at=current.expires_at, strict=False, auto_submitted=True
+                )
+            
+            # Check if user has attempts left
+            attempts_count = StudentAssessment.objects.filter(
+                student=request.user,
+                assessment=assessment
+            ).count()
+            
+            if attempts_count >= assessment.max_attempts:
+                return Response({'error': 'Maximum attempts reached'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Draw this attempt's questions when the assessment is built from a question bank
+            try:
+                paper = generate_paper(assessment)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Create new assessment attempt
+            now = timezone.now()
+            student_assessment = StudentAssessment.objects.create(
+                student=request.user,
+                assessment=assessment,
+                attempt_number=attempts_count + 1,
+                status='in_progress',
+                expires_at=attempt_deadline(assessment, now),
+                paper=paper
+            )
         
         return Response({
             'message': 'Assessment started successfully',
             'student_assessment_id': student_assessment.id,
-            'assessment': AssessmentSerializer(assessment).data
+            'expires_at': student_assessment.expires_at,
+            'assessment': attempt_assessment_data(student_assessment)
         })
     
     except Assessment.DoesNotExist:
@@ -97,46 +143,36 @@ def submit_assessment(request):
                 assessment = Assessment.objects.get(id=assessment_id)
                 
                 # Get the current student assessment
-                student_assessment = StudentAssessment.objects.get(
+                student_assessment = StudentAssessment.objects.select_for_update().get(
                     student=request.user,
                     assessment=assessment,
                     status='in_progress'
                 )
+                compiled = compile_questions(attempt_questions(student_assessment))
+                submitted_at = timezone.now()
                 
-                total_marks = 0
-                
-                # Process each answer
-                for answer_data in answers_data:
-                    question = Question.objects.get(id=answer_data['question'])
-                    
-                    # Create student answer
-                    student_answer = StudentAnswer.objects.create(
-                        student_assessment=student_assessment,
-                        question=question,
-                        selected_option_id=answer_data.get('selected_option'),
-                        answer_text=answer_data.get('answer_text', '')
+                # Past the deadline and grace window: grade the saved draft instead
+                if student_assessment.is_expired(submission_grace().total_seconds()):
+                    finalize_attempt(
+                        student_assessment, student_assessment.draft_answers, compiled,
+                        submitted_at=student_assessment.expires_at, strict=False, auto_submitted=True
                     )
-                    
-                    # Auto-grade MCQ and True/False questions
-                    if question.question_type in ['mcq', 'true_false']:
-                        if student_answer.selected_option and student_answer.selected_option.is_correct:
-                            student_answer.marks_awarded = question.marks
-                            student_answer.is_correct = True
-                            total_marks += question.marks
-                        student_answer.save()
+                    return Response({
+                        'error': 'Time limit exceeded. Your last saved draft was submitted.',
+                        'obtained_marks': student_assessment.obtained_marks,
+                        'total_marks': assessment.total_marks,
+                        'status': student_assessment.status
+                    }, status=status.HTTP_400_BAD_REQUEST)
                 
-                # Update student assessment
-                student_assessment.submitted_at = timezone.now()
-                student_assessment.obtained_marks = total_marks
-                student_assessment.status = 'submitted' if assessment.assessment_type in ['assignment', 'project'] else 'graded'
-                student_assessment.time_taken_minutes = (
-                    student_assessment.submitted_at - student_assessment.started_at
-                ).seconds // 60
-                student_assessment.save()
+                # Auto-grade MCQ, True/False and keyed short answer questions in one pass
+                try:
+                    finalize_attempt(student_assessment, answers_data, compiled, submitted_at=submitted_at)
+                except ValueError as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
                 
                 return Response({
                     'message': 'Assessment submitted successfully',
-                    'obtained_marks': total_marks,
+                    'obtained_marks': student_assessment.obtained_marks,
                     'total_marks': assessment.total_marks,
                     'status': student_assessment.status
                 })
@@ -146,6 +182,35 @@ def submit_assessment(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def save_assessment_draft(request, assessment_id):
+    """Save in-progress answers so they are graded if time runs out"""
+    serializer = AssessmentDraftSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        student_assessment = StudentAssessment.objects.get(
+            student=request.user,
+            assessment_id=assessment_id,
+            status='in_progress'
+        )
+    except StudentAssessment.DoesNotExist:
+        return Response({'error': 'No attempt in progress'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if student_assessment.is_expired(submission_grace().total_seconds()):
+        return Response({'error': 'Time limit exceeded'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    student_assessment.draft_answers = normalize_answer_payload(serializer.validated_data['answers'])
+    student_assessment.save(update_fields=['draft_answers', 'updated_at'])
+    
+    return Response({
+        'message': 'Draft saved',
+        'saved_answers': len(student_assessment.draft_answers),
+        'expires_at': student_assessment.expires_at
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def assessment_results(request, assessment_id):
@@ -163,10 +228,24 @@ def assessment_results(request, assessment_id):
     
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def assessment_item_analysis(request, assessment_id):
+    """Per-question difficulty, discrimination and distractor report (admin only)"""
+    if request.user.user_type != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        assessment = Assessment.objects.get(id=assessment_id)
+    except Assessment.DoesNotExist:
+        return Response({'error': 'Assessment not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(get_item_analysis(assessment))
     
 from .serializers import CourseNoteSerializer, CourseNoteListSerializer
 
-class CourseNoteViewSet(ModelViewSet):
+class CourseNoteViewSet(StreamingUploadMixin, ModelViewSet):
     queryset = CourseNote.objects.all()
     serializer_class = CourseNoteSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -204,21 +283,40 @@ class CourseNoteViewSet(ModelViewSet):
         # Add your course access logic here
         
         try:
-            # Increment download count
-            note.download_count += 1
-            note.save(update_fields=['download_count'])
+            # Buffered so concurrent downloads neither lose counts nor write the row
+            note_downloads.increment(note.pk)
             
-            # Serve file
-            response = HttpResponse(
-                note.pdf_file.read(),
+            # Stream the file in chunks rather than reading it into memory
+            return FileResponse(
+                note.pdf_file.open('rb'),
+                as_attachment=True,
+                filename=f"{note.title}.pdf",
                 content_type='application/pdf'
             )
-            response['Content-Disposition'] = f'attachment; filename="{note.title}.pdf"'
-            return response
         
         except FileNotFoundError:
             raise Http404("File not found")
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search inside the notes of courses the user can access"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'query': query, 'results': search_notes(request.user, query, limit)})
+    
     @action(detail=False, methods=['get'])
     def by_course(self, request):
         """Get notes by course ID"""
@@ -240,7 +338,7 @@ class CourseNoteViewSet(ModelViewSet):
         serializer = CourseNoteListSerializer(notes, many=True)
         return Response(serializer.data)
 
-class CourseNoteUploadView(generics.CreateAPIView):
+class CourseNoteUploadView(StreamingUploadMixin, generics.CreateAPIView):
     serializer_class = CourseNoteSerializer
     permission_classes = [permissions.IsAuthenticated]
     
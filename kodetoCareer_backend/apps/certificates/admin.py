@@ -1,12 +1,15 @@
 # apps/certificates/admin.py
 from django.contrib import admin
+from apps.common.admin import PerformanceModelAdmin
 from .models import Certificate, CertificateTemplate, CertificateVerification
 
 @admin.register(Certificate)
-class CertificateAdmin(admin.ModelAdmin):
+class CertificateAdmin(PerformanceModelAdmin):
     list_display = ['certificate_number', 'user', 'certificate_type', 'title', 'issue_date', 'is_valid']
     list_filter = ['certificate_type', 'is_valid', 'issue_date']
     search_fields = ['certificate_number', 'user__username', 'user__email', 'title']
+    list_select_related = ['user']
+    autocomplete_fields = ['user', 'course', 'bundle']
     readonly_fields = ['id', 'certificate_number', 'created_at', 'updated_at']
 
 @admin.register(CertificateTemplate)
@@ -16,7 +19,9 @@ class CertificateTemplateAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
 
 @admin.register(CertificateVerification)
-class CertificateVerificationAdmin(admin.ModelAdmin):
+class CertificateVerificationAdmin(PerformanceModelAdmin):
     list_display = ['certificate', 'verified_by', 'verification_date', 'ip_address']
     list_filter = ['verification_date']
-    search_fields = ['certificate__certificate_number', 'verified_by__username']
\ No newline at end of file
+    search_fields = ['certificate__certificate_number', 'verified_by__username']
+    list_select_related = ['certificate__user', 'verified_by']
+    autocomplete_fields = ['certificate', 'verified_by']
\ No newline at end of file
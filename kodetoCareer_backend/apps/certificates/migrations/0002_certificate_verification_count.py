@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='verification_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
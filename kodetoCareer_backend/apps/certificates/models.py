@@ -9,6 +9,8 @@ from django.core.files import File
 from PIL import Image, ImageDraw, ImageFont
 import os
 
+from apps.common.counters import BufferedCounter
+
 class CertificateTemplate(models.Model):
     name = models.CharField(max_length=200)
     template_file = models.ImageField(upload_to='certificate_templates/')
@@ -43,6 +45,7 @@ class Certificate(models.Model):
     qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True)
     is_valid = models.BooleanField(default=True)
     verification_url = models.URLField(blank=True)
+    verification_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -182,6 +185,9 @@ class Certificate(models.Model):
         except Exception as e:
             print(f"Error generating certificate: {e}")
 
+certificate_verifications = BufferedCounter(Certificate, 'verification_count')
+
+
 class CertificateVerification(models.Model):
     certificate = models.ForeignKey(Certificate, on_delete=models.CASCADE)
     verified_by = models.ForeignKey('accounts.User', on_delete=models.CASCADE, null=True, blank=True)
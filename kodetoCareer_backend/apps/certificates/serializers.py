@@ -1,7 +1,8 @@
 
 # apps/certificates/serializers.py
 from rest_framework import serializers
-from .models import Certificate, CertificateTemplate, CertificateVerification
+from apps.common.serializers import BufferedCountField, BufferedCountListSerializer
+from .models import Certificate, CertificateTemplate, CertificateVerification, certificate_verifications
 
 class CertificateTemplateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,6 +14,7 @@ class CertificateSerializer(serializers.ModelSerializer):
     course_title = serializers.CharField(source='course.title', read_only=True)
     bundle_title = serializers.CharField(source='bundle.title', read_only=True)
     template_name = serializers.CharField(source='template.name', read_only=True)
+    verification_count = BufferedCountField(certificate_verifications)
 
     class Meta:
         model = Certificate
@@ -20,8 +22,9 @@ class CertificateSerializer(serializers.ModelSerializer):
             'id', 'certificate_type', 'certificate_number', 'title', 'description',
             'issue_date', 'completion_date', 'certificate_file', 'qr_code',
             'is_valid', 'verification_url', 'user_name', 'course_title', 
-            'bundle_title', 'template_name'
+            'bundle_title', 'template_name', 'verification_count'
         ]
+        list_serializer_class = BufferedCountListSerializer
 
 class CertificateVerificationSerializer(serializers.ModelSerializer):
     certificate_data = CertificateSerializer(source='certificate', read_only=True)
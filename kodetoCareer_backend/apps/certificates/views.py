@@ -7,7 +7,7 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
 from django.utils import timezone
-from .models import Certificate, CertificateTemplate, CertificateVerification
+from .models import Certificate, CertificateTemplate, CertificateVerification, certificate_verifications
 from .serializers import CertificateSerializer, CertificateTemplateSerializer, CertificateVerificationSerializer
 from apps.courses.models import Course, CustomCourseBundle
 from apps.progress.models import CourseProgress, BundleProgress
@@ -155,6 +155,7 @@ def verify_certificate(request, certificate_id):
             ip_address=ip_address,
             user_agent=user_agent
         )
+        certificate_verifications.increment(certificate.pk)
         
         serializer = CertificateSerializer(certificate)
         return Response({
@@ -1,3 +1,90 @@
+# apps/common/admin.py
+import logging
+from functools import wraps
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def estimated_row_count(model, using='default'):
+    """Planner estimate of a table's rows on PostgreSQL, or None elsewhere / before the first ANALYZE"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if not row or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner's row estimate for unfiltered changelists of large
+    tables instead of an exact COUNT(*). Filtered or searched lists, and
+    small tables, are still counted exactly.
+    """
+    threshold = ESTIMATED_COUNT_THRESHOLD
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class PerformanceModelAdmin(admin.ModelAdmin):
+    """
+    Base admin for high-volume models: estimated changelist counts and no
+    second full-table count for the "N total" link. Subclasses declare
+    list_select_related for every FK shown in list_display or __str__,
+    and autocomplete_fields for FKs on large tables.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+def _run_in_chunks(func, modeladmin, model, ids, chunk_size):
+    processed = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = model._default_manager.filter(pk__in=ids[start:start + chunk_size])
+        processed += func(modeladmin, chunk) or 0
+    logger.info(f"Admin action {func.__name__} processed {processed} of {len(ids)} {model._meta.verbose_name_plural}")
+
 
-# Register your models here.
+def background_action(description, chunk_size=500):
+    """
+    Turn an admin action into a background job. The selected ids are read
+    up front, then func(modeladmin, queryset) runs once per chunk of
+    chunk_size rows after the request commits, and should return how many
+    rows it changed. Nothing records the job, so chunks not yet run when the
+    process restarts are lost; write actions so running them again on the
+    same selection is safe.
+    """
+    def decorator(func):
+        @wraps(func)
+        def action(modeladmin, request, queryset):
+            ids = list(queryset.order_by().values_list('pk', flat=True))
+            run_in_background(_run_in_chunks, func, modeladmin, queryset.model, ids, chunk_size)
+            modeladmin.message_user(
+                request,
+                f"{len(ids)} {queryset.model._meta.verbose_name_plural} queued: {description.lower()}."
+            )
+        action.short_description = description
+        return action
+    return decorator
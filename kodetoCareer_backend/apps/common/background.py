@@ -0,0 +1,48 @@
+# apps/common/background.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 4),
+            thread_name_prefix='background-task',
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Background task {func.__module__}.{func.__name__} failed")
+    finally:
+        # Worker threads hold their own DB connections; release them between tasks
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) off the request thread once the current
+    transaction commits. With BACKGROUND_TASKS_EAGER the task runs inline,
+    which keeps tests and management commands deterministic.
+
+    The pool lives in this process: tasks queued or running when it exits
+    are lost without a trace. Callers keep their own state in the database
+    so a command or scheduler can finish lost work, or say in their
+    docstring that it cannot be recovered.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
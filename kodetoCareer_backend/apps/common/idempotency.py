@@ -0,0 +1,92 @@
+# apps/common/idempotency.py
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+
+
+def _cache_key(scope, user_id, key):
+    return f"idempotency:{scope}:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _wait_for_response(cache_key, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return stored
+        if cache.get(f"{cache_key}:lock") is None:
+            return None  # the first request finished without storing a response (5xx)
+    return None
+
+
+def idempotent(scope):
+    """
+    Honour an Idempotency-Key header on a DRF view method. The first
+    response (2xx or 4xx) per (user, key) is kept in the cache for
+    IDEMPOTENCY_KEY_TTL seconds and replayed to retries. While the first
+    request is still running, duplicates wait up to IDEMPOTENCY_WAIT_SECONDS
+    for its response and otherwise get 409, so they never redo its side
+    effects. Reusing a key with a different body is rejected with 422.
+    Needs a shared cache (Redis) to hold across workers.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key or not request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            cache_key = _cache_key(scope, request.user.pk, key)
+            lock_key = f"{cache_key}:lock"
+            fingerprint = hashlib.sha256(request.body).hexdigest()
+            ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+            lock_timeout = getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60)
+
+            stored = cache.get(cache_key)
+            if stored is None and not cache.add(lock_key, fingerprint, lock_timeout):
+                # The same key is in flight in another request
+                stored = _wait_for_response(cache_key, getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 5))
+                if stored is None:
+                    return Response(
+                        {'error': 'A request with this Idempotency-Key is still being processed'},
+                        status=status.HTTP_409_CONFLICT,
+                        headers={'Retry-After': '1'}
+                    )
+
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response(
+                        {'error': f'{HEADER} was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+                # Server errors are not stored, so the client may retry them with the same key
+                if response.status_code < 500:
+                    cache.set(cache_key, {
+                        'fingerprint': fingerprint,
+                        'status': response.status_code,
+                        'data': response.data,
+                    }, ttl)
+                return response
+            finally:
+                cache.delete(lock_key)
+        return wrapper
+    return decorator
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.counters import flush_counters
+
+
+class Command(BaseCommand):
+    help = "Write buffered download/play/verification counts to the database (run every minute)"
+
+    def handle(self, *args, **options):
+        for name, updated in flush_counters().items():
+            self.stdout.write(f"{name}: {updated} rows updated")
+        self.stdout.write(self.style.SUCCESS("Counters flushed"))
@@ -1,3 +1,4 @@
+from django.core.paginator import Paginator
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
@@ -6,12 +7,25 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
     
-    def get_paginated_response(self, data):
-        return Response({
+    def get_page_info(self):
+        return {
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
-            'results': data
-        })
\ No newline at end of file
+        }
+    
+    def get_paginated_response(self, data):
+        return Response({**self.get_page_info(), 'results': data})
+
+class KnownCountPagination(CustomPagination):
+    """CustomPagination for lists whose length is already known (e.g. from a rollup), so no COUNT(*) runs"""
+    
+    def __init__(self, count):
+        self.count = count
+    
+    def django_paginator_class(self, object_list, per_page, **kwargs):
+        paginator = Paginator(object_list, per_page, **kwargs)
+        paginator.count = self.count
+        return paginator
\ No newline at end of file
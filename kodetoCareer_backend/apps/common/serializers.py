@@ -0,0 +1,37 @@
+# apps/common/serializers.py
+from django.db import models
+from rest_framework import serializers
+
+
+class BufferedCountField(serializers.ReadOnlyField):
+    """
+    A BufferedCounter's field plus its unflushed increments. Serializers
+    using it set Meta.list_serializer_class = BufferedCountListSerializer,
+    so a list reads the increments of the whole page in one round trip.
+    """
+
+    def __init__(self, counter, **kwargs):
+        self.counter = counter
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        page = getattr(self.parent, '_pending_counts', {}).get(self.field_name)
+        if page is None:
+            return self.counter.value(obj)
+        return getattr(obj, self.counter.field) + page.get(str(obj.pk), 0)
+
+
+class BufferedCountListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        pks = [item.pk for item in items]
+        self.child._pending_counts = {
+            name: field.counter.pending(pks)
+            for name, field in self.child.fields.items()
+            if isinstance(field, BufferedCountField)
+        }
+        try:
+            return super().to_representation(items)
+        finally:
+            del self.child._pending_counts
@@ -1,3 +1,54 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.accounts.models import User
+from apps.assessments.models import CourseNote, note_downloads
+from apps.assessments.serializers import CourseNoteListSerializer
+from apps.courses.models import Category, Course
+from .counters import redis_client
+
+
+class BufferedCountFieldTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(
+            category=category, title='Python', slug='python', description='Basics',
+            price=100, duration_hours=10,
+        )
+        user = User.objects.create_user(username='admin', email='admin@example.com', password='pw')
+        self.notes = [
+            CourseNote.objects.create(
+                course=course, title=f"Note {number}", pdf_file=f"course_notes/pdfs/{number}.pdf",
+                file_size=1, uploaded_by=user, download_count=number,
+            )
+            for number in range(3)
+        ]
+
+    def test_list_reads_pending_increments_once_per_page(self):
+        with mock.patch.object(note_downloads, 'pending', return_value={str(self.notes[1].pk): 5}) as pending:
+            data = CourseNoteListSerializer(CourseNote.objects.order_by('id'), many=True).data
+
+        pending.assert_called_once_with([note.pk for note in self.notes])
+        self.assertEqual([row['download_count'] for row in data], [0, 6, 2])
+
+    def test_single_object_adds_its_own_pending_increments(self):
+        with mock.patch.object(note_downloads, 'pending', return_value={str(self.notes[2].pk): 1}):
+            data = CourseNoteListSerializer(self.notes[2]).data
+
+        self.assertEqual(data['download_count'], 3)
+
+
+class RedisClientTests(SimpleTestCase):
+    @override_settings(REDIS_URL='')
+    def test_none_without_redis_url(self):
+        self.assertIsNone(redis_client())
+
+    def test_one_client_per_url(self):
+        with override_settings(REDIS_URL='redis://cache-1:6379/2'):
+            client = redis_client()
+            self.assertIs(redis_client(), client)
+            self.assertEqual(client.connection_pool.connection_kwargs['host'], 'cache-1')
+            self.assertEqual(client.connection_pool.connection_kwargs['db'], 2)
+        with override_settings(REDIS_URL='redis://cache-2:6379/0'):
+            self.assertIsNot(redis_client(), client)
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from apps.common.admin import PerformanceModelAdmin
 from .models import (
     Category,
     Course,
@@ -40,52 +41,64 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'instructor', 'price', 'discounted_price', 'duration_hours', 'difficulty_level', 'is_published', 'enrollment_count', 'rating')
-    search_fields = ('title', 'description', 'instructor__username', 'category__name')
+    search_fields = ('title', 'description', 'instructor', 'category__name')
     list_filter = ('is_published', 'difficulty_level', 'category')
+    list_select_related = ('category',)
     inlines = [CourseSectionInline, CourseResourceInline]
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(CourseSection)
-class CourseSectionAdmin(admin.ModelAdmin):
+class CourseSectionAdmin(PerformanceModelAdmin):
     list_display = ('title', 'course', 'order')
     search_fields = ('title', 'course__title')
     list_filter = ('course',)
+    list_select_related = ('course',)
+    autocomplete_fields = ('course',)
     inlines = [LessonInline]
     ordering = ('course', 'order')
 
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(PerformanceModelAdmin):
     list_display = ('title', 'section', 'lesson_type', 'is_free', 'video_duration', 'order')
     search_fields = ('title', 'content', 'section__course__title')
     list_filter = ('lesson_type', 'is_free')
+    list_select_related = ('section__course',)
+    autocomplete_fields = ('section',)
     ordering = ('section', 'order')
 
 
 @admin.register(CourseResource)
-class CourseResourceAdmin(admin.ModelAdmin):
+class CourseResourceAdmin(PerformanceModelAdmin):
     list_display = ('title', 'course', 'resource_type')
     search_fields = ('title', 'course__title')
     list_filter = ('resource_type',)
+    list_select_related = ('course',)
+    autocomplete_fields = ('course',)
 
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(PerformanceModelAdmin):
     list_display = ('student', 'course', 'enrollment_date', 'is_active', 'completion_percentage')
     search_fields = ('student__username', 'course__title')
     list_filter = ('is_active', 'enrollment_date')
+    list_select_related = ('student', 'course')
+    autocomplete_fields = ('student', 'course', 'payment')
 
 
 @admin.register(CourseReview)
-class CourseReviewAdmin(admin.ModelAdmin):
+class CourseReviewAdmin(PerformanceModelAdmin):
     list_display = ('course', 'student', 'rating')
     search_fields = ('course__title', 'student__username', 'review_text')
     list_filter = ('rating',)
+    list_select_related = ('course', 'student')
+    autocomplete_fields = ('course', 'student')
 
 
 @admin.register(CustomCourseBundle)
-class CustomCourseBundleAdmin(admin.ModelAdmin):
+class CustomCourseBundleAdmin(PerformanceModelAdmin):
     list_display = ('student', 'name', 'total_price', 'discount_percentage', 'final_price')
     search_fields = ('student__username', 'name')
-    filter_horizontal = ('courses',)
+    list_select_related = ('student',)
+    autocomplete_fields = ('student', 'courses')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_enrollment_options_enrollment_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recordedvideo',
+            name='play_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
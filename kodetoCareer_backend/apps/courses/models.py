@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from apps.common.counters import BufferedCounter
 from apps.common.models import TimeStampedModel
 from django.conf import settings
 from django.core.exceptions import ValidationError
@@ -183,10 +184,14 @@ class RecordedVideo(models.Model):
         validators=[validate_video_size]
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    play_count = models.IntegerField(default=0)
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
     @property
     def filename(self):
-        return os.path.basename(self.video.name)
\ No newline at end of file
+        return os.path.basename(self.video.name)
+
+
+video_plays = BufferedCounter(RecordedVideo, 'play_count')
@@ -6,9 +6,10 @@ import uuid
 from django.core.files.base import ContentFile
 from .models import (
     Category, Course, CourseSection, Lesson, CourseResource, 
-    Enrollment, CourseReview, CustomCourseBundle,RecordedVideo
+    Enrollment, CourseReview, CustomCourseBundle,RecordedVideo, video_plays
 )
 from apps.accounts.serializers import UserSerializer
+from apps.common.serializers import BufferedCountField, BufferedCountListSerializer
 import base64
 from rest_framework import serializers
 
@@ -180,10 +181,12 @@ class CustomCourseBundleSerializer(serializers.ModelSerializer):
 class RecordedVideoSerializer(serializers.ModelSerializer):
     video_url_base64 = serializers.SerializerMethodField()
     video_filename = serializers.CharField(source="filename", read_only=True)
+    play_count = BufferedCountField(video_plays)
 
     class Meta:
         model = RecordedVideo
-        fields = ['id', 'course', 'title', 'video_filename', 'video_url_base64', 'uploaded_at']
+        fields = ['id', 'course', 'title', 'video_filename', 'video_url_base64', 'uploaded_at', 'play_count']
+        list_serializer_class = BufferedCountListSerializer
 
     def get_video_url_base64(self, obj):
         request = self.context.get('request')
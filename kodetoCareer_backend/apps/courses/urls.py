@@ -17,6 +17,7 @@ urlpatterns = [
      path('name-slugs/', views.CourseSlugListView.as_view(), name='course-slug-list'),
      path('recorded-videos/upload/', views.RecordedVideoUploadView.as_view(), name='recorded-video-upload'),
     path('recorded-videos/<int:course_id>/', views.RecordedVideoListView.as_view(), name='recorded-video-list'),
+    path('recorded-videos/<int:video_id>/play/', views.record_video_play, name='recorded-video-play'),
     # New URLs for edit and delete functionality
     
     # Admin course management URLs
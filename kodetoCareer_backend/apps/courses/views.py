@@ -7,7 +7,7 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db.models import Q
 from apps.common.permissions import IsAdminUser
 from rest_framework import generics, permissions
-from .models import RecordedVideo, Enrollment
+from .models import RecordedVideo, Enrollment, video_plays
 from .serializers import RecordedVideoSerializer
 from rest_framework.exceptions import PermissionDenied
 
@@ -319,6 +319,22 @@ class RecordedVideoListView(generics.ListAPIView):
             raise PermissionDenied("You are not enrolled in this course.")
 
         return RecordedVideo.objects.filter(course_id=course_id)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def record_video_play(request, video_id):
+    """Count a play of a recorded video"""
+    try:
+        video = RecordedVideo.objects.get(id=video_id)
+    except RecordedVideo.DoesNotExist:
+        return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if not Enrollment.objects.filter(student=request.user, course_id=video.course_id, is_active=True).exists():
+        return Response({'error': 'You are not enrolled in this course'}, status=status.HTTP_403_FORBIDDEN)
+
+    video_plays.increment(video.id)
+    return Response({'play_count': video_plays.value(video)})
     
 class ProgrammingLanguageCoursesView(generics.ListAPIView):
     """
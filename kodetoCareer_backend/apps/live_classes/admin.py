@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import LiveClass, LiveClassAttendance
+from apps.common.admin import PerformanceModelAdmin
+from .analytics import refresh_attendance
+from .models import (
+    CourseAttendanceSummary, LiveClass, LiveClassAttendance, LiveClassAttendanceSummary, LiveClassReminder
+)
 
 
 @admin.register(LiveClass)
@@ -9,17 +13,76 @@ class LiveClassAdmin(admin.ModelAdmin):
         'scheduled_start_time', 'scheduled_end_time', 'max_participants'
     )
     list_filter = ('platform', 'status', 'scheduled_start_time', 'course')
-    search_fields = ('title', 'description', 'course__title', 'instructor__username')
+    search_fields = ('title', 'description', 'course__title', 'instructor')
+    list_select_related = ('course',)
     autocomplete_fields = ['course']
     readonly_fields = ('created_at', 'updated_at', 'actual_start_time', 'actual_end_time')
 
 
 @admin.register(LiveClassAttendance)
-class LiveClassAttendanceAdmin(admin.ModelAdmin):
+class LiveClassAttendanceAdmin(PerformanceModelAdmin):
     list_display = (
         'student', 'live_class', 'joined_at', 'left_at', 'duration_minutes'
     )
     list_filter = ('live_class__title', 'joined_at')
     search_fields = ('student__username', 'live_class__title')
+    list_select_related = ('student', 'live_class__course')
     autocomplete_fields = ['student', 'live_class']
     readonly_fields = ('created_at', 'updated_at', 'joined_at')
+    
+    # Hand edits bypass presence, so they refresh the attendance rollups themselves
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_attendance(obj.live_class_id, [obj.student_id])
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_attendance(obj.live_class_id, [obj.student_id])
+    
+    def delete_queryset(self, request, queryset):
+        touched = {}
+        for class_id, student_id in queryset.values_list('live_class_id', 'student_id'):
+            touched.setdefault(class_id, []).append(student_id)
+        super().delete_queryset(request, queryset)
+        for class_id, student_ids in touched.items():
+            refresh_attendance(class_id, student_ids)
+
+
+@admin.register(LiveClassReminder)
+class LiveClassReminderAdmin(PerformanceModelAdmin):
+    list_display = (
+        'live_class', 'offset_minutes', 'scheduled_for', 'status',
+        'notified_count', 'emailed_count', 'sent_at'
+    )
+    list_filter = ('status', 'scheduled_for')
+    search_fields = ('live_class__title', 'live_class__course__title')
+    list_select_related = ('live_class__course',)
+    autocomplete_fields = ['live_class']
+    readonly_fields = (
+        'status', 'notified_count', 'emailed_count', 'sent_at', 'error', 'created_at', 'updated_at'
+    )
+
+
+@admin.register(CourseAttendanceSummary)
+class CourseAttendanceSummaryAdmin(PerformanceModelAdmin):
+    list_display = (
+        'student', 'course', 'classes_attended', 'total_minutes', 'on_time_count', 'last_attended_at'
+    )
+    search_fields = ('student__username', 'student__email', 'course__title')
+    list_select_related = ('student', 'course')
+    autocomplete_fields = ['student', 'course']
+    # Maintained from attendance; fix drift with rebuild_attendance_rollups rather than by hand
+    readonly_fields = (
+        'classes_attended', 'total_minutes', 'on_time_count', 'last_attended_at', 'created_at', 'updated_at'
+    )
+
+
+@admin.register(LiveClassAttendanceSummary)
+class LiveClassAttendanceSummaryAdmin(PerformanceModelAdmin):
+    list_display = ('live_class', 'attendees_count', 'enrolled_count', 'total_minutes', 'on_time_count')
+    search_fields = ('live_class__title', 'live_class__course__title')
+    list_select_related = ('live_class__course',)
+    autocomplete_fields = ['live_class']
+    readonly_fields = (
+        'attendees_count', 'enrolled_count', 'total_minutes', 'on_time_count', 'created_at', 'updated_at'
+    )
@@ -0,0 +1,159 @@
+# apps/live_classes/analytics.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from apps.courses.models import Enrollment
+from .models import CourseAttendanceSummary, LiveClass, LiveClassAttendance, LiveClassAttendanceSummary
+
+ROLLUP_BATCH_SIZE = 500
+COURSE_FIELDS = ('classes_attended', 'total_minutes', 'on_time_count', 'last_attended_at')
+CLASS_FIELDS = ('attendees_count', 'total_minutes', 'on_time_count', 'enrolled_count')
+HELD_STATUSES = ('live', 'completed')
+
+
+def punctuality_grace():
+    return timedelta(minutes=getattr(settings, 'LIVE_CLASS_PUNCTUALITY_GRACE_MINUTES', 5))
+
+
+def percentage(part, whole):
+    return round(part * 100 / whole, 1) if whole else 0.0
+
+
+def _totals(count_name):
+    on_time = Q(joined_at__lte=F('live_class__scheduled_start_time') + punctuality_grace())
+    return {
+        count_name: Count('id'),
+        'total_minutes': Sum('duration_minutes', default=0),
+        'on_time_count': Count('id', filter=on_time),
+    }
+
+
+def _course_rows(attendances):
+    return (
+        attendances.values('student_id', course_id=F('live_class__course_id'))
+        .annotate(**_totals('classes_attended'), last_attended_at=Max('joined_at'))
+        .order_by()
+    )
+
+
+def _enrolled_counts(course_ids):
+    return dict(
+        Enrollment.objects.filter(course_id__in=course_ids, is_active=True)
+        .values('course_id').annotate(count=Count('id')).values_list('course_id', 'count')
+        .order_by()
+    )
+
+
+def _write(model, rows, unique_fields, fields):
+    model.objects.bulk_create(
+        [model(**row) for row in rows],
+        batch_size=ROLLUP_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=list(fields) + ['updated_at'],
+    )
+
+
+def refresh_attendance(class_id, student_ids):
+    """
+    Recompute the rollups touched by these students' attendance in one
+    class: the class's totals and each student's totals for its course.
+    Only the touched keys are read, through the attendance indexes, and
+    recomputing instead of adding deltas keeps repeated flushes harmless.
+    """
+    course_id = LiveClass.objects.filter(id=class_id).values_list('course_id', flat=True).first()
+    if course_id is None:
+        return
+    student_ids = list(student_ids)
+
+    class_row = LiveClassAttendance.objects.filter(live_class_id=class_id).aggregate(**_totals('attendees_count'))
+    class_row['enrolled_count'] = _enrolled_counts([course_id]).get(course_id, 0)
+    with transaction.atomic():
+        _write(LiveClassAttendanceSummary, [{'live_class_id': class_id, **class_row}], ['live_class'], CLASS_FIELDS)
+        for start in range(0, len(student_ids), ROLLUP_BATCH_SIZE):
+            batch = student_ids[start:start + ROLLUP_BATCH_SIZE]
+            rows = list(_course_rows(LiveClassAttendance.objects.filter(
+                live_class__course_id=course_id, student_id__in=batch
+            )))
+            _write(CourseAttendanceSummary, rows, ['course', 'student'], COURSE_FIELDS)
+            # Students whose last attendance in the course was deleted
+            CourseAttendanceSummary.objects.filter(course_id=course_id, student_id__in=batch).exclude(
+                student_id__in=[row['student_id'] for row in rows]
+            ).delete()
+
+
+def rebuild_attendance(course_id=None):
+    """
+    Recompute both rollups from attendance, for one course or all of them.
+    Used to backfill and to correct drift after attendance is edited by
+    hand. Returns the number of (course rows, class rows) written.
+    """
+    attendances = LiveClassAttendance.objects.all()
+    course_rows = CourseAttendanceSummary.objects.all()
+    class_rows = LiveClassAttendanceSummary.objects.all()
+    if course_id:
+        attendances = attendances.filter(live_class__course_id=course_id)
+        course_rows = course_rows.filter(course_id=course_id)
+        class_rows = class_rows.filter(live_class__course_id=course_id)
+
+    classes = list(
+        attendances.values('live_class_id', course_id=F('live_class__course_id'))
+        .annotate(**_totals('attendees_count'))
+        .order_by()
+    )
+    enrolled = _enrolled_counts({row['course_id'] for row in classes})
+    with transaction.atomic():
+        course_rows.delete()
+        class_rows.delete()
+        courses = CourseAttendanceSummary.objects.bulk_create(
+            [CourseAttendanceSummary(**row) for row in _course_rows(attendances).iterator()],
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+        LiveClassAttendanceSummary.objects.bulk_create(
+            [
+                LiveClassAttendanceSummary(enrolled_count=enrolled.get(row.pop('course_id'), 0), **row)
+                for row in classes
+            ],
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+    return len(courses), len(classes)
+
+
+def student_totals(student_id):
+    """
+    A student's attendance over every course, summed from their per-course
+    rollups; read from the attendance itself if they have no rollup rows yet
+    """
+    totals = CourseAttendanceSummary.objects.filter(student_id=student_id).aggregate(
+        rows=Count('id'),
+        **{field: Sum(field, default=0) for field in ('classes_attended', 'total_minutes', 'on_time_count')}
+    )
+    if not totals.pop('rows'):
+        totals = LiveClassAttendance.objects.filter(student_id=student_id).aggregate(**_totals('classes_attended'))
+    return totals
+
+
+def class_totals(live_class):
+    """A class's attendance rollup, or one computed from its attendance (unsaved) if it has none yet"""
+    summary = LiveClassAttendanceSummary.objects.filter(live_class=live_class).first()
+    if summary is None:
+        summary = LiveClassAttendanceSummary(
+            live_class=live_class,
+            enrolled_count=_enrolled_counts([live_class.course_id]).get(live_class.course_id, 0),
+            **LiveClassAttendance.objects.filter(live_class=live_class).aggregate(**_totals('attendees_count')),
+        )
+    return summary
+
+
+def classes_held(course_id):
+    return LiveClass.objects.filter(course_id=course_id, status__in=HELD_STATUSES).count()
+
+
+def course_class_totals(course_id):
+    """Attendance over all of a course's classes, summed from their per-class rollups"""
+    return LiveClassAttendanceSummary.objects.filter(live_class__course_id=course_id).aggregate(
+        **{field: Sum(field, default=0) for field in CLASS_FIELDS}
+    )
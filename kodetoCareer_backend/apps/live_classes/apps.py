@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LiveClassesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.live_classes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
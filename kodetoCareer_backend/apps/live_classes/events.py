@@ -0,0 +1,204 @@
+# apps/live_classes/events.py
+# Push updates for live classes: watchers subscribe to a class's group and get
+# status transitions and attendee counts as they happen instead of polling.
+# Inside a process delivery is an in-memory fan-out to one queue per watcher.
+# With LIVE_EVENTS_REDIS_URL set, events go through Redis and every ASGI process
+# relays them to its own watchers, so events from the scheduler or another
+# worker reach everyone; without it only the publishing process's watchers are
+# reached, which is enough for tests and a single dev server.
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from . import presence
+from .models import LiveClass
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'live_classes:'
+WATCHER_QUEUE_SIZE = 100
+SNAPSHOT_MAX_AGE = 30
+
+
+class Subscription:
+    """One watcher's queue; events are put on it from any thread via its loop"""
+
+    def __init__(self, class_id, loop):
+        self.class_id = class_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=WATCHER_QUEUE_SIZE)
+
+    def _put(self, event):
+        if self.queue.full():
+            # A watcher that stopped reading loses its oldest events, not the newest state
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InMemoryChannelLayer:
+    """
+    Process-local groups of watchers, plus the last known state of each
+    watched class so new watchers get a snapshot without a database read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._state = {}
+
+    def subscribe(self, class_id):
+        subscription = Subscription(class_id, asyncio.get_running_loop())
+        with self._lock:
+            self._groups.setdefault(class_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            group = self._groups.get(subscription.class_id, set())
+            group.discard(subscription)
+            if not group:
+                self._groups.pop(subscription.class_id, None)
+                self._state.pop(subscription.class_id, None)
+
+    def watchers(self, class_id):
+        with self._lock:
+            return len(self._groups.get(class_id, ()))
+
+    def snapshot(self, class_id):
+        with self._lock:
+            state = self._state.get(class_id)
+        if state and time.monotonic() - state['_at'] < SNAPSHOT_MAX_AGE:
+            return {key: value for key, value in state.items() if key != '_at'}
+        return None
+
+    def remember(self, class_id, state):
+        with self._lock:
+            self._state[class_id] = {**self._state.get(class_id, {}), **state, '_at': time.monotonic()}
+
+    def dispatch(self, class_id, event):
+        with self._lock:
+            group = list(self._groups.get(class_id, ()))
+        if not group:
+            return
+        self.remember(class_id, {key: value for key, value in event.items() if key != 'type'})
+        for subscription in group:
+            subscription.deliver(event)
+
+    def publish(self, class_id, event):
+        self.dispatch(class_id, event)
+
+
+class RedisChannelLayer(InMemoryChannelLayer):
+    """Publishes through Redis; one pattern subscription per process feeds the local groups"""
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._client = None
+        self._listener = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, class_id, event):
+        self._redis().publish(f"{CHANNEL_PREFIX}{class_id}", json.dumps(event, default=str))
+
+    def subscribe(self, class_id):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return super().subscribe(class_id)
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        class_id = int(message['channel'].decode().removeprefix(CHANNEL_PREFIX))
+                        self.dispatch(class_id, json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live class event listener lost its Redis connection; reconnecting")
+                await asyncio.sleep(1)
+
+
+_layer = None
+
+
+def get_channel_layer():
+    global _layer
+    if _layer is None:
+        url = getattr(settings, 'LIVE_EVENTS_REDIS_URL', '')
+        _layer = RedisChannelLayer(url) if url else InMemoryChannelLayer()
+    return _layer
+
+
+def status_event(live_class):
+    return {
+        'type': 'status',
+        'class_id': live_class.id,
+        'status': live_class.status,
+        'actual_start': live_class.actual_start_time.isoformat() if live_class.actual_start_time else None,
+        'actual_end': live_class.actual_end_time.isoformat() if live_class.actual_end_time else None,
+        'meeting_url': live_class.meeting_url if live_class.status == 'live' else None,
+    }
+
+
+def current_attendees(class_id):
+    return presence.online_count(class_id)
+
+
+def load_snapshot(live_class):
+    """Status of a class plus its current attendee count"""
+    return {**status_event(live_class), 'current_attendees': current_attendees(live_class.id)}
+
+
+def _publish(class_id, event):
+    try:
+        get_channel_layer().publish(class_id, event)
+    except Exception:
+        # Watchers catch up from the next event or their reconnect snapshot
+        logger.exception(f"Could not publish {event['type']} event for live class {class_id}")
+
+
+def publish_status(live_class):
+    """Broadcast a class's status once the current transaction commits"""
+    event = status_event(live_class)
+    transaction.on_commit(lambda: _publish(live_class.id, event))
+
+
+def publish_statuses(class_ids):
+    """Broadcast the status of classes changed in bulk (e.g. by the scheduler)"""
+    def send():
+        for live_class in LiveClass.objects.filter(id__in=class_ids).only(
+            'id', 'status', 'actual_start_time', 'actual_end_time', 'meeting_url'
+        ):
+            _publish(live_class.id, status_event(live_class))
+    transaction.on_commit(send)
+
+
+def publish_attendees(class_id):
+    """Broadcast a class's current attendee count once the current transaction commits"""
+    def send():
+        _publish(class_id, {'type': 'attendees', 'class_id': class_id, 'current_attendees': current_attendees(class_id)})
+    transaction.on_commit(send)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.live_classes.presence import flush_presence
+
+
+class Command(BaseCommand):
+    help = "Write live-class presence to attendance records and close lapsed sessions (run every minute)"
+
+    def handle(self, *args, **options):
+        summary = flush_presence()
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['opened']} sessions opened, {summary['closed']} closed "
+            f"across {summary['classes']} classes"
+        ))
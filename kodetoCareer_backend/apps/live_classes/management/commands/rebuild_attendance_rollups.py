@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.live_classes.analytics import rebuild_attendance
+
+
+class Command(BaseCommand):
+    help = "Backfill or recompute the per-course and per-class attendance rollups from attendance"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Only rebuild this course id; all courses by default')
+
+    def handle(self, *args, **options):
+        courses, classes = rebuild_attendance(options['course'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{courses} course attendance rows and {classes} class attendance rows written"
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.live_classes.reminders import next_reminder_time, send_due_reminders
+from apps.live_classes.tasks import next_transition_time, update_live_class_status
+
+
+class Command(BaseCommand):
+    help = (
+        "Start and complete live classes at their scheduled times and send their reminders. "
+        "Runs as a long-lived process that sleeps until the next transition or reminder; "
+        "use --once from cron instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Apply due transitions and reminders once and exit')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--max-sleep', type=float,
+            default=getattr(settings, 'LIVE_CLASS_SCHEDULER_MAX_SLEEP', 60),
+            help='Upper bound on a sleep, so newly created or rescheduled classes are picked up',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            summary = update_live_class_status(batch_size=options['batch_size'])
+            # The process exits next, so the fan-out can't be left to background threads
+            reminders = send_due_reminders(inline=True)
+            self.stdout.write(self.style.SUCCESS(
+                f"{summary['started']} classes started, {summary['completed']} completed, "
+                f"{reminders} reminders sent"
+            ))
+            return
+
+        try:
+            while True:
+                summary = update_live_class_status(batch_size=options['batch_size'])
+                # After the transitions, so a class that just started is not reminded late
+                reminders = send_due_reminders()
+                if summary['started'] or summary['completed'] or reminders:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{timezone.now():%Y-%m-%d %H:%M:%S} {summary['started']} classes started, "
+                        f"{summary['completed']} completed, {reminders} reminders queued"
+                    ))
+                upcoming = [when for when in (next_transition_time(), next_reminder_time()) if when is not None]
+                upcoming = min(upcoming) if upcoming else None
+                close_old_connections()
+                delay = options['max_sleep']
+                if upcoming is not None:
+                    # At least a second, so a row another run holds locked can't spin the loop
+                    delay = min(delay, max((upcoming - timezone.now()).total_seconds(), 1))
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            self.stdout.write("Scheduler stopped")
+
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_recordedvideo_play_count'),
+        ('live_classes', '0004_alter_liveclass_meeting_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='liveclass',
+            index=models.Index(fields=['status', 'scheduled_start_time'], name='liveclass_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='liveclass',
+            index=models.Index(fields=['status', 'scheduled_end_time'], name='liveclass_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live_classes', '0005_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='liveclassattendance',
+            name='joined_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
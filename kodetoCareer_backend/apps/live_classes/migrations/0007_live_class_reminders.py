@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live_classes', '0006_attendance_joined_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveClassReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('offset_minutes', models.PositiveIntegerField(blank=True, null=True)),
+                ('scheduled_for', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('notified_count', models.IntegerField(default=0)),
+                ('emailed_count', models.IntegerField(default=0)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('live_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='live_classes.liveclass')),
+            ],
+            options={
+                'ordering': ['scheduled_for'],
+                'indexes': [models.Index(fields=['status', 'scheduled_for'], name='reminder_status_due_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('offset_minutes__isnull', False)), fields=('live_class', 'offset_minutes'), name='unique_live_class_reminder_offset')],
+            },
+        ),
+    ]
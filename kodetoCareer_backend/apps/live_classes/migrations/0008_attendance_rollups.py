@@ -0,0 +1,112 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:52
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q, Sum
+
+
+def backfill_attendance_rollups(apps, schema_editor):
+    # Same aggregation as apps.live_classes.analytics.rebuild_attendance, over all history
+    LiveClassAttendance = apps.get_model('live_classes', 'LiveClassAttendance')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    CourseAttendanceSummary = apps.get_model('live_classes', 'CourseAttendanceSummary')
+    LiveClassAttendanceSummary = apps.get_model('live_classes', 'LiveClassAttendanceSummary')
+    grace = timedelta(minutes=getattr(settings, 'LIVE_CLASS_PUNCTUALITY_GRACE_MINUTES', 5))
+    on_time = Q(joined_at__lte=F('live_class__scheduled_start_time') + grace)
+    totals = {
+        'total_minutes': Sum('duration_minutes', default=0),
+        'on_time_count': Count('id', filter=on_time),
+    }
+
+    courses = (
+        LiveClassAttendance.objects.values('student_id', course_id=F('live_class__course_id'))
+        .annotate(classes_attended=Count('id'), last_attended_at=Max('joined_at'), **totals)
+        .order_by()
+    )
+    CourseAttendanceSummary.objects.bulk_create(
+        [CourseAttendanceSummary(**row) for row in courses.iterator()], batch_size=500
+    )
+
+    classes = list(
+        LiveClassAttendance.objects.values('live_class_id', course_id=F('live_class__course_id'))
+        .annotate(attendees_count=Count('id'), **totals)
+        .order_by()
+    )
+    enrolled = dict(
+        Enrollment.objects.filter(is_active=True).values('course_id')
+        .annotate(count=Count('id')).values_list('course_id', 'count').order_by()
+    )
+    LiveClassAttendanceSummary.objects.bulk_create(
+        [LiveClassAttendanceSummary(enrolled_count=enrolled.get(row.pop('course_id'), 0), **row) for row in classes],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_recordedvideo_play_count'),
+        ('live_classes', '0007_live_class_reminders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('classes_attended', models.IntegerField(default=0)),
+                ('total_minutes', models.IntegerField(default=0)),
+                ('on_time_count', models.IntegerField(default=0)),
+                ('last_attended_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LiveClassAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('attendees_count', models.IntegerField(default=0)),
+                ('total_minutes', models.IntegerField(default=0)),
+                ('on_time_count', models.IntegerField(default=0)),
+                ('enrolled_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='liveclassattendance',
+            index=models.Index(fields=['student', '-joined_at'], name='attendance_student_joined_idx'),
+        ),
+        migrations.AddField(
+            model_name='courseattendancesummary',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='courseattendancesummary',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_attendance_summaries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='liveclassattendancesummary',
+            name='live_class',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summary', to='live_classes.liveclass'),
+        ),
+        migrations.AddIndex(
+            model_name='courseattendancesummary',
+            index=models.Index(fields=['course', '-total_minutes'], name='attendance_course_minutes_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='courseattendancesummary',
+            constraint=models.UniqueConstraint(fields=('course', 'student'), name='unique_course_attendance_summary'),
+        ),
+        migrations.RunPython(backfill_attendance_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from apps.common.models import TimeStampedModel
 from apps.courses.models import Course
@@ -39,6 +40,11 @@ class LiveClass(TimeStampedModel):
     
     class Meta:
         ordering = ['scheduled_start_time']
+        indexes = [
+            # The status scheduler finds the next class to start or end through these
+            models.Index(fields=['status', 'scheduled_start_time'], name='liveclass_status_start_idx'),
+            models.Index(fields=['status', 'scheduled_end_time'], name='liveclass_status_end_idx'),
+        ]
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -46,13 +52,88 @@ class LiveClass(TimeStampedModel):
 class LiveClassAttendance(TimeStampedModel):
     live_class = models.ForeignKey(LiveClass, on_delete=models.CASCADE, related_name='attendances')
     student = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='live_class_attendances')
-    joined_at = models.DateTimeField(auto_now_add=True)
+    # Set explicitly when presence flushes a session, so not auto_now_add
+    joined_at = models.DateTimeField(default=timezone.now)
     left_at = models.DateTimeField(null=True, blank=True)
     duration_minutes = models.IntegerField(default=0)
     
     class Meta:
         unique_together = ['live_class', 'student']
+        indexes = [
+            # A student's attendance history, newest first, a page at a time
+            models.Index(fields=['student', '-joined_at'], name='attendance_student_joined_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.live_class.title}"
 
+class CourseAttendanceSummary(TimeStampedModel):
+    """
+    A student's attendance across a course's live classes, kept up to date
+    from attendance writes by apps.live_classes.analytics
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='attendance_summaries')
+    student = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='course_attendance_summaries')
+    classes_attended = models.IntegerField(default=0)
+    total_minutes = models.IntegerField(default=0)
+    # Classes joined within LIVE_CLASS_PUNCTUALITY_GRACE_MINUTES of the scheduled start
+    on_time_count = models.IntegerField(default=0)
+    last_attended_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'student'], name='unique_course_attendance_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['course', '-total_minutes'], name='attendance_course_minutes_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.course.title}"
+
+class LiveClassAttendanceSummary(TimeStampedModel):
+    """Attendance totals for one live class, kept up to date by apps.live_classes.analytics"""
+    live_class = models.OneToOneField(LiveClass, on_delete=models.CASCADE, related_name='attendance_summary')
+    attendees_count = models.IntegerField(default=0)
+    total_minutes = models.IntegerField(default=0)
+    on_time_count = models.IntegerField(default=0)
+    # Active enrollments when the totals were last refreshed, the base of the attendance rate
+    enrolled_count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.live_class.title} attendance"
+
+
+class LiveClassReminder(TimeStampedModel):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    live_class = models.ForeignKey(LiveClass, on_delete=models.CASCADE, related_name='reminders')
+    # Minutes before scheduled_start_time; empty for reminders an admin sends by hand
+    offset_minutes = models.PositiveIntegerField(null=True, blank=True)
+    scheduled_for = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    notified_count = models.IntegerField(default=0)
+    emailed_count = models.IntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['scheduled_for']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['live_class', 'offset_minutes'],
+                condition=models.Q(offset_minutes__isnull=False),
+                name='unique_live_class_reminder_offset',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'scheduled_for'], name='reminder_status_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.live_class.title} reminder at {self.scheduled_for}"
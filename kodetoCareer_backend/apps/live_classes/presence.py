@@ -0,0 +1,318 @@
+# apps/live_classes/presence.py
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.common.counters import redis_client
+from .analytics import refresh_attendance
+from .models import LiveClassAttendance
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+FLUSH_LOCK_TIMEOUT = 5 * 60
+KEY_TTL = 24 * 60 * 60
+
+# Per class: seen (zset user -> last heartbeat), start (hash user -> session start),
+# left (hash user -> leave time, waiting for a flush), new (set of sessions not flushed yet)
+_TOUCH = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[3], 'WITHSCORES')
+for i = 1, #expired, 2 do
+    redis.call('HSET', KEYS[3], expired[i], expired[i + 1])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+local started = redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+-- Coming back before the leave was flushed resumes the same session
+if started == 1 and redis.call('HDEL', KEYS[3], ARGV[1]) == 0 then
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('SADD', KEYS[4], ARGV[1])
+end
+redis.call('SADD', KEYS[5], ARGV[4])
+for i = 1, 4 do
+    redis.call('EXPIRE', KEYS[i], ARGV[5])
+end
+return {started, redis.call('ZCARD', KEYS[1])}
+"""
+
+_LEAVE = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return false
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+return redis.call('HGET', KEYS[2], ARGV[1])
+"""
+
+_CLOSE_ALL = """
+local users = redis.call('ZRANGE', KEYS[1], 0, -1)
+for _, user in ipairs(users) do
+    redis.call('HSET', KEYS[3], user, ARGV[1])
+end
+redis.call('DEL', KEYS[1])
+return #users
+"""
+
+_COLLECT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES')
+for i = 1, #expired, 2 do
+    redis.call('HSET', KEYS[3], expired[i], expired[i + 1])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local left = redis.call('HGETALL', KEYS[3])
+redis.call('DEL', KEYS[3])
+local closed = {}
+for i = 1, #left, 2 do
+    local start = redis.call('HGET', KEYS[2], left[i]) or left[i + 1]
+    redis.call('HDEL', KEYS[2], left[i])
+    table.insert(closed, {left[i], start, left[i + 1]})
+end
+local opened = {}
+for _, user in ipairs(redis.call('SMEMBERS', KEYS[4])) do
+    local start = redis.call('HGET', KEYS[2], user)
+    if start then
+        table.insert(opened, {user, start})
+    end
+end
+redis.call('DEL', KEYS[4])
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[5], ARGV[2])
+end
+return {closed, opened}
+"""
+
+CLASSES_KEY = 'presence:classes'
+
+
+def presence_timeout():
+    return getattr(settings, 'LIVE_PRESENCE_TIMEOUT_SECONDS', 60)
+
+
+def _keys(class_id):
+    return [f"presence:{class_id}:{name}" for name in ('seen', 'start', 'left', 'new')] + [CLASSES_KEY]
+
+
+class RedisPresenceStore:
+    """Presence shared by every worker; each operation is one atomic script"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _run(self, script, class_id, *args):
+        return self.client.eval(script, 5, *_keys(class_id), *args)
+
+    def touch(self, class_id, user_id, now):
+        started, online = self._run(
+            _TOUCH, class_id, user_id, now, now - presence_timeout(), class_id, KEY_TTL
+        )
+        return bool(started), online
+
+    def leave(self, class_id, user_id, now):
+        start = self._run(_LEAVE, class_id, user_id, now)
+        return float(start) if start is not None else None
+
+    def close_all(self, class_id, now):
+        return self._run(_CLOSE_ALL, class_id, now)
+
+    def online_count(self, class_id):
+        return self.client.zcard(_keys(class_id)[0])
+
+    def last_seen(self, class_id, user_id):
+        return self.client.zscore(_keys(class_id)[0], user_id)
+
+    def class_ids(self):
+        return [int(class_id) for class_id in self.client.smembers(CLASSES_KEY)]
+
+    def collect(self, class_id, now):
+        closed, opened = self._run(_COLLECT, class_id, now - presence_timeout(), class_id)
+        return (
+            {int(user): (float(start), float(left)) for user, start, left in closed},
+            {int(user): float(start) for user, start in opened},
+        )
+
+
+class DatabasePresenceStore:
+    """
+    Presence kept directly in LiveClassAttendance when REDIS_URL is not
+    set. Per-process state would be split across web workers and never
+    seen by flush_presence, so every join and leave is written straight
+    away, as attendance was before presence. Open rows (left_at empty) are
+    the users online. Sessions have no heartbeat timeout: they close on
+    leave or when the class ends, and duration runs from the first join.
+    """
+
+    def touch(self, class_id, user_id, now):
+        attendance, started = LiveClassAttendance.objects.get_or_create(
+            live_class_id=class_id, student_id=user_id, defaults={'joined_at': _datetime(now)}
+        )
+        if not started and attendance.left_at is not None:
+            attendance.left_at = None
+            attendance.save(update_fields=['left_at', 'updated_at'])
+            started = True
+        if started:
+            refresh_attendance(class_id, [user_id])
+        return started, self.online_count(class_id)
+
+    def leave(self, class_id, user_id, now):
+        attendance = LiveClassAttendance.objects.filter(
+            live_class_id=class_id, student_id=user_id, left_at__isnull=True
+        ).first()
+        if attendance is None:
+            return None
+        self._close([attendance], now)
+        return attendance.joined_at.timestamp()
+
+    def _close(self, attendances, now):
+        left = _datetime(now)
+        for attendance in attendances:
+            attendance.left_at = left
+            attendance.duration_minutes = int((left - attendance.joined_at).total_seconds()) // 60
+            attendance.updated_at = left
+        LiveClassAttendance.objects.bulk_update(
+            attendances, ['left_at', 'duration_minutes', 'updated_at'], batch_size=FLUSH_BATCH_SIZE
+        )
+        if attendances:
+            refresh_attendance(attendances[0].live_class_id, [attendance.student_id for attendance in attendances])
+
+    def close_all(self, class_id, now):
+        attendances = list(LiveClassAttendance.objects.filter(live_class_id=class_id, left_at__isnull=True))
+        self._close(attendances, now)
+        return len(attendances)
+
+    def online_count(self, class_id):
+        return LiveClassAttendance.objects.filter(live_class_id=class_id, left_at__isnull=True).count()
+
+    def last_seen(self, class_id, user_id):
+        online = LiveClassAttendance.objects.filter(
+            live_class_id=class_id, student_id=user_id, left_at__isnull=True
+        ).exists()
+        return time.time() if online else None
+
+    def class_ids(self):
+        # Nothing is buffered, so there is never anything to flush
+        return []
+
+    def collect(self, class_id, now):
+        return {}, {}
+
+
+_database_store = DatabasePresenceStore()
+
+
+def _store():
+    client = redis_client()
+    return RedisPresenceStore(client) if client is not None else _database_store
+
+
+def heartbeat(class_id, user_id):
+    """Mark user present in the class; returns (started a new session, users online)"""
+    return _store().touch(class_id, user_id, time.time())
+
+
+def join(class_id, user_id):
+    """
+    heartbeat() for the start of a visit, which also makes sure the user
+    has an attendance row; returns (started a new session, attendance).
+    Later sessions, durations and leaves reach the row through flushes.
+    """
+    started, _ = heartbeat(class_id, user_id)
+    attendance, _ = LiveClassAttendance.objects.get_or_create(
+        live_class_id=class_id, student_id=user_id, defaults={'joined_at': timezone.now()}
+    )
+    return started, attendance
+
+
+def leave(class_id, user_id):
+    """End user's session now; returns when it started, or None if they were not present"""
+    start = _store().leave(class_id, user_id, time.time())
+    return _datetime(start) if start is not None else None
+
+
+def online_count(class_id):
+    """Users with a live session; sessions that lapsed drop out at the next heartbeat or flush"""
+    return _store().online_count(class_id)
+
+
+def is_online(class_id, user_id):
+    seen = _store().last_seen(class_id, user_id)
+    return seen is not None and seen > time.time() - presence_timeout()
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def _write_sessions(class_id, opened, closed):
+    user_ids = set(opened) | set(closed)
+    existing = {
+        attendance.student_id: attendance
+        for attendance in LiveClassAttendance.objects.filter(live_class_id=class_id, student_id__in=user_ids)
+    }
+    rows = []
+    for user_id in user_ids:
+        start = closed[user_id][0] if user_id in closed else opened[user_id]
+        row = existing.get(user_id) or LiveClassAttendance(
+            live_class_id=class_id, student_id=user_id, joined_at=_datetime(start)
+        )
+        if user_id in closed:
+            left = closed[user_id][1]
+            row.left_at = _datetime(left)
+            # Minutes add up across sessions; joined_at stays the first join
+            row.duration_minutes += int(left - start) // 60
+        else:
+            row.left_at = None
+        rows.append(row)
+
+    LiveClassAttendance.objects.bulk_create(
+        rows,
+        batch_size=FLUSH_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['live_class', 'student'],
+        update_fields=['left_at', 'duration_minutes', 'updated_at'],
+    )
+    refresh_attendance(class_id, user_ids)
+
+
+def flush_class(class_id, now=None):
+    """Write one class's new and ended sessions to LiveClassAttendance; returns (opened, closed)"""
+    from .events import publish_attendees
+
+    closed, opened = _store().collect(class_id, now or time.time())
+    if opened or closed:
+        _write_sessions(class_id, opened, closed)
+    if closed:
+        # Lapsed sessions change the count without anyone calling leave
+        publish_attendees(class_id)
+    return len(opened), len(closed)
+
+
+def flush_presence(now=None):
+    """Flush every class with presence state; returns counts of classes, opened and closed sessions"""
+    summary = {'classes': 0, 'opened': 0, 'closed': 0}
+    lock = 'presence:flush-lock'
+    if not cache.add(lock, 1, FLUSH_LOCK_TIMEOUT):
+        logger.info("Presence is already being flushed")
+        return summary
+
+    try:
+        for class_id in _store().class_ids():
+            try:
+                opened, closed = flush_class(class_id, now)
+            except Exception:
+                # collect() has already taken this run's sessions out of the store
+                logger.exception(f"Presence flush failed for live class {class_id}; its sessions from this run are lost")
+                continue
+            summary['classes'] += 1
+            summary['opened'] += opened
+            summary['closed'] += closed
+        return summary
+    finally:
+        cache.delete(lock)
+
+
+def end_class(class_id):
+    """Close every open session of a class and write them out straight away"""
+    _store().close_all(class_id, time.time())
+    return flush_class(class_id)
@@ -0,0 +1,246 @@
+# apps/live_classes/reminders.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.common.background import run_in_background
+from apps.courses.models import Enrollment
+from apps.notifications.models import Notification
+from .models import LiveClassReminder
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_CHUNK_SIZE = 1000
+EMAIL_BATCH_SIZE = 100
+HEARTBEAT_SECONDS = 60
+
+_email_executor = None
+
+
+def reminder_offsets():
+    """Minutes before a class starts at which its students are reminded automatically"""
+    return sorted(set(getattr(settings, 'LIVE_CLASS_REMINDER_OFFSETS_MINUTES', [24 * 60, 15])), reverse=True)
+
+
+def _get_email_executor():
+    # Kept apart from the background task pool: a fan-out waits on its emails,
+    # so sharing workers with it could leave nobody free to send them
+    global _email_executor
+    if _email_executor is None:
+        _email_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'LIVE_CLASS_REMINDER_EMAIL_WORKERS', 4),
+            thread_name_prefix='reminder-email',
+        )
+    return _email_executor
+
+
+def sending_timeout():
+    """How long a reminder may sit in 'sending' without progress before it counts as lost"""
+    return timedelta(minutes=getattr(settings, 'LIVE_CLASS_REMINDER_SENDING_TIMEOUT_MINUTES', 30))
+
+
+def schedule_reminders(live_class, now=None):
+    """
+    Keep a class's automatic reminders in line with its start time: one
+    pending row per offset that is still ahead, moved when the class is
+    rescheduled and dropped once it is no longer scheduled or its new time
+    has passed. Reminders already sent are left alone, so a reschedule does
+    not repeat them.
+    """
+    now = now or timezone.now()
+    automatic = LiveClassReminder.objects.filter(live_class=live_class, offset_minutes__isnull=False)
+    if live_class.status != 'scheduled':
+        automatic.filter(status='pending').delete()
+        return
+
+    offsets = reminder_offsets()
+    automatic.filter(status='pending').exclude(offset_minutes__in=offsets).delete()
+    existing = {reminder.offset_minutes: reminder for reminder in automatic}
+    created, moved, dropped = [], [], []
+    for offset in offsets:
+        when = live_class.scheduled_start_time - timedelta(minutes=offset)
+        reminder = existing.get(offset)
+        # A class created or moved at short notice only gets the reminders still ahead of it
+        if reminder is None:
+            if when > now:
+                created.append(LiveClassReminder(live_class=live_class, offset_minutes=offset, scheduled_for=when))
+        elif reminder.status == 'pending' and reminder.scheduled_for != when:
+            if when > now:
+                reminder.scheduled_for = when
+                reminder.updated_at = now
+                moved.append(reminder)
+            else:
+                dropped.append(reminder.id)
+
+    LiveClassReminder.objects.bulk_create(created, ignore_conflicts=True)
+    LiveClassReminder.objects.bulk_update(moved, ['scheduled_for', 'updated_at'])
+    LiveClassReminder.objects.filter(id__in=dropped, status='pending').delete()
+
+
+def _recipients(course_id, chunk_size):
+    """(student id, email) of the course's active students, chunk_size at a time in enrollment order"""
+    last_id = 0
+    while True:
+        rows = list(
+            Enrollment.objects.filter(
+                course_id=course_id, is_active=True, student__is_active=True, id__gt=last_id
+            ).order_by('id').values_list('id', 'student_id', 'student__email')[:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [(student_id, email) for _, student_id, email in rows]
+
+
+def _send_emails(messages):
+    """Send a batch over one SMTP connection; returns how many went out"""
+    try:
+        with get_connection() as connection:
+            return connection.send_messages(messages) or 0
+    except Exception:
+        logger.exception(f"Could not send a batch of {len(messages)} live class reminder emails")
+        return 0
+
+
+def _reminder_text(live_class):
+    starts = timezone.localtime(live_class.scheduled_start_time)
+    title = f"Reminder: {live_class.title}"
+    message = (
+        f"{live_class.title} ({live_class.course.title}) starts on "
+        f"{starts:%B %d, %Y at %I:%M %p}. Join from your course page when it goes live."
+    )
+    return title, message
+
+
+def send_reminder(reminder_id, chunk_size=RECIPIENT_CHUNK_SIZE):
+    """
+    Notify every active student of the reminder's course: in-app
+    notifications are bulk-inserted a chunk at a time and the chunk's
+    emails are handed to the email pool, where each batch reuses one SMTP
+    connection. Progress is written back as it goes, so a fan-out that
+    dies with its process can be told apart from a slow one and retried.
+    Returns (notified, emailed), or None if another run already claimed
+    the reminder.
+    """
+    # Claiming the row keeps the scheduler and a manual send from both fanning out
+    claimed = LiveClassReminder.objects.filter(id=reminder_id, status='pending').update(
+        status='sending', updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    reminder = LiveClassReminder.objects.select_related('live_class__course').get(id=reminder_id)
+    live_class = reminder.live_class
+    title, message = _reminder_text(live_class)
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+    executor = _get_email_executor()
+    notified = 0
+    batches = []
+    last_beat = time.monotonic()
+
+    def heartbeat():
+        nonlocal last_beat
+        if time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+            LiveClassReminder.objects.filter(id=reminder_id, status='sending').update(
+                notified_count=notified, updated_at=timezone.now()
+            )
+            last_beat = time.monotonic()
+
+    try:
+        for chunk in _recipients(live_class.course_id, chunk_size):
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=student_id,
+                    title=title,
+                    message=message,
+                    notification_type='live_class',
+                    priority='high',
+                    course_id=live_class.course_id,
+                )
+                for student_id, email in chunk
+            ])
+            notified += len(chunk)
+            messages = [
+                EmailMessage(subject=title, body=message, from_email=from_email, to=[email])
+                for student_id, email in chunk if email
+            ]
+            for start in range(0, len(messages), EMAIL_BATCH_SIZE):
+                batch = messages[start:start + EMAIL_BATCH_SIZE]
+                batches.append((executor.submit(_send_emails, batch), len(batch)))
+            heartbeat()
+    except Exception as error:
+        logger.exception(f"Reminder fan-out for live class {live_class.id} failed after {notified} students")
+        reminder.status = 'failed'
+        reminder.error = str(error)
+    else:
+        reminder.status = 'sent'
+
+    emailed = 0
+    for future, size in batches:
+        emailed += future.result()
+        heartbeat()
+    unsent = sum(size for future, size in batches) - emailed
+    if unsent:
+        reminder.error = '\n'.join(filter(None, [reminder.error, f"{unsent} emails could not be sent"]))
+    reminder.notified_count = notified
+    reminder.emailed_count = emailed
+    reminder.sent_at = timezone.now()
+    reminder.save(update_fields=['status', 'error', 'notified_count', 'emailed_count', 'sent_at', 'updated_at'])
+    logger.info(f"Live class {live_class.id} reminder: {notified} notified, {emailed} emailed")
+    return notified, emailed
+
+
+def queue_reminder(live_class):
+    """Send a reminder for live_class now, off the request thread; the scheduler sends it if this process exits first"""
+    reminder = LiveClassReminder.objects.create(live_class=live_class, scheduled_for=timezone.now())
+    run_in_background(send_reminder, reminder.id)
+    return reminder
+
+
+def send_due_reminders(now=None, batch_size=100, inline=False):
+    """
+    Hand up to batch_size reminders that have come due to the background
+    pool; this also picks up manual sends lost with the process that queued
+    them, and fan-outs that stopped reporting progress for sending_timeout()
+    are put back to be sent again (students reached before they stopped may
+    get the reminder twice). Reminders whose class started or was cancelled
+    in the meantime are failed rather than sent late. With inline they are
+    sent before returning, for callers that exit straight after. Returns the
+    number queued.
+    """
+    now = now or timezone.now()
+    lost = LiveClassReminder.objects.filter(status='sending', updated_at__lt=now - sending_timeout()).update(
+        status='pending', error='Sending was interrupted; retried', updated_at=now
+    )
+    if lost:
+        logger.warning(f"Retrying {lost} live class reminders whose fan-out was interrupted")
+    due = LiveClassReminder.objects.filter(status='pending', scheduled_for__lte=now)
+    due.filter(~Q(live_class__status='scheduled') | Q(live_class__scheduled_start_time__lte=now)).update(
+        status='failed', error='Class had already started or was cancelled', updated_at=now
+    )
+    ids = list(
+        due.order_by('scheduled_for')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    for reminder_id in ids:
+        if inline:
+            send_reminder(reminder_id)
+        else:
+            run_in_background(send_reminder, reminder_id)
+    return len(ids)
+
+
+def next_reminder_time():
+    """When the next reminder is due, or None if none are pending"""
+    return (
+        LiveClassReminder.objects.filter(status='pending', live_class__status='scheduled')
+        .order_by('scheduled_for')
+        .values_list('scheduled_for', flat=True)
+        .first()
+    )
@@ -2,7 +2,8 @@
 ## 12. apps/live_classes/serializers.py
 
 from rest_framework import serializers
-from .models import LiveClassAttendance
+from .analytics import percentage
+from .models import CourseAttendanceSummary, LiveClassAttendance
 
 from .models import LiveClass, Course
 
@@ -27,3 +28,23 @@ class LiveClassAttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ('student', 'joined_at')
 
 
+
+
+class CourseAttendanceSummarySerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.get_full_name', read_only=True)
+    attendance_rate = serializers.SerializerMethodField()
+    punctuality_rate = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = CourseAttendanceSummary
+        fields = (
+            'student', 'student_name', 'classes_attended', 'total_minutes', 'on_time_count',
+            'last_attended_at', 'attendance_rate', 'punctuality_rate'
+        )
+    
+    def get_attendance_rate(self, obj):
+        # classes_held is counted once per page by the view
+        return percentage(obj.classes_attended, self.context.get('classes_held', 0))
+    
+    def get_punctuality_rate(self, obj):
+        return percentage(obj.on_time_count, obj.classes_attended)
@@ -0,0 +1,19 @@
+# apps/live_classes/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .events import publish_status
+from .models import LiveClass
+from .reminders import schedule_reminders
+
+
+@receiver(post_save, sender=LiveClass)
+def broadcast_status(sender, instance, **kwargs):
+    # Covers start/end views, PATCH and admin edits; bulk updates publish via publish_statuses
+    publish_status(instance)
+
+
+@receiver(post_save, sender=LiveClass)
+def keep_reminders_scheduled(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_reminders(instance)
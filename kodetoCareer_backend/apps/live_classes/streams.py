@@ -0,0 +1,171 @@
+# apps/live_classes/streams.py
+import asyncio
+import json
+import re
+from functools import wraps
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .events import get_channel_layer, load_snapshot
+from .models import LiveClass
+
+# Served by the ASGI router in kodetoCareer_backend/asgi.py, next to the SSE endpoint in urls.py
+SOCKET_PATH = re.compile(r'^/api/v1/live/live-classes/(?P<class_id>\d+)/ws/$')
+
+ERRORS = {
+    401: 'Authentication credentials were not provided.',
+    403: 'You are not enrolled in this course',
+    404: 'Live class not found',
+}
+
+
+def _database(func):
+    # Streams outlive requests, so connections are released around each call rather than per request
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+@_database
+def _token_user(key):
+    from rest_framework.authtoken.models import Token
+
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+@_database
+def _authorize(user, class_id):
+    """None if user may watch the class, else the HTTP status to refuse with"""
+    live_class = LiveClass.objects.filter(id=class_id).only('id', 'course_id').first()
+    if live_class is None:
+        return 404
+    if user.user_type != 'admin':
+        if not user.enrollments.filter(course_id=live_class.course_id, is_active=True).exists():
+            return 403
+    return None
+
+
+@_database
+def _snapshot(class_id):
+    # Watchers of the same class share the last known state, so a crowd joining costs one read
+    layer = get_channel_layer()
+    snapshot = layer.snapshot(class_id)
+    if snapshot is None:
+        live_class = LiveClass.objects.filter(id=class_id).first()
+        if live_class is None:
+            return None
+        snapshot = load_snapshot(live_class)
+        layer.remember(class_id, snapshot)
+    return {**snapshot, 'type': 'snapshot'}
+
+
+def _keepalive():
+    return getattr(settings, 'LIVE_EVENTS_KEEPALIVE_SECONDS', 15)
+
+
+async def _events(class_id):
+    """Yield the snapshot, then each event for the class; None when a keepalive is due"""
+    layer = get_channel_layer()
+    # Subscribe before reading the snapshot so nothing published in between is missed
+    subscription = layer.subscribe(class_id)
+    try:
+        snapshot = await _snapshot(class_id)
+        if snapshot is None:
+            return
+        yield snapshot
+        while True:
+            try:
+                yield await subscription.get(timeout=_keepalive())
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        layer.unsubscribe(subscription)
+
+
+async def _request_user(request):
+    header = request.headers.get('Authorization', '')
+    # EventSource cannot set headers, so browsers pass the token in the query string
+    key = header[6:] if header.startswith('Token ') else request.GET.get('token')
+    if key:
+        return await _token_user(key)
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def live_class_events(request, class_id):
+    """Server-sent events for one live class: a snapshot, then status and attendee updates"""
+    user = await _request_user(request)
+    error = 401 if user is None else await _authorize(user, class_id)
+    if error:
+        return JsonResponse({'error': ERRORS[error]}, status=error)
+
+    async def stream():
+        async for event in _events(class_id):
+            if event is None:
+                yield ': keepalive\n\n'
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
+
+
+async def live_class_socket(scope, receive, send):
+    """WebSocket for one live class, same events as live_class_events; authenticate with ?token="""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = SOCKET_PATH.match(scope['path'])
+    if match is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    class_id = int(match['class_id'])
+    key = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    user = await _token_user(key) if key else None
+    error = 401 if user is None else await _authorize(user, class_id)
+    if error:
+        # 4xxx close codes mirror the HTTP status the SSE endpoint would return
+        await send({'type': 'websocket.close', 'code': 4000 + error})
+        return
+
+    await send({'type': 'websocket.accept'})
+    events = _events(class_id)
+    receiving = asyncio.ensure_future(receive())
+    next_event = asyncio.ensure_future(anext(events, StopAsyncIteration))
+    try:
+        while True:
+            await asyncio.wait({receiving, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if receiving.done():
+                if receiving.result()['type'] == 'websocket.disconnect':
+                    break
+                # Clients have nothing to say; anything they send is ignored
+                receiving = asyncio.ensure_future(receive())
+            if next_event.done():
+                event = next_event.result()
+                if event is StopAsyncIteration:
+                    await send({'type': 'websocket.close', 'code': 4404})
+                    break
+                if event is not None:
+                    await send({'type': 'websocket.send', 'text': json.dumps(event, default=str)})
+                next_event = asyncio.ensure_future(anext(events, StopAsyncIteration))
+    finally:
+        receiving.cancel()
+        next_event.cancel()
+        # The generator can only be closed once the pending read has unwound
+        await asyncio.gather(receiving, next_event, return_exceptions=True)
+        await events.aclose()
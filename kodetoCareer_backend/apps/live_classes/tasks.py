@@ -1,17 +1,60 @@
+from django.db import transaction
 from django.utils import timezone
+from . import presence
+from .events import publish_statuses
 from .models import LiveClass
 
-def update_live_class_status():
-    now = timezone.now()
+# (from status, to status, field that makes the class due, field stamped on transition)
+TRANSITIONS = (
+    ('scheduled', 'live', 'scheduled_start_time', 'actual_start_time'),
+    ('live', 'completed', 'scheduled_end_time', 'actual_end_time'),
+)
 
-    LiveClass.objects.filter(
-        status='scheduled',
-        scheduled_start_time__lte=now,
-        actual_start_time__isnull=True
-    ).update(status='live', actual_start_time=now)
 
-    LiveClass.objects.filter(
-        status='live',
-        scheduled_end_time__lte=now,
-        actual_end_time__isnull=True
-    ).update(status='completed', actual_end_time=now)
+def _pending(source, stamp_field):
+    return LiveClass.objects.filter(status=source, **{f'{stamp_field}__isnull': True})
+
+
+def update_live_class_status(now=None, batch_size=500):
+    """
+    Move classes scheduled -> live -> completed once their scheduled times
+    pass, batch_size rows at a time, closing the presence of completed ones. Each step reads through the
+    (status, time) indexes, so a run with nothing due is a pair of index
+    probes. Returns the number of classes started and completed.
+    """
+    now = now or timezone.now()
+    summary = {}
+    for source, target, due_field, stamp_field in TRANSITIONS:
+        moved = 0
+        while True:
+            with transaction.atomic():
+                # skip_locked lets overlapping scheduler runs split the due rows instead of queueing on them
+                ids = list(
+                    _pending(source, stamp_field)
+                    .select_for_update(skip_locked=True)
+                    .filter(**{f'{due_field}__lte': now})
+                    .order_by(due_field)
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                publish_statuses(ids)
+                moved += LiveClass.objects.filter(id__in=ids, status=source).update(
+                    status=target, updated_at=now, **{stamp_field: now}
+                )
+            if target == 'completed':
+                # Close the sessions of ended classes, so heartbeats can't keep them open
+                for class_id in ids:
+                    presence.end_class(class_id)
+        summary[target] = moved
+    return {'started': summary['live'], 'completed': summary['completed']}
+
+
+def next_transition_time():
+    """When the next class is due to start or end, or None if nothing is pending"""
+    upcoming = [
+        _pending(source, stamp_field).order_by(due_field).values_list(due_field, flat=True).first()
+        for source, target, due_field, stamp_field in TRANSITIONS
+    ]
+    upcoming = [when for when in upcoming if when is not None]
+    return min(upcoming) if upcoming else None
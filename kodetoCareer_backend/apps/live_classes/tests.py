@@ -1,3 +1,97 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.courses.models import Category, Course
+from . import presence
+from .models import LiveClass, LiveClassAttendance, LiveClassAttendanceSummary
+
+
+class DatabasePresenceTests(TestCase):
+    """Without REDIS_URL presence is written straight to LiveClassAttendance"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Programming')
+        course = Course.objects.create(
+            category=category, title='Python', slug='python', description='Basics',
+            price=100, duration_hours=10,
+        )
+        start = timezone.now()
+        self.live_class = LiveClass.objects.create(
+            course=course, title='Intro', platform='zoom', status='live',
+            scheduled_start_time=start, scheduled_end_time=start + timedelta(hours=1),
+        )
+        self.students = [
+            User.objects.create_user(username=f"s{number}", email=f"s{number}@example.com", password='pw')
+            for number in range(2)
+        ]
+        self.now = start.timestamp()
+
+    def at(self, minutes):
+        clock = mock.patch.object(presence, 'time')
+        clock.start().time.return_value = self.now + minutes * 60
+        self.addCleanup(clock.stop)
+
+    def attendance(self, student):
+        return LiveClassAttendance.objects.get(live_class=self.live_class, student=student)
+
+    def test_uses_the_database_store_without_redis(self):
+        self.assertIsInstance(presence._store(), presence.DatabasePresenceStore)
+
+    def test_join_heartbeat_and_leave_are_written_straight_away(self):
+        self.at(0)
+        started, attendance = presence.join(self.live_class.id, self.students[0].id)
+        self.assertTrue(started)
+        self.assertIsNone(attendance.left_at)
+        self.assertEqual(presence.heartbeat(self.live_class.id, self.students[0].id), (False, 1))
+        self.assertTrue(presence.is_online(self.live_class.id, self.students[0].id))
+
+        self.at(30)
+        self.assertEqual(presence.leave(self.live_class.id, self.students[0].id), attendance.joined_at)
+
+        attendance = self.attendance(self.students[0])
+        self.assertEqual(attendance.duration_minutes, 30)
+        self.assertIsNotNone(attendance.left_at)
+        self.assertEqual(presence.online_count(self.live_class.id), 0)
+        self.assertFalse(presence.is_online(self.live_class.id, self.students[0].id))
+        self.assertIsNone(presence.leave(self.live_class.id, self.students[0].id))
+
+    def test_rejoining_reopens_the_attendance_row(self):
+        self.at(0)
+        presence.join(self.live_class.id, self.students[0].id)
+        presence.leave(self.live_class.id, self.students[0].id)
+
+        started, attendance = presence.join(self.live_class.id, self.students[0].id)
+
+        self.assertTrue(started)
+        self.assertIsNone(attendance.left_at)
+        self.assertEqual(LiveClassAttendance.objects.count(), 1)
+        self.assertEqual(presence.online_count(self.live_class.id), 1)
+
+    def test_flush_leaves_open_sessions_alone(self):
+        self.at(0)
+        presence.join(self.live_class.id, self.students[0].id)
+
+        # Far past the heartbeat timeout: the database store has nothing buffered to lapse
+        self.assertEqual(presence.flush_class(self.live_class.id, now=self.now + 3600), (0, 0))
+        self.assertEqual(presence.flush_presence(now=self.now + 3600), {'classes': 0, 'opened': 0, 'closed': 0})
+        self.assertIsNone(self.attendance(self.students[0]).left_at)
+        self.assertEqual(presence.online_count(self.live_class.id), 1)
+
+    def test_end_class_closes_every_open_session_and_refreshes_the_summary(self):
+        self.at(0)
+        for student in self.students:
+            presence.join(self.live_class.id, student.id)
+
+        self.at(45)
+        presence.end_class(self.live_class.id)
 
-# Create your tests here.
+        self.assertEqual(presence.online_count(self.live_class.id), 0)
+        self.assertEqual(
+            sorted(LiveClassAttendance.objects.values_list('duration_minutes', flat=True)), [45, 45]
+        )
+        summary = LiveClassAttendanceSummary.objects.get(live_class=self.live_class)
+        self.assertEqual((summary.attendees_count, summary.total_minutes), (2, 90))
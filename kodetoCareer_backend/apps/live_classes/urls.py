@@ -4,8 +4,9 @@ from .views import (
     join_live_class, leave_live_class, stop_and_delete_live_class, save_recording,
     get_live_class_attendees, get_class_recording, start_live_class, end_live_class,
     get_user_attendance_history, get_live_class_status, get_course_live_classes,
-    send_class_reminder
+    send_class_reminder, live_class_heartbeat, get_course_attendance
 )
+from .streams import live_class_events
 
 urlpatterns = [
     # Core live class management
@@ -17,7 +18,10 @@ urlpatterns = [
     # Class participation
     path('live-classes/<int:class_id>/join/', join_live_class, name='join-live-class'),
     path('live-classes/<int:class_id>/leave/', leave_live_class, name='leave-live-class'),
+    path('live-classes/<int:class_id>/heartbeat/', live_class_heartbeat, name='live-class-heartbeat'),
     path('live-classes/<int:class_id>/status/', get_live_class_status, name='live-class-status'),
+    # Push updates (SSE here; the WebSocket at live-classes/<id>/ws/ is routed in asgi.py)
+    path('live-classes/<int:class_id>/events/', live_class_events, name='live-class-events'),
     
     # Class control (admin only)
     path('live-classes/<int:class_id>/start/', start_live_class, name='start-live-class'),
@@ -34,6 +38,7 @@ urlpatterns = [
     
     # Course-specific endpoints
     path('courses/<int:course_id>/live-classes/', get_course_live_classes, name='course-live-classes'),
+    path('courses/<int:course_id>/attendance/', get_course_attendance, name='course-attendance'),
     
     # Notifications
     path('live-classes/<int:class_id>/send-reminder/', send_class_reminder, name='send-class-reminder'),
@@ -9,27 +9,13 @@ from django.conf import settings
 import hashlib
 import secrets
 import time
-from .models import LiveClass, LiveClassAttendance
-from .serializers import LiveClassSerializer, LiveClassAttendanceSerializer
-
-def auto_update_live_class_status():
-    """Automatically update live class status based on current time"""
-    now = timezone.localtime(timezone.now())
-    print("Current time (UTC):", now)
-
-    # Start classes when scheduled start time <= now and not started yet
-    LiveClass.objects.filter(
-        status='scheduled',
-        scheduled_start_time__lte=now,
-        actual_start_time__isnull=True
-    ).update(status='live', actual_start_time=now)
-
-    # End classes when scheduled end time <= now and not ended yet
-    LiveClass.objects.filter(
-        status='live',
-        scheduled_end_time__lte=now,
-        actual_end_time__isnull=True
-    ).update(status='completed', actual_end_time=now)
+from apps.common.pagination import CustomPagination, KnownCountPagination
+from apps.courses.models import Course
+from . import analytics, presence
+from .events import publish_attendees
+from .models import CourseAttendanceSummary, LiveClass, LiveClassAttendance
+from .reminders import queue_reminder
+from .serializers import CourseAttendanceSummarySerializer, LiveClassSerializer, LiveClassAttendanceSerializer
 
 class CreateLiveClassView(generics.CreateAPIView):
     queryset = LiveClass.objects.all()
@@ -74,9 +60,7 @@ class LiveClassListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        # ✅ Auto update statuses before returning results
-        auto_update_live_class_status()
-
+        # Statuses are kept current by the run_live_class_scheduler command
         user = self.request.user
         if user.user_type == 'admin':
             return LiveClass.objects.all()
@@ -96,9 +80,6 @@ class UpcomingLiveClassesView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        # ✅ Auto update statuses before returning results
-        auto_update_live_class_status()
-
         user = self.request.user
         now = timezone.now()
         
@@ -124,12 +105,13 @@ def join_live_class(request, class_id):
             if not request.user.enrollments.filter(course=live_class.course, is_active=True).exists():
                 return Response({'error': 'You are not enrolled in this course'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Create or get attendance record
-        attendance, created = LiveClassAttendance.objects.get_or_create(
-            live_class=live_class,
-            student=request.user,
-            defaults={'joined_at': timezone.now()}
-        )
+        if live_class.status != 'live':
+            return Response({'error': 'This live class is not live'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Clients keep the session alive via heartbeat; flush_presence writes later sessions and leaves
+        started, attendance = presence.join(live_class.id, request.user.id)
+        if started:
+            publish_attendees(live_class.id)
         
         # Generate JWT token for Jitsi (if using authentication)
         jwt_token = None
@@ -162,24 +144,37 @@ def join_live_class(request, class_id):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def leave_live_class(request, class_id):
-    try:
-        attendance = LiveClassAttendance.objects.get(
-            live_class_id=class_id,
-            student=request.user
-        )
-        attendance.left_at = timezone.now()
-        # Calculate duration
-        duration = (attendance.left_at - attendance.joined_at).seconds // 60
-        attendance.duration_minutes = duration
-        attendance.save()
-        
-        return Response({
-            'message': 'Successfully left live class',
-            'duration_minutes': duration
-        })
-    
-    except LiveClassAttendance.DoesNotExist:
+    started = presence.leave(class_id, request.user.id)
+    if started is None:
         return Response({'error': 'Attendance record not found'}, status=status.HTTP_404_NOT_FOUND)
+    publish_attendees(class_id)
+    
+    # Duration of this session; the attendance row is updated by the next flush_presence
+    duration = int((timezone.now() - started).total_seconds()) // 60
+    return Response({
+        'message': 'Successfully left live class',
+        'duration_minutes': duration
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def live_class_heartbeat(request, class_id):
+    """Keep the user's presence in a live class alive (call every ~20 seconds while in class)"""
+    if not presence.is_online(class_id, request.user.id):
+        # Only a new or lapsed session pays for the access check
+        live_class = LiveClass.objects.filter(id=class_id).only('id', 'course_id', 'status').first()
+        if live_class is None:
+            return Response({'error': 'Live class not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.user.user_type != 'admin':
+            if not request.user.enrollments.filter(course_id=live_class.course_id, is_active=True).exists():
+                return Response({'error': 'You are not enrolled in this course'}, status=status.HTTP_403_FORBIDDEN)
+        if live_class.status != 'live':
+            return Response({'error': 'This live class is not live'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    started, online = presence.heartbeat(class_id, request.user.id)
+    if started:
+        publish_attendees(class_id)
+    return Response({'class_id': class_id, 'current_attendees': online})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -275,18 +270,20 @@ def get_live_class_attendees(request, class_id):
         if request.user.user_type != 'admin':
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        attendees = LiveClassAttendance.objects.filter(live_class=live_class).select_related('student')
-        serializer = LiveClassAttendanceSerializer(attendees, many=True)
-        
-        # Calculate some statistics
-        total_attendees = attendees.count()
-        currently_online = attendees.filter(left_at__isnull=True).count()
+        summary = analytics.class_totals(live_class)
+        attendees = LiveClassAttendance.objects.filter(live_class=live_class).select_related('student').order_by('joined_at', 'id')
+        paginator = KnownCountPagination(summary.attendees_count)
+        serializer = LiveClassAttendanceSerializer(paginator.paginate_queryset(attendees, request), many=True)
         
         return Response({
             'live_class_id': class_id,
             'live_class_title': live_class.title,
-            'total_attendees': total_attendees,
-            'currently_online': currently_online,
+            'total_attendees': summary.attendees_count,
+            'currently_online': presence.online_count(live_class.id),
+            'total_minutes': summary.total_minutes,
+            'attendance_rate': analytics.percentage(summary.attendees_count, summary.enrolled_count),
+            'punctuality_rate': analytics.percentage(summary.on_time_count, summary.attendees_count),
+            **paginator.get_page_info(),
             'attendees': serializer.data
         })
     
@@ -367,17 +364,21 @@ def end_live_class(request, class_id):
         
         live_class.save()
         
-        # Update all attendance records that haven't been closed
-        open_attendances = LiveClassAttendance.objects.filter(
+        # Close presence sessions into their attendance rows, then any rows still open from before presence
+        presence.end_class(live_class.id)
+        open_attendances = list(LiveClassAttendance.objects.filter(
             live_class=live_class,
             left_at__isnull=True
-        )
+        ))
         
         for attendance in open_attendances:
             attendance.left_at = timezone.now()
             if attendance.joined_at:
                 attendance.duration_minutes = (attendance.left_at - attendance.joined_at).seconds // 60
             attendance.save()
+        if open_attendances:
+            analytics.refresh_attendance(live_class.id, [attendance.student_id for attendance in open_attendances])
+        publish_attendees(live_class.id)
         
         return Response({
             'message': 'Live class ended successfully',
@@ -396,20 +397,19 @@ def get_user_attendance_history(request):
     """Get attendance history for the current user"""
     user = request.user
     
-    # Get all attendance records for the user
+    # Totals come from the per-course rollups; only the requested page of history is read
+    totals = analytics.student_totals(user.id)
     attendances = LiveClassAttendance.objects.filter(
         student=user
     ).select_related('live_class', 'live_class__course').order_by('-joined_at')
-    
-    serializer = LiveClassAttendanceSerializer(attendances, many=True)
-    
-    # Calculate statistics
-    total_classes_attended = attendances.count()
-    total_duration = sum([att.duration_minutes or 0 for att in attendances])
+    paginator = KnownCountPagination(totals['classes_attended'])
+    serializer = LiveClassAttendanceSerializer(paginator.paginate_queryset(attendances, request), many=True)
     
     return Response({
-        'total_classes_attended': total_classes_attended,
-        'total_duration_minutes': total_duration,
+        'total_classes_attended': totals['classes_attended'],
+        'total_duration_minutes': totals['total_minutes'],
+        'punctuality_rate': analytics.percentage(totals['on_time_count'], totals['classes_attended']),
+        **paginator.get_page_info(),
         'attendance_history': serializer.data
     })
 
@@ -417,9 +417,6 @@ def get_user_attendance_history(request):
 @permission_classes([IsAuthenticated])
 def get_live_class_status(request, class_id):
     """Get current status of a live class"""
-    # ✅ Auto update statuses before fetching
-    auto_update_live_class_status()
-
     try:
         live_class = LiveClass.objects.get(id=class_id)
         
@@ -427,16 +424,8 @@ def get_live_class_status(request, class_id):
             if not request.user.enrollments.filter(course=live_class.course, is_active=True).exists():
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        current_attendees = LiveClassAttendance.objects.filter(
-            live_class=live_class,
-            left_at__isnull=True
-        ).count()
-        
-        user_in_class = LiveClassAttendance.objects.filter(
-            live_class=live_class,
-            student=request.user,
-            left_at__isnull=True
-        ).exists()
+        current_attendees = presence.online_count(live_class.id)
+        user_in_class = presence.is_online(live_class.id, request.user.id)
         
         return Response({
             'class_id': class_id,
@@ -471,6 +460,37 @@ def get_course_live_classes(request, course_id):
         'live_classes': serializer.data
     })
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_course_attendance(request, course_id):
+    """Attendance per student for a course's live classes, most minutes first"""
+    if request.user.user_type != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    course = Course.objects.filter(id=course_id).only('id', 'title').first()
+    if course is None:
+        return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    held = analytics.classes_held(course_id)
+    class_totals = analytics.course_class_totals(course_id)
+    summaries = CourseAttendanceSummary.objects.filter(course_id=course_id).select_related('student').order_by('-total_minutes', 'id')
+    paginator = CustomPagination()
+    serializer = CourseAttendanceSummarySerializer(
+        paginator.paginate_queryset(summaries, request), many=True, context={'classes_held': held}
+    )
+    
+    return Response({
+        'course_id': course_id,
+        'course_title': course.title,
+        'classes_held': held,
+        'total_attendances': class_totals['attendees_count'],
+        'total_minutes': class_totals['total_minutes'],
+        'attendance_rate': analytics.percentage(class_totals['attendees_count'], class_totals['enrolled_count']),
+        'punctuality_rate': analytics.percentage(class_totals['on_time_count'], class_totals['attendees_count']),
+        **paginator.get_page_info(),
+        'students': serializer.data
+    })
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_class_reminder(request, class_id):
@@ -482,17 +502,19 @@ def send_class_reminder(request, class_id):
         if request.user.user_type != 'admin':
             return Response({'error': 'Only admins can send reminders'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get all enrolled students
-        enrolled_students = live_class.course.enrollments.filter(is_active=True).values_list('user', flat=True)
+        if live_class.status != 'scheduled':
+            return Response({'error': 'Reminders can only be sent for scheduled classes'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Here you would implement your notification system
-        # For example, sending emails, push notifications, etc.
+        enrolled_students = live_class.course.enrollments.filter(is_active=True, student__is_active=True).count()
+        # Notifications and emails go out in the background; large courses take a while
+        reminder = queue_reminder(live_class)
         
         return Response({
-            'message': f'Reminder sent to {len(enrolled_students)} students',
+            'message': f'Reminder queued for {enrolled_students} students',
+            'reminder_id': reminder.id,
             'class_title': live_class.title,
             'scheduled_time': live_class.scheduled_start_time
-        })
+        }, status=status.HTTP_202_ACCEPTED)
     
     except LiveClass.DoesNotExist:
         return Response({'error': 'Live class not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
@@ -1,11 +1,14 @@
 from django.contrib import admin
+from apps.common.admin import PerformanceModelAdmin
 from .models import Notification, NotificationTemplate, BulkNotification
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(PerformanceModelAdmin):
     list_display = ['title', 'user', 'notification_type', 'is_read', 'created_at']
     list_filter = ['notification_type', 'is_read', 'priority', 'created_at']
     search_fields = ['title', 'message', 'user__username']
+    list_select_related = ['user']
+    autocomplete_fields = ['user', 'course']
     readonly_fields = ['created_at', 'updated_at']
 
 @admin.register(NotificationTemplate)
@@ -19,4 +22,6 @@ class BulkNotificationAdmin(admin.ModelAdmin):
     list_display = ['title', 'notification_type', 'target_all_users', 'sent_at', 'sent_by']
     list_filter = ['notification_type', 'target_all_users', 'sent_at']
     search_fields = ['title', 'message']
+    list_select_related = ['sent_by']
+    autocomplete_fields = ['sent_by', 'target_users']
     readonly_fields = ['sent_at', 'created_at', 'updated_at']
@@ -3,11 +3,13 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import Payment, PaymentStatus, Coupon, PaymentReceipt, Subscription
+from apps.common.admin import PerformanceModelAdmin, background_action
+from apps.common.background import run_in_background
+from .models import Payment, PaymentStatus, Coupon, PaymentReceipt, ReceiptStatus, Subscription, WebhookEvent
 from .utils import format_currency
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(PerformanceModelAdmin):
     list_display = [
         'payment_id', 'user_name', 'course_or_bundle', 'formatted_amount', 
         'status_badge', 'payment_method', 'created_at', 'enrollment_status'
@@ -17,8 +19,10 @@ class PaymentAdmin(admin.ModelAdmin):
     ]
     search_fields = [
         'payment_id', 'gateway_payment_id', 'user__username', 
-        'user__email', 'course__title', 'bundle__title'
+        'user__email', 'course__title', 'bundle__name'
     ]
+    list_select_related = ['user', 'course', 'bundle']
+    autocomplete_fields = ['user', 'course', 'bundle', 'coupon']
     readonly_fields = [
         'id', 'payment_id', 'gateway_payment_id', 'created_at', 
         'updated_at', 'enrollment_date'
@@ -51,7 +55,7 @@ class PaymentAdmin(admin.ModelAdmin):
         if obj.course:
             return f"Course: {obj.course.title}"
         elif obj.bundle:
-            return f"Bundle: {obj.bundle.title}"
+            return f"Bundle: {obj.bundle.name}"
         return "No item"
     course_or_bundle.short_description = 'Item'
     
@@ -82,34 +86,34 @@ class PaymentAdmin(admin.ModelAdmin):
     actions = ['mark_as_completed', 'complete_enrollments', 'generate_receipts']
     
     def mark_as_completed(self, request, queryset):
-        updated = queryset.filter(status=PaymentStatus.PENDING).update(
-            status=PaymentStatus.COMPLETED
-        )
+        from django.db.models import Max, Min
+        from .revenue import rebuild_revenue
+        
+        pending = queryset.filter(status=PaymentStatus.PENDING)
+        span = pending.aggregate(start=Min('created_at'), end=Max('created_at'))
+        updated = pending.update(status=PaymentStatus.COMPLETED)
+        if updated:
+            # update() skips the save signals that maintain the revenue rollup
+            rebuild_revenue(timezone.localtime(span['start']).date(), timezone.localtime(span['end']).date())
         self.message_user(request, f"{updated} payments marked as completed.")
     mark_as_completed.short_description = "Mark selected payments as completed"
     
-    def complete_enrollments(self, request, queryset):
-        completed = 0
-        for payment in queryset.filter(status=PaymentStatus.COMPLETED):
-            if payment.complete_enrollment():
-                completed += 1
-        self.message_user(request, f"{completed} enrollments completed.")
-    complete_enrollments.short_description = "Complete enrollments for selected payments"
+    @background_action("Complete enrollments for selected payments")
+    def complete_enrollments(self, queryset):
+        # No command backfills this; after a restart rerun the action, which skips completed enrollments
+        pending = queryset.filter(status=PaymentStatus.COMPLETED, enrollment_completed=False)
+        return sum(payment.complete_enrollment() for payment in pending.select_related('user', 'course'))
     
     def generate_receipts(self, request, queryset):
-        from .utils import PaymentReceiptGenerator
+        from .receipts import ensure_receipt, generate_receipts
         
-        generated = 0
-        for payment in queryset.filter(status=PaymentStatus.COMPLETED):
-            try:
-                generator = PaymentReceiptGenerator(payment)
-                pdf_buffer = generator.generate_pdf()
-                if pdf_buffer:
-                    generated += 1
-            except Exception:
-                pass
+        payments = list(queryset.filter(status=PaymentStatus.COMPLETED).select_related('user'))
+        for payment in payments:
+            ensure_receipt(payment)
+        # Receipts left pending by a restart are rendered by the generate_receipts command
+        run_in_background(generate_receipts, [payment.id for payment in payments])
         
-        self.message_user(request, f"{generated} receipts generated.")
+        self.message_user(request, f"{len(payments)} receipts queued for generation.")
     generate_receipts.short_description = "Generate receipts for selected payments"
 
 @admin.register(Coupon)
@@ -131,7 +135,7 @@ class CouponAdmin(admin.ModelAdmin):
             'description': 'Set either percentage or fixed amount, not both.'
         }),
         ('Usage Limits', {
-            'fields': ('max_uses', 'used_count')
+            'fields': ('max_uses', 'max_uses_per_user', 'used_count')
         }),
         ('Validity Period', {
             'fields': ('valid_from', 'valid_to')
@@ -178,13 +182,15 @@ class CouponAdmin(admin.ModelAdmin):
     deactivate_coupons.short_description = "Deactivate selected coupons"
 
 @admin.register(PaymentReceipt)
-class PaymentReceiptAdmin(admin.ModelAdmin):
+class PaymentReceiptAdmin(PerformanceModelAdmin):
     list_display = [
         'receipt_number', 'payment_id_display', 'user_name', 
         'amount_display', 'created_at', 'pdf_status'
     ]
-    list_filter = ['created_at']
+    list_filter = ['status', 'created_at']
     search_fields = ['receipt_number', 'payment__payment_id', 'payment__user__username']
+    list_select_related = ['payment__user']
+    autocomplete_fields = ['payment']
     readonly_fields = ['receipt_number', 'created_at', 'updated_at']
     
     def payment_id_display(self, obj):
@@ -200,19 +206,23 @@ class PaymentReceiptAdmin(admin.ModelAdmin):
     amount_display.short_description = 'Amount'
     
     def pdf_status(self, obj):
-        if obj.pdf_file:
+        if obj.status == ReceiptStatus.READY and obj.pdf_file:
             return format_html('<span style="color: green;">✓ Available</span>')
+        if obj.status == ReceiptStatus.FAILED:
+            return format_html('<span style="color: red;">✗ Failed</span>')
         return format_html('<span style="color: orange;">⏳ Not Generated</span>')
     pdf_status.short_description = 'PDF Status'
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(PerformanceModelAdmin):
     list_display = [
         'user_name', 'subscription_type', 'start_date', 'end_date',
         'status_display', 'auto_renew', 'payment_link'
     ]
     list_filter = ['subscription_type', 'is_active', 'auto_renew', 'start_date']
     search_fields = ['user__username', 'user__email']
+    list_select_related = ['user']
+    autocomplete_fields = ['user', 'payment']
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
@@ -245,8 +255,8 @@ class SubscriptionAdmin(admin.ModelAdmin):
     status_display.short_description = 'Status'
     
     def payment_link(self, obj):
-        if obj.payment:
-            url = reverse('admin:payments_payment_change', args=[obj.payment.id])
+        if obj.payment_id:
+            url = reverse('admin:payments_payment_change', args=[obj.payment_id])
             return format_html('<a href="{}">View Payment</a>', url)
         return "No payment"
     payment_link.short_description = 'Payment'
@@ -263,6 +273,28 @@ class SubscriptionAdmin(admin.ModelAdmin):
         self.message_user(request, f"{updated} subscriptions deactivated.")
     deactivate_subscriptions.short_description = "Deactivate selected subscriptions"
 
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(PerformanceModelAdmin):
+    list_display = [
+        'event_id', 'event_type', 'payment_key', 'status', 'attempts',
+        'next_attempt_at', 'created_at'
+    ]
+    list_filter = ['status', 'event_type', 'created_at']
+    search_fields = ['event_id', 'payment_key']
+    readonly_fields = [
+        'event_id', 'event_type', 'payment_key', 'gateway_created_at', 'payload',
+        'attempts', 'last_error', 'processed_at', 'created_at', 'updated_at'
+    ]
+    
+    actions = ['replay_events']
+    
+    def replay_events(self, request, queryset):
+        from .webhooks import replay_events
+        
+        replayed = replay_events(queryset)
+        self.message_user(request, f"{replayed} events queued for replay.")
+    replay_events.short_description = "Replay selected events"
+
 # Custom admin site modifications
 admin.site.site_header = "Payment Management System"
 admin.site.site_title = "Payment Admin"
@@ -0,0 +1,94 @@
+# apps/payments/coupons.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Coupon, Payment, PaymentStatus
+
+COUPON_CACHE_TIMEOUT = 5 * 60
+MISSING_COUPON_TIMEOUT = 60
+_MISSING = 'missing'
+
+
+class CouponError(Exception):
+    """The coupon cannot be redeemed; the message is safe to show the user"""
+
+
+def coupon_cache_key(code):
+    return f"payments:coupon:{code}"
+
+
+def get_coupon(code):
+    """
+    Coupon by code, read through the cache (None if there is no such code).
+    used_count may lag by the cache timeout; reserve_coupon is the authority.
+    """
+    key = coupon_cache_key(code)
+    coupon = cache.get(key)
+    if coupon is None:
+        coupon = Coupon.objects.filter(code=code).first() or _MISSING
+        # Misses are cached briefly too, so typing a code doesn't query per keystroke
+        cache.set(key, coupon, COUPON_CACHE_TIMEOUT if coupon != _MISSING else MISSING_COUPON_TIMEOUT)
+    return None if coupon == _MISSING else coupon
+
+
+def invalidate_coupon(code):
+    cache.delete(coupon_cache_key(code))
+
+
+def user_redemptions(coupon, user):
+    """Completed payments plus live reservations of a coupon by one user"""
+    return Payment.objects.filter(user=user, coupon=coupon).filter(
+        Q(status=PaymentStatus.COMPLETED) | Q(status=PaymentStatus.PENDING, coupon_reserved=True)
+    ).count()
+
+
+def reserve_coupon(coupon, user):
+    """
+    Take one use of coupon for user. Must run inside the transaction that
+    creates the payment (with coupon_reserved=True), so a rollback returns
+    the use. Raises CouponError when the coupon is invalid or exhausted.
+    """
+    # Serialize this user's checkouts so two tabs cannot both pass the per-user check
+    get_user_model().objects.select_for_update().get(pk=user.pk)
+    if user_redemptions(coupon, user) >= coupon.max_uses_per_user:
+        raise CouponError("Coupon has already been used by this user")
+
+    now = timezone.now()
+    reserved = Coupon.objects.filter(
+        pk=coupon.pk,
+        is_active=True,
+        valid_from__lte=now,
+        valid_to__gte=now,
+        used_count__lt=F('max_uses'),
+    ).update(used_count=F('used_count') + 1)
+    if not reserved:
+        raise CouponError("Coupon is expired or invalid")
+
+
+def release_coupon(payment):
+    """Return a failed or expired payment's coupon use; safe to call more than once"""
+    if not payment.coupon_id:
+        return False
+    with transaction.atomic():
+        released = Payment.objects.filter(pk=payment.pk, coupon_reserved=True).update(coupon_reserved=False)
+        if released:
+            Coupon.objects.filter(pk=payment.coupon_id).update(used_count=F('used_count') - 1)
+    payment.coupon_reserved = False
+    return bool(released)
+
+
+def confirm_coupon(payment):
+    """
+    Make sure a completed payment holds its coupon use. A payment whose
+    reservation was released (e.g. it failed, then was captured) takes one
+    back even past max_uses, since the customer has already paid.
+    """
+    if not payment.coupon_id:
+        return
+    with transaction.atomic():
+        if Payment.objects.filter(pk=payment.pk, coupon_reserved=False).update(coupon_reserved=True):
+            Coupon.objects.filter(pk=payment.coupon_id).update(used_count=F('used_count') + 1)
+    payment.coupon_reserved = True
@@ -0,0 +1,83 @@
+# apps/payments/expiry.py
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Coupon, Payment, PaymentStatus, SubscriptionRenewal
+from .revenue import PAYMENT_FIELDS, apply_changes
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_REASON = "Checkout expired"
+
+
+def expirable_payments(now, ttl):
+    """Pending payments created before now - ttl, other than subscription renewal orders"""
+    # A subquery rather than subscription_renewal__isnull, whose LEFT JOIN PostgreSQL won't lock FOR UPDATE
+    return Payment.objects.filter(
+        ~Exists(SubscriptionRenewal.objects.filter(payment=OuterRef('pk'))),
+        status=PaymentStatus.PENDING,
+        created_at__lt=now - ttl,
+    )
+
+
+def _locked_chunk(candidates, chunk_size):
+    # Rows a webhook or verify call is completing right now stay locked and are skipped
+    return (
+        candidates.select_for_update(skip_locked=True, of=('self',))
+        .order_by('created_at')
+        .values('id', 'coupon_id', 'coupon_reserved', *PAYMENT_FIELDS)[:chunk_size]
+    )
+
+
+def _expire_chunk(candidates, chunk_size, now):
+    """Expire one chunk of candidates; returns (payments expired, coupon uses released)"""
+    with transaction.atomic():
+        rows = list(_locked_chunk(candidates, chunk_size))
+        if not rows:
+            return 0, 0
+
+        expired = Payment.objects.filter(id__in=[row['id'] for row in rows], status=PaymentStatus.PENDING).update(
+            status=PaymentStatus.FAILED,
+            failure_reason=EXPIRED_REASON,
+            coupon_reserved=False,
+            updated_at=now,
+        )
+
+        held = Counter(row['coupon_id'] for row in rows if row['coupon_reserved'] and row['coupon_id'])
+        for coupon_id, uses in held.items():
+            Coupon.objects.filter(pk=coupon_id).update(used_count=F('used_count') - uses)
+
+        # update() bypasses the save signals that keep the revenue rollup current
+        apply_changes([(row, {**row, 'status': PaymentStatus.FAILED}) for row in rows])
+    return expired, sum(held.values())
+
+
+def expire_pending_payments(ttl=None, chunk_size=500, now=None):
+    """
+    Mark pending payments older than ttl (PENDING_PAYMENT_TTL_MINUTES by
+    default) as failed, a chunk at a time, returning their coupon uses. A
+    capture that still arrives later completes the payment and re-takes the
+    coupon (see webhooks.handle_payment_captured). Subscription renewal
+    orders stay payable until their subscription lapses (see
+    subscriptions.deactivate_lapsed). Returns a summary dict.
+    """
+    now = now or timezone.now()
+    ttl = ttl or timedelta(minutes=getattr(settings, 'PENDING_PAYMENT_TTL_MINUTES', 60))
+    candidates = expirable_payments(now, ttl)
+
+    summary = {'expired': 0, 'coupons_released': 0}
+    while True:
+        expired, released = _expire_chunk(candidates, chunk_size, now)
+        if not expired:
+            break
+        summary['expired'] += expired
+        summary['coupons_released'] += released
+    if summary['expired']:
+        logger.info(f"Expired {summary['expired']} pending payments, released {summary['coupons_released']} coupon uses")
+    return summary
@@ -0,0 +1,127 @@
+# apps/payments/export.py
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Payment
+
+CHUNK_SIZE = 2000
+FLUSH_ROWS = 500  # rows buffered per yielded chunk, so the response isn't one write per row
+
+COLUMNS = [
+    'payment_id', 'gateway_payment_id', 'created_at', 'status', 'payment_method',
+    'user_id', 'user_email', 'user_name', 'item_type', 'item_id', 'item_title',
+    'amount', 'discount_amount', 'final_amount', 'coupon_code', 'enrollment_completed',
+]
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(start=None, end=None, statuses=None):
+    """Payments created between start and end (dates, inclusive) with everything the export reads joined in"""
+    payments = Payment.objects.select_related('user', 'course', 'bundle', 'coupon').only(
+        'payment_id', 'gateway_payment_id', 'created_at', 'status', 'payment_method',
+        'amount', 'discount_amount', 'final_amount', 'enrollment_completed',
+        'user__email', 'user__username', 'user__first_name', 'user__last_name',
+        'course__title', 'bundle__name', 'coupon__code',
+    )
+    # Bounds on created_at itself rather than its date, so the (status, created_at) index applies
+    if start:
+        payments = payments.filter(created_at__gte=_day_start(start))
+    if end:
+        payments = payments.filter(created_at__lt=_day_start(end + timedelta(days=1)))
+    if statuses:
+        payments = payments.filter(status__in=statuses)
+    return payments.order_by('created_at', 'id')
+
+
+def export_rows(payments, chunk_size=CHUNK_SIZE):
+    """One list of COLUMNS values per payment, streamed from the database chunk_size rows at a time"""
+    for payment in payments.iterator(chunk_size=chunk_size):
+        if payment.course_id:
+            item_type, item_id, item_title = 'course', payment.course_id, payment.course.title
+        elif payment.bundle_id:
+            item_type, item_id, item_title = 'bundle', payment.bundle_id, payment.bundle.name
+        else:
+            item_type = item_id = item_title = ''
+        yield [
+            payment.payment_id,
+            payment.gateway_payment_id,
+            timezone.localtime(payment.created_at).isoformat(),
+            payment.status,
+            payment.payment_method,
+            payment.user_id,
+            payment.user.email,
+            payment.user.get_full_name() or payment.user.username,
+            item_type,
+            item_id,
+            item_title,
+            str(payment.amount),
+            str(payment.discount_amount),
+            str(payment.final_amount),
+            payment.coupon.code if payment.coupon_id else '',
+            payment.enrollment_completed,
+        ]
+
+
+class _Lines:
+    """File-like sink for csv.writer that hands back what was written"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def take(self):
+        data, self.parts = ''.join(self.parts), []
+        return data.encode()
+
+
+def csv_chunks(rows):
+    sink = _Lines()
+    writer = csv.writer(sink)
+    writer.writerow(COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % FLUSH_ROWS == 0:
+            yield sink.take()
+    yield sink.take()
+
+
+def jsonl_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(COLUMNS, row))))
+        if len(lines) == FLUSH_ROWS:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_chunks(chunks):
+    """Gzip a byte stream on the fly without holding it in memory"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(payments, file_format='csv', compress=False, chunk_size=CHUNK_SIZE):
+    """Bytes of the export of payments, produced lazily with constant memory"""
+    rows = export_rows(payments, chunk_size=chunk_size)
+    chunks = csv_chunks(rows) if file_format == 'csv' else jsonl_chunks(rows)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,194 @@
+# apps/payments/fake_gateway.py
+import base64
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .gateway import checkout_signature
+
+
+def _entity_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:14]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so the client's connection pool is exercised
+
+    routes = (
+        ('POST', re.compile(r'^/v1/orders$'), 'create_order'),
+        ('GET', re.compile(r'^/v1/orders/(?P<order_id>[\w-]+)$'), 'fetch_order'),
+        ('GET', re.compile(r'^/v1/orders/(?P<order_id>[\w-]+)/payments$'), 'fetch_order_payments'),
+        ('GET', re.compile(r'^/v1/payments/(?P<payment_id>[\w-]+)$'), 'fetch_payment'),
+    )
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (read timeout) before we answered
+
+    def _error(self, status, code, description):
+        self._send(status, {'error': {'code': code, 'description': description}})
+
+    def _dispatch(self, method):
+        gateway = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        path = self.path.split('?', 1)[0]
+
+        if gateway.latency:
+            time.sleep(gateway.latency)
+
+        if not self._authorized(gateway):
+            return self._error(401, 'BAD_REQUEST_ERROR', 'The api key provided is invalid')
+
+        failure = gateway._take_failure()
+        if failure:
+            return self._error(failure, 'SERVER_ERROR', 'Injected failure')
+
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                status, result = getattr(gateway, f'_{handler}')(body, **match.groupdict())
+                if status >= 400:
+                    return self._error(status, 'BAD_REQUEST_ERROR', result)
+                return self._send(status, result)
+        return self._error(404, 'BAD_REQUEST_ERROR', 'The requested URL was not found on the server.')
+
+    def _authorized(self, gateway):
+        header = self.headers.get('Authorization', '')
+        if not header.startswith('Basic '):
+            return False
+        key_id, _, key_secret = base64.b64decode(header[6:]).decode().partition(':')
+        return (key_id, key_secret) == (gateway.key_id, gateway.key_secret)
+
+
+class FakeGateway:
+    """
+    In-process HTTP server speaking the slice of the Razorpay API we use, for
+    tests and load tests. Point PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['BASE_URL']
+    (or a RazorpayGateway's base_url) at .url. Latency and injected 5xx
+    failures exercise the client's timeouts, retries and circuit breaker.
+
+        with FakeGateway('rzp_test_key', 'secret') as fake:
+            gateway = RazorpayGateway('rzp_test_key', 'secret', base_url=fake.url)
+    """
+
+    def __init__(self, key_id, key_secret, host='127.0.0.1', port=0, latency=0):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.latency = latency
+        self.orders = {}
+        self.payments = {}
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-gateway', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, count=1, status=503):
+        """Answer the next count requests with an HTTP error"""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _take_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def pay(self, order_id, status='captured', error_description=''):
+        """
+        Simulate the customer paying an order through Checkout. Returns the
+        payment entity plus the signature Checkout would hand the frontend.
+        """
+        with self._lock:
+            order = self.orders[order_id]
+            payment = {
+                'id': _entity_id('pay'),
+                'entity': 'payment',
+                'amount': order['amount'],
+                'currency': order['currency'],
+                'status': status,
+                'order_id': order_id,
+                'method': 'card',
+                'captured': status == 'captured',
+                'error_description': error_description or None,
+                'created_at': int(time.time()),
+            }
+            self.payments[payment['id']] = payment
+            order['amount_paid'] = order['amount'] if status == 'captured' else 0
+            order['amount_due'] = order['amount'] - order['amount_paid']
+            order['attempts'] += 1
+            order['status'] = 'paid' if status == 'captured' else 'attempted'
+        return payment, checkout_signature(self.key_secret, order_id, payment['id'])
+
+    def _create_order(self, body):
+        if not isinstance(body.get('amount'), int) or body['amount'] < 100:
+            return 400, 'The amount must be atleast INR 1.00'
+        order = {
+            'id': _entity_id('order'),
+            'entity': 'order',
+            'amount': body['amount'],
+            'amount_paid': 0,
+            'amount_due': body['amount'],
+            'currency': body.get('currency', 'INR'),
+            'receipt': body.get('receipt'),
+            'status': 'created',
+            'attempts': 0,
+            'notes': body.get('notes') or [],
+            'created_at': int(time.time()),
+        }
+        with self._lock:
+            self.orders[order['id']] = order
+        return 200, order
+
+    def _fetch_order(self, body, order_id):
+        order = self.orders.get(order_id)
+        return (200, order) if order else (400, 'The id provided does not exist')
+
+    def _fetch_order_payments(self, body, order_id):
+        if order_id not in self.orders:
+            return 400, 'The id provided does not exist'
+        items = [payment for payment in self.payments.values() if payment['order_id'] == order_id]
+        return 200, {'entity': 'collection', 'count': len(items), 'items': items}
+
+    def _fetch_payment(self, body, payment_id):
+        payment = self.payments.get(payment_id)
+        return (200, payment) if payment else (400, 'The id provided does not exist')
@@ -0,0 +1,199 @@
+# apps/payments/gateway.py
+import hashlib
+import hmac
+import logging
+import random
+import threading
+import time
+
+import razorpay
+import requests
+import urllib3
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+
+
+class PaymentGatewayError(Exception):
+    """The gateway could not complete a call; safe to surface to the user as a retryable failure"""
+
+
+class GatewayRejected(PaymentGatewayError):
+    """The gateway answered with a 4xx; retrying the same request will not help"""
+
+
+class CircuitOpenError(PaymentGatewayError):
+    """Recent calls kept failing, so calls fail fast until the breaker's cool-down passes"""
+
+
+class CircuitBreaker:
+    """
+    Per-process breaker: opens after failure_threshold consecutive failures,
+    rejects calls for reset_timeout seconds, then lets one trial call through.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == 'open' or (state == 'half_open' and self._trial_running):
+                raise CircuitOpenError("Payment gateway is unavailable, please retry shortly")
+            if state == 'half_open':
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Payment gateway circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+
+def _never_sent(error):
+    """True only when the request provably never reached the gateway (connect timeout or refused)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def checkout_signature(secret, order_id, payment_id):
+    """The signature Razorpay Checkout returns for a successful payment"""
+    return hmac.new(
+        key=secret.encode(),
+        msg=f"{order_id}|{payment_id}".encode(),
+        digestmod=hashlib.sha256,
+    ).hexdigest()
+
+
+class RazorpayGateway:
+    """
+    Razorpay API client with a pooled keep-alive session, strict connect/read
+    timeouts and a circuit breaker. Calls that never reached the gateway are
+    retried with jittered backoff; read timeouts and 5xx responses are only
+    retried for idempotent (read) calls, so an order is never created twice.
+    """
+
+    def __init__(self, key_id, key_secret, base_url=None, connect_timeout=3.05, read_timeout=10,
+                 max_retries=2, pool_size=20, breaker=None):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        options = {'base_url': base_url} if base_url else {}
+        self.client = razorpay.Client(session=session, auth=(key_id, key_secret), **options)
+        self.key_secret = key_secret
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+
+    def _call(self, func, *args, idempotent=False, **kwargs):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = func(*args, timeout=self.timeout, **kwargs)
+            except razorpay.errors.BadRequestError as e:
+                # The gateway is healthy, the request is wrong; don't trip the breaker
+                self.breaker.record_success()
+                raise GatewayRejected(str(e)) from e
+            except (requests.RequestException, razorpay.errors.ServerError, razorpay.errors.GatewayError) as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not (idempotent or _never_sent(e)):
+                    raise PaymentGatewayError(f"Payment gateway call failed: {e}") from e
+                attempt += 1
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                logger.info(f"Retrying payment gateway call in {delay:.2f}s ({type(e).__name__})")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def create_order(self, amount, currency, receipt, notes=None):
+        """Create an order for amount in the smallest currency unit (paise)"""
+        data = {'amount': amount, 'currency': currency, 'receipt': receipt, 'payment_capture': '1'}
+        if notes:
+            data['notes'] = notes
+        return self._call(self.client.order.create, data=data)
+
+    def fetch_order(self, order_id):
+        return self._call(self.client.order.fetch, order_id, idempotent=True)
+
+    def fetch_order_payments(self, order_id):
+        return self._call(self.client.order.payments, order_id, idempotent=True)['items']
+
+    def fetch_payment(self, payment_id):
+        return self._call(self.client.payment.fetch, payment_id, idempotent=True)
+
+    def verify_checkout_signature(self, order_id, payment_id, signature):
+        return hmac.compare_digest(checkout_signature(self.key_secret, order_id, payment_id), signature or '')
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def build_gateway():
+    config = settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']
+    return RazorpayGateway(
+        key_id=config['KEY_ID'],
+        key_secret=config['KEY_SECRET'],
+        base_url=config.get('BASE_URL'),
+        connect_timeout=config.get('CONNECT_TIMEOUT', 3.05),
+        read_timeout=config.get('READ_TIMEOUT', 10),
+        max_retries=config.get('MAX_RETRIES', 2),
+        pool_size=config.get('POOL_SIZE', 20),
+        breaker=CircuitBreaker(
+            failure_threshold=config.get('CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=config.get('CIRCUIT_RESET_SECONDS', 30),
+        ),
+    )
+
+
+def get_gateway():
+    """The process-wide gateway, built on first use so its pool and breaker are shared"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the shared gateway so the next call rebuilds it from settings (tests, fake gateway)"""
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
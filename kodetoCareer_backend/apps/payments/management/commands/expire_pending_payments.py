@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.expiry import expire_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Fail abandoned pending payments and release their coupon uses (run every 10 minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-minutes', type=int, default=None,
+                            help='Expire payments pending longer than this (defaults to PENDING_PAYMENT_TTL_MINUTES)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Payments updated per transaction')
+
+    def handle(self, *args, **options):
+        ttl = timedelta(minutes=options['ttl_minutes']) if options['ttl_minutes'] else None
+        summary = expire_pending_payments(ttl=ttl, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['expired']} pending payments expired, {summary['coupons_released']} coupon uses released"
+        ))
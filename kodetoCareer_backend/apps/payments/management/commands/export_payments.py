@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.payments.export import CHUNK_SIZE, FORMATS, export_queryset, stream_export
+from apps.payments.models import PaymentStatus
+
+
+class Command(BaseCommand):
+    help = "Stream payments to a CSV or JSON lines file (or stdout) for finance"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(FORMATS), default='csv', dest='file_format')
+        parser.add_argument('--start', help='First creation day (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last creation day (YYYY-MM-DD)')
+        parser.add_argument('--status', action='append', choices=PaymentStatus.values, dest='statuses',
+                            help='Only payments with this status (repeatable)')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows fetched per database round trip')
+        parser.add_argument('--output', '-o', help='File to write; stdout by default')
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_date(options['start']) if options['start'] else None
+            end = parse_date(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if (options['start'] and not start) or (options['end'] and not end):
+            raise CommandError("Dates must be YYYY-MM-DD")
+
+        # Gzip is binary, so without --output it needs the byte stream under stdout
+        stdout_buffer = getattr(self.stdout, 'buffer', None)
+        if options['gzip'] and not options['output'] and stdout_buffer is None:
+            raise CommandError("--gzip needs --output when stdout is not a binary stream")
+
+        payments = export_queryset(start, end, options['statuses'])
+        chunks = stream_export(payments, options['file_format'], options['gzip'], options['chunk_size'])
+        if options['output']:
+            written = 0
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+                    written += len(chunk)
+            self.stderr.write(f"{written} bytes written to {options['output']}")
+        elif options['gzip']:
+            self.stdout.flush()
+            for chunk in chunks:
+                stdout_buffer.write(chunk)
+            stdout_buffer.flush()
+        else:
+            # Chunks end on whole rows, so each one decodes on its own
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.models import Payment, PaymentStatus, ReceiptStatus
+from apps.payments.receipts import generate_receipts
+
+
+class Command(BaseCommand):
+    help = "Render receipt PDFs for completed payments that have none (or failed) across a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Rendering processes (defaults to RECEIPT_WORKERS)')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Maximum number of receipts to generate')
+        parser.add_argument('--regenerate', action='store_true',
+                            help='Also re-render receipts that are already ready')
+
+    def handle(self, *args, **options):
+        payments = Payment.objects.filter(status=PaymentStatus.COMPLETED)
+        if not options['regenerate']:
+            payments = payments.exclude(paymentreceipt__status=ReceiptStatus.READY)
+        payment_ids = payments.order_by('created_at').values_list('id', flat=True)
+        if options['limit']:
+            payment_ids = payment_ids[:options['limit']]
+
+        summary = generate_receipts(payment_ids, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['ready']} receipts generated, {summary['failed']} failed"
+        ))
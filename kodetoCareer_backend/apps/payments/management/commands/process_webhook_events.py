@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.models import WebhookEvent
+from apps.payments.webhooks import process_webhook_events, replay_events
+
+
+class Command(BaseCommand):
+    help = "Apply due webhook inbox events and retry failed ones (run every minute)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of payments to process per run')
+        parser.add_argument('--replay', action='append', dest='replay_ids', metavar='EVENT_ID',
+                            help='Re-queue a stored event before processing (repeatable)')
+
+    def handle(self, *args, **options):
+        if options['replay_ids']:
+            replayed = replay_events(WebhookEvent.objects.filter(event_id__in=options['replay_ids']))
+            self.stdout.write(f"{replayed} events re-queued")
+
+        summary = process_webhook_events(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['processed']} events processed, {summary['failed']} failed "
+            f"across {summary['payments']} payments"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.payments.revenue import rebuild_revenue
+
+
+class Command(BaseCommand):
+    help = "Backfill or recompute the daily revenue rollup from payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD); all history by default')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD); up to today by default')
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_date(options['start']) if options['start'] else None
+            end = parse_date(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if (options['start'] and not start) or (options['end'] and not end):
+            raise CommandError("Dates must be YYYY-MM-DD")
+
+        rows = rebuild_revenue(start, end)
+        self.stdout.write(self.style.SUCCESS(f"{rows} daily revenue rows written"))
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.payments.reconcile import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = "Settle pending payments from the gateway's order state (run every 15 minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Look at payments created in the last N hours')
+        parser.add_argument('--min-age', type=int, default=10,
+                            help='Skip payments younger than N minutes (checkout may still be open)')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Concurrent gateway requests')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Payments loaded per page')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without updating payments')
+
+    def handle(self, *args, **options):
+        summary = reconcile_payments(
+            since=timezone.now() - timedelta(hours=options['hours']),
+            min_age=timedelta(minutes=options['min_age']),
+            concurrency=options['concurrency'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        style = self.style.ERROR if summary['aborted'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{'[dry run] ' if options['dry_run'] else ''}{summary['checked']} payments checked in "
+            f"{summary['seconds']}s: {summary['completed']} completed, {summary['failed']} failed, "
+            f"{summary['unchanged']} unchanged, {summary['errors']} errors"
+            f"{' (stopped early: gateway unavailable)' if summary['aborted'] else ''}"
+        ))
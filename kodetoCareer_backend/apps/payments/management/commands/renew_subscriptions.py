@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.payments.subscriptions import renew_subscriptions
+
+
+class Command(BaseCommand):
+    help = "Create renewal orders for ending subscriptions and deactivate lapsed ones (run hourly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Concurrent gateway requests')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Subscriptions processed per batch')
+
+    def handle(self, *args, **options):
+        summary = renew_subscriptions(concurrency=options['concurrency'], chunk_size=options['chunk_size'])
+        if summary is None:
+            self.stdout.write(self.style.WARNING("Another renewal run is in progress; skipped"))
+            return
+
+        style = self.style.ERROR if summary['aborted'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{summary['created']} renewals created, {summary['retried']} retried: "
+            f"{summary['ordered']} orders created, {summary['failed']} failed; "
+            f"{summary['deactivated']} subscriptions deactivated"
+            f"{' (stopped early: gateway unavailable)' if summary['aborted'] else ''}"
+        ))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.payments.fake_gateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = "Serve a fake Razorpay API for local load tests (set RAZORPAY BASE_URL to the printed URL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Seconds to wait before answering each request')
+
+    def handle(self, *args, **options):
+        config = settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']
+        fake = FakeGateway(config['KEY_ID'], config['KEY_SECRET'], port=options['port'], latency=options['latency'])
+        with fake:
+            self.stdout.write(self.style.SUCCESS(f"Fake payment gateway listening on {fake.url}"))
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:17
+
+from django.db import migrations, models
+
+
+def mark_existing_reservations(apps, schema_editor):
+    # Payments that reached the gateway already incremented their coupon's used_count
+    Payment = apps.get_model('payments', 'Payment')
+    Payment.objects.filter(coupon__isnull=False).exclude(gateway_payment_id='').update(coupon_reserved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='max_uses_per_user',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='coupon_reserved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+def mark_existing_receipts(apps, schema_editor):
+    PaymentReceipt = apps.get_model('payments', 'PaymentReceipt')
+    PaymentReceipt.objects.exclude(pdf_file__isnull=True).exclude(pdf_file='').update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_coupon_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentreceipt',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_receipts, migrations.RunPython.noop),
+    ]
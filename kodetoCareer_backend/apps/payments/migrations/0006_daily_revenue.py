@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    # Same aggregation as apps.payments.revenue.rebuild_revenue, over all history
+    Payment = apps.get_model('payments', 'Payment')
+    DailyRevenue = apps.get_model('payments', 'DailyRevenue')
+    completed = Q(status='completed')
+    totals = (
+        Payment.objects.filter(status__in=['completed', 'failed'])
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'course_id', 'payment_method')
+        .annotate(
+            completed_count=Count('id', filter=completed),
+            failed_count=Count('id', filter=Q(status='failed')),
+            gross_amount=Sum('amount', filter=completed, default=0),
+            discount_amount=Sum('discount_amount', filter=completed, default=0),
+            net_amount=Sum('final_amount', filter=completed, default=0),
+        )
+        .order_by()
+    )
+    DailyRevenue.objects.bulk_create([DailyRevenue(**row) for row in totals.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_recordedvideo_play_count'),
+        ('payments', '0005_receipt_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_method', models.CharField(choices=[('razorpay', 'Razorpay'), ('stripe', 'Stripe'), ('paypal', 'PayPal')], max_length=20)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+            ],
+            options={
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'course', 'payment_method'), name='unique_daily_revenue'), models.UniqueConstraint(condition=models.Q(('course__isnull', True)), fields=('day', 'payment_method'), name='unique_daily_revenue_without_course')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
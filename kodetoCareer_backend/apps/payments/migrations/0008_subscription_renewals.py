@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_payment_status_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionRenewal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('attempts', models.IntegerField(default=1)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['is_active', 'end_date'], name='subscription_active_end_idx'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionrenewal',
+            name='payment',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='subscription_renewal', to='payments.payment'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionrenewal',
+            name='subscription',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renewals', to='payments.subscription'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptionrenewal',
+            constraint=models.UniqueConstraint(fields=('subscription', 'period_start'), name='unique_subscription_renewal_period'),
+        ),
+    ]
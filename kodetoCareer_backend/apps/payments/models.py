@@ -1,5 +1,6 @@
 # apps/payments/models.py
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
@@ -36,7 +37,8 @@ class Coupon(TimeStampedModel):
         null=True, blank=True
     )
     max_uses = models.IntegerField(default=1)
-    used_count = models.IntegerField(default=0)
+    max_uses_per_user = models.IntegerField(default=1)
+    used_count = models.IntegerField(default=0)  # completed plus reserved (pending) redemptions
     valid_from = models.DateTimeField()
     valid_to = models.DateTimeField()
     is_active = models.BooleanField(default=True)
@@ -69,6 +71,7 @@ class Payment(TimeStampedModel):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     final_amount = models.DecimalField(max_digits=10, decimal_places=2)
     coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True)
+    coupon_reserved = models.BooleanField(default=False)  # holds one unit of coupon.used_count
     payment_method = models.CharField(max_length=20, choices=PaymentMethod.choices)
     payment_id = models.CharField(max_length=100, unique=True)
     gateway_payment_id = models.CharField(max_length=100, blank=True)  # Actual payment ID from gateway
@@ -82,6 +85,10 @@ class Payment(TimeStampedModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Pending-payment sweeps and reconciliation scan by status over a creation window
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Payment {self.payment_id} - {self.user.username} - {self.status}"
@@ -129,6 +136,12 @@ class Subscription(TimeStampedModel):
     auto_renew = models.BooleanField(default=True)
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Renewal and expiry sweeps scan active subscriptions by end date
+            models.Index(fields=['is_active', 'end_date'], name='subscription_active_end_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.subscription_type}"
 
@@ -136,10 +149,95 @@ class Subscription(TimeStampedModel):
         from django.utils import timezone
         return timezone.now() > self.end_date
 
+class SubscriptionRenewal(TimeStampedModel):
+    """
+    The renewal of one subscription period. Its outcome is the status of
+    its (latest) payment; paying it extends the subscription to period_end.
+    """
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='renewals')
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='subscription_renewal')
+    period_start = models.DateTimeField()  # the subscription's end_date when the renewal was created
+    period_end = models.DateTimeField()
+    attempts = models.IntegerField(default=1)
+    error = models.TextField(blank=True)  # why the last attempt could not create a gateway order
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # At most one renewal order per subscription period, however often the job runs
+            models.UniqueConstraint(fields=['subscription', 'period_start'], name='unique_subscription_renewal_period'),
+        ]
+
+    def __str__(self):
+        return f"Renewal of {self.subscription} to {self.period_end:%Y-%m-%d}"
+
+class DailyRevenue(models.Model):
+    """
+    Completed/failed payment totals per day x course x payment method, kept
+    up to date from payment saves by apps.payments.revenue (bundles have no course)
+    """
+    day = models.DateField()
+    course = models.ForeignKey('courses.Course', on_delete=models.CASCADE, null=True, blank=True)
+    payment_method = models.CharField(max_length=20, choices=PaymentMethod.choices)
+    completed_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'course', 'payment_method'], name='unique_daily_revenue'),
+            # NULLs never collide in a unique index, so course-less rows need their own
+            models.UniqueConstraint(
+                fields=['day', 'payment_method'], condition=models.Q(course__isnull=True),
+                name='unique_daily_revenue_without_course'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.course_id or 'no course'} - {self.payment_method}"
+
+class ReceiptStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    READY = 'ready', 'Ready'
+    FAILED = 'failed', 'Failed'
+
 class PaymentReceipt(TimeStampedModel):
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE)
     receipt_number = models.CharField(max_length=50, unique=True)
     pdf_file = models.FileField(upload_to='receipts/', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=ReceiptStatus.choices, default=ReceiptStatus.PENDING)
 
     def __str__(self):
         return f"Receipt {self.receipt_number}"
+
+class WebhookEventStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    PROCESSED = 'processed', 'Processed'
+    FAILED = 'failed', 'Failed (will retry)'
+    DEAD = 'dead', 'Dead (gave up)'
+
+class WebhookEvent(TimeStampedModel):
+    """A verified gateway webhook delivery, stored before it is processed"""
+    event_id = models.CharField(max_length=100, unique=True)  # gateway event id, dedupes retried deliveries
+    event_type = models.CharField(max_length=100)
+    # Gateway order id (or payment id) the event belongs to; events are applied in order per key
+    payment_key = models.CharField(max_length=100, blank=True, db_index=True)
+    gateway_created_at = models.BigIntegerField(null=True, blank=True)  # unix time from the payload
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=WebhookEventStatus.choices, default=WebhookEventStatus.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} - {self.status}"
@@ -0,0 +1,115 @@
+# apps/payments/receipts.py
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from apps.common.background import run_in_background
+
+from .models import Payment, PaymentReceipt, PaymentStatus, ReceiptStatus
+from .utils import receipt_context, receipt_styles, render_receipt_pdf
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+
+def receipt_workers():
+    return getattr(settings, 'RECEIPT_WORKERS', None) or min(4, os.cpu_count() or 1)
+
+
+def ensure_receipt(payment):
+    receipt, created = PaymentReceipt.objects.get_or_create(
+        payment=payment,
+        defaults={'receipt_number': f"RCP-{payment.payment_id}-{timezone.now().strftime('%Y%m%d')}"}
+    )
+    return receipt
+
+
+def queue_receipt(payment):
+    """
+    Create the payment's receipt as pending and render its PDF once the
+    transaction commits; the generate_receipts command renders any that a
+    restart left pending
+    """
+    receipt = ensure_receipt(payment)
+    if receipt.status != ReceiptStatus.READY:
+        run_in_background(generate_receipt, payment.id)
+    return receipt
+
+
+def _store(payment, pdf):
+    receipt = ensure_receipt(payment)
+    if receipt.pdf_file:
+        receipt.pdf_file.delete(save=False)
+    receipt.pdf_file.save(f"receipt_{payment.payment_id}.pdf", ContentFile(pdf), save=False)
+    receipt.status = ReceiptStatus.READY
+    receipt.save(update_fields=['pdf_file', 'status', 'updated_at'])
+
+
+def _render_all(contexts, pool):
+    """Yield (pdf, error) per context, in order, rendering in the pool when there is one"""
+    if pool is None:
+        for context in contexts:
+            try:
+                yield render_receipt_pdf(context), None
+            except Exception as e:
+                yield None, e
+        return
+
+    futures = [pool.submit(render_receipt_pdf, context) for context in contexts]
+    for future in futures:
+        try:
+            yield future.result(), None
+        except Exception as e:
+            yield None, e
+
+
+def _generate_batch(payment_ids, pool, summary):
+    payments = list(
+        Payment.objects.filter(id__in=payment_ids, status=PaymentStatus.COMPLETED)
+        .select_related('user', 'course', 'bundle')
+    )
+    contexts = [receipt_context(payment) for payment in payments]
+    for payment, (pdf, error) in zip(payments, _render_all(contexts, pool)):
+        if error is None:
+            _store(payment, pdf)
+            summary['ready'] += 1
+        else:
+            logger.error(f"Error generating receipt for payment {payment.id}: {error}")
+            PaymentReceipt.objects.filter(payment=payment).update(status=ReceiptStatus.FAILED, updated_at=timezone.now())
+            summary['failed'] += 1
+
+
+def generate_receipts(payment_ids, workers=None):
+    """
+    Render and store receipts for completed payments. Rendering is CPU-bound
+    and needs no database, so batches are spread over a process pool whose
+    workers build the stylesheet once; files and rows are written here.
+    Returns counts of ready and failed receipts.
+    """
+    payment_ids = list(payment_ids)
+    workers = min(workers or receipt_workers(), len(payment_ids))
+    summary = {'ready': 0, 'failed': 0}
+    batches = [payment_ids[i:i + BATCH_SIZE] for i in range(0, len(payment_ids), BATCH_SIZE)]
+
+    if workers <= 1:
+        for batch in batches:
+            _generate_batch(batch, None, summary)
+        return summary
+
+    # spawn, so workers never inherit the web process's threads, locks or DB connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=receipt_styles) as pool:
+        for batch in batches:
+            _generate_batch(batch, pool, summary)
+    return summary
+
+
+def generate_receipt(payment_id):
+    """Render and store one payment's receipt; returns True when its PDF is ready"""
+    return generate_receipts([payment_id], workers=1)['ready'] == 1
@@ -0,0 +1,101 @@
+# apps/payments/reconcile.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .gateway import CircuitOpenError, PaymentGatewayError, get_gateway
+from .models import Payment, PaymentStatus
+from .webhooks import handle_payment_captured, handle_payment_failed
+
+logger = logging.getLogger(__name__)
+
+
+def _pages(queryset, size):
+    """Keyset pagination over (created_at, id), so each page is one indexed range query"""
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(created_at__gte=last[0]).exclude(created_at=last[0], id__lte=last[1])
+        rows = list(page.order_by('created_at', 'id').values('id', 'created_at', 'gateway_payment_id')[:size])
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1]['created_at'], rows[-1]['id'])
+
+
+def _outcome(attempts):
+    """The gateway payment that decides a pending order, with the handler to apply it, or None"""
+    captured = [attempt for attempt in attempts if attempt.get('status') == 'captured']
+    if captured:
+        return handle_payment_captured, captured[0]
+    if attempts and all(attempt.get('status') == 'failed' for attempt in attempts):
+        return handle_payment_failed, max(attempts, key=lambda attempt: attempt.get('created_at') or 0)
+    # No attempt yet, or one still authorized/in flight
+    return None
+
+
+def reconcile_payments(since=None, min_age=timedelta(minutes=10), concurrency=8, chunk_size=200,
+                       dry_run=False, gateway=None):
+    """
+    Settle pending payments from the gateway's record of their orders, for
+    checkouts whose verify call and webhook never arrived. Orders are fetched
+    concurrency at a time (bounded to respect gateway rate limits); updates
+    go through the webhook handlers, so they are idempotent and safe to run
+    alongside live traffic. Returns a summary dict.
+    """
+    gateway = gateway or get_gateway()
+    now = timezone.now()
+    since = since or now - timedelta(days=1)
+    payments = Payment.objects.filter(
+        status=PaymentStatus.PENDING,
+        created_at__gte=since,
+        created_at__lte=now - min_age,
+    ).exclude(gateway_payment_id='')
+
+    summary = {'checked': 0, 'completed': 0, 'failed': 0, 'unchanged': 0, 'errors': 0, 'aborted': False}
+    started = time.monotonic()
+
+    def fetch(row):
+        try:
+            return row, gateway.fetch_order_payments(row['gateway_payment_id']), None
+        except PaymentGatewayError as e:
+            return row, None, e
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='reconcile') as pool:
+        for page in _pages(payments, chunk_size):
+            for row, attempts, error in pool.map(fetch, page):
+                summary['checked'] += 1
+                if isinstance(error, CircuitOpenError):
+                    summary['aborted'] = True
+                    break
+                if error is not None:
+                    logger.warning(f"Could not fetch order {row['gateway_payment_id']} for payment {row['id']}: {error}")
+                    summary['errors'] += 1
+                    continue
+
+                outcome = _outcome(attempts)
+                if outcome is None:
+                    summary['unchanged'] += 1
+                    continue
+                handler, entity = outcome
+                result = 'completed' if handler is handle_payment_captured else 'failed'
+                if not dry_run:
+                    try:
+                        with transaction.atomic():
+                            handler(entity)
+                    except Exception:
+                        logger.exception(f"Could not reconcile payment {row['id']}")
+                        summary['errors'] += 1
+                        continue
+                summary[result] += 1
+            if summary['aborted']:
+                logger.error("Payment gateway circuit is open; reconciliation stopped early")
+                break
+
+    summary['seconds'] = round(time.monotonic() - started, 1)
+    return summary
@@ -0,0 +1,158 @@
+# apps/payments/revenue.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyRevenue, Payment, PaymentStatus
+
+AMOUNT_FIELDS = ('gross_amount', 'discount_amount', 'net_amount')
+TOTAL_FIELDS = ('completed_count', 'failed_count') + AMOUNT_FIELDS
+PAYMENT_FIELDS = ('status', 'created_at', 'course_id', 'payment_method', 'amount', 'discount_amount', 'final_amount')
+
+GROUPINGS = {
+    'day': 'day',
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+    'course': 'course_id',
+    'payment_method': 'payment_method',
+}
+
+
+def contribution(values):
+    """
+    (rollup key, totals) a payment adds to the rollup, from a dict of its
+    PAYMENT_FIELDS; None for statuses the rollup does not count
+    """
+    if not values or values['status'] not in (PaymentStatus.COMPLETED, PaymentStatus.FAILED):
+        return None
+    key = (timezone.localtime(values['created_at']).date(), values['course_id'], values['payment_method'])
+    if values['status'] == PaymentStatus.FAILED:
+        return key, {'failed_count': 1}
+    return key, {
+        'completed_count': 1,
+        'gross_amount': values['amount'],
+        'discount_amount': values['discount_amount'],
+        'net_amount': values['final_amount'],
+    }
+
+
+def _add(key, totals):
+    day, course_id, payment_method = key
+    rows = DailyRevenue.objects.filter(day=day, course_id=course_id, payment_method=payment_method)
+    increments = {field: F(field) + value for field, value in totals.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailyRevenue.objects.create(day=day, course_id=course_id, payment_method=payment_method, **totals)
+    except IntegrityError:
+        # Another writer created the row first
+        rows.update(**increments)
+
+
+def apply_change(before, after):
+    """Move a payment's contribution from its old state to its new one (either may be None)"""
+    apply_changes([(before, after)])
+
+
+def apply_changes(changed):
+    """apply_change for many (before, after) pairs, with one update per touched rollup row"""
+    changes = defaultdict(lambda: defaultdict(Decimal))
+    for before, after in changed:
+        for sign, values in ((-1, before), (1, after)):
+            counted = contribution(values)
+            if counted:
+                key, totals = counted
+                for field, value in totals.items():
+                    changes[key][field] += sign * value
+
+    with transaction.atomic():
+        for key, totals in changes.items():
+            totals = {field: value for field, value in totals.items() if value}
+            if totals:
+                _add(key, totals)
+
+
+def rebuild_revenue(start=None, end=None):
+    """
+    Recompute the rollup for days start..end (inclusive, open-ended when
+    None) from payments. Used to backfill, to correct drift, and after bulk
+    status updates that bypass save(); payments saved on those days while it
+    runs may be missed, so rebuild closed days or run it when quiet.
+    Returns the number of rollup rows written.
+    """
+    payments = Payment.objects.filter(status__in=[PaymentStatus.COMPLETED, PaymentStatus.FAILED])
+    rows = DailyRevenue.objects.all()
+    if start:
+        payments = payments.filter(created_at__date__gte=start)
+        rows = rows.filter(day__gte=start)
+    if end:
+        payments = payments.filter(created_at__date__lte=end)
+        rows = rows.filter(day__lte=end)
+
+    completed = Q(status=PaymentStatus.COMPLETED)
+    totals = (
+        payments.annotate(day=TruncDate('created_at'))
+        .values('day', 'course_id', 'payment_method')
+        .annotate(
+            completed_count=Count('id', filter=completed),
+            failed_count=Count('id', filter=Q(status=PaymentStatus.FAILED)),
+            gross_amount=Sum('amount', filter=completed, default=0),
+            discount_amount=Sum('discount_amount', filter=completed, default=0),
+            net_amount=Sum('final_amount', filter=completed, default=0),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        rows.delete()
+        created = DailyRevenue.objects.bulk_create(
+            [DailyRevenue(**row) for row in totals.iterator()], batch_size=1000
+        )
+    return len(created)
+
+
+def revenue_report(start, end, group_by=()):
+    """
+    Totals for days start..end from the rollup in one grouped query: overall
+    totals, totals per payment method and a series per group_by (keys of GROUPINGS)
+    """
+    groups = {name: GROUPINGS[name] for name in group_by}
+    expressions = {name: value for name, value in groups.items() if not isinstance(value, str)}
+    columns = [value for value in groups.values() if isinstance(value, str)] + list(expressions)
+    if 'payment_method' not in columns:
+        columns.append('payment_method')
+
+    rows = (
+        DailyRevenue.objects.filter(day__range=[start, end])
+        .annotate(**expressions)
+        .values(*columns)
+        .annotate(**{field: Sum(field) for field in TOTAL_FIELDS})
+        .order_by(*columns)
+    )
+
+    def empty():
+        return dict.fromkeys(TOTAL_FIELDS, 0)
+
+    totals = empty()
+    methods = defaultdict(empty)
+    series = defaultdict(empty)
+    for row in rows:
+        label = tuple((name, row[value if isinstance(value, str) else name]) for name, value in groups.items())
+        for field in TOTAL_FIELDS:
+            totals[field] += row[field]
+            methods[row['payment_method']][field] += row[field]
+            series[label][field] += row[field]
+
+    totals['average_transaction_value'] = (
+        (Decimal(totals['net_amount']) / totals['completed_count']).quantize(Decimal('0.01'))
+        if totals['completed_count'] else 0
+    )
+    return {
+        'totals': totals,
+        'payment_methods': [{'payment_method': method, **values} for method, values in methods.items()],
+        'series': [{**dict(label), **values} for label, values in series.items()] if groups else [],
+    }
@@ -84,8 +84,8 @@ class PaymentReceiptSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PaymentReceipt
-        fields = ['id', 'receipt_number', 'pdf_file', 'payment_details', 'created_at']
-        read_only_fields = ['id', 'receipt_number', 'created_at']
+        fields = ['id', 'receipt_number', 'status', 'pdf_file', 'payment_details', 'created_at']
+        read_only_fields = ['id', 'receipt_number', 'status', 'pdf_file', 'created_at']
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
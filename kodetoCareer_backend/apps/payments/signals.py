@@ -0,0 +1,38 @@
+# apps/payments/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .coupons import invalidate_coupon
+from .models import Coupon, Payment, PaymentStatus
+from .revenue import PAYMENT_FIELDS, apply_change
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_cached_coupon(sender, instance, **kwargs):
+    invalidate_coupon(instance.code)
+
+
+def _revenue_values(payment):
+    return {field: getattr(payment, field) for field in PAYMENT_FIELDS}
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_state(sender, instance, **kwargs):
+    # Stored values, so post_save can tell what the save changed
+    instance._previous = Payment.objects.filter(pk=instance.pk).values(*PAYMENT_FIELDS).first()
+
+
+@receiver(post_save, sender=Payment)
+def handle_payment_change(sender, instance, **kwargs):
+    apply_change(instance._previous, _revenue_values(instance))
+
+    previous_status = instance._previous['status'] if instance._previous else None
+    if instance.status == PaymentStatus.COMPLETED and previous_status != PaymentStatus.COMPLETED:
+        from .subscriptions import complete_renewal
+        complete_renewal(instance)
+
+
+@receiver(post_delete, sender=Payment)
+def remove_from_revenue_rollup(sender, instance, **kwargs):
+    apply_change(_revenue_values(instance), None)
@@ -0,0 +1,237 @@
+# apps/payments/subscriptions.py
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from apps.notifications.models import Notification
+
+from .gateway import CircuitOpenError, PaymentGatewayError, get_gateway
+from .models import Payment, PaymentStatus, Subscription, SubscriptionRenewal, SubscriptionType
+from .revenue import PAYMENT_FIELDS, apply_changes
+
+logger = logging.getLogger(__name__)
+
+RUN_LOCK_KEY = 'payments:renew_subscriptions:lock'
+RUN_LOCK_TIMEOUT = 60 * 60
+MAX_ATTEMPTS = 3
+UNPAID_REASON = "Renewal not paid"
+
+RENEWAL_PERIODS = {
+    SubscriptionType.MONTHLY: relativedelta(months=1),
+    SubscriptionType.YEARLY: relativedelta(years=1),
+}
+
+
+def due_subscriptions(now, lead, grace):
+    """
+    Active auto-renewing subscriptions ending within lead (and not yet lapsed)
+    that have no renewal for their current period
+    """
+    renewed = SubscriptionRenewal.objects.filter(subscription=OuterRef('pk'), period_start=OuterRef('end_date'))
+    return Subscription.objects.filter(
+        is_active=True,
+        auto_renew=True,
+        end_date__lte=now + lead,
+        end_date__gte=now - grace,
+        subscription_type__in=list(RENEWAL_PERIODS),
+    ).filter(~Exists(renewed))
+
+
+def retryable_renewals():
+    """Renewals whose last attempt could not create a gateway order"""
+    return SubscriptionRenewal.objects.filter(
+        payment__status=PaymentStatus.FAILED,
+        attempts__lt=MAX_ATTEMPTS,
+        subscription__is_active=True,
+        subscription__end_date=F('period_start'),
+    ).exclude(error='')
+
+
+def _renewal_payment(subscription):
+    amount = subscription.payment.amount
+    return Payment(
+        id=uuid.uuid4(),
+        user_id=subscription.user_id,
+        amount=amount,
+        discount_amount=0,
+        final_amount=amount,
+        payment_method=subscription.payment.payment_method,
+        payment_id=str(uuid.uuid4()),
+        status=PaymentStatus.PENDING,
+    )
+
+
+def _process_chunk(items, gateway, pool, now, summary):
+    """
+    Create renewal payments and their gateway orders for items, a list of
+    (subscription, existing renewal or None). Returns False once the
+    gateway's circuit is open.
+    """
+    with transaction.atomic():
+        payments = Payment.objects.bulk_create([_renewal_payment(subscription) for subscription, renewal in items])
+        created, retried = [], []
+        for (subscription, renewal), payment in zip(items, payments):
+            if renewal is None:
+                created.append(SubscriptionRenewal(
+                    subscription=subscription,
+                    payment=payment,
+                    period_start=subscription.end_date,
+                    period_end=subscription.end_date + RENEWAL_PERIODS[subscription.subscription_type],
+                ))
+            else:
+                renewal.payment = payment
+                renewal.attempts += 1
+                renewal.error = ''
+                renewal.updated_at = now
+                retried.append(renewal)
+        SubscriptionRenewal.objects.bulk_create(created)
+        SubscriptionRenewal.objects.bulk_update(retried, ['payment', 'attempts', 'error', 'updated_at'])
+    renewals = created + retried
+
+    def create_order(renewal):
+        payment = renewal.payment
+        try:
+            order = gateway.create_order(
+                amount=int(payment.final_amount * 100),
+                currency='INR',
+                receipt=payment.payment_id,
+                notes={'subscription_id': str(renewal.subscription_id), 'renewal': 'true'},
+            )
+            return renewal, order, None
+        except PaymentGatewayError as e:
+            return renewal, None, e
+
+    ordered, failed = [], []
+    circuit_open = False
+    for renewal, order, error in pool.map(create_order, renewals):
+        if error is None:
+            renewal.payment.gateway_payment_id = order['id']
+            ordered.append(renewal)
+        else:
+            circuit_open = circuit_open or isinstance(error, CircuitOpenError)
+            renewal.payment.status = PaymentStatus.FAILED
+            renewal.payment.failure_reason = "Payment gateway unavailable"
+            renewal.error = str(error)
+            failed.append(renewal)
+
+    with transaction.atomic():
+        Payment.objects.bulk_update([renewal.payment for renewal in ordered], ['gateway_payment_id'])
+        Payment.objects.bulk_update([renewal.payment for renewal in failed], ['status', 'failure_reason'])
+        SubscriptionRenewal.objects.bulk_update(failed, ['error'])
+        # bulk_update bypasses the save signals that keep the revenue rollup current
+        apply_changes([
+            ({**values, 'status': PaymentStatus.PENDING}, values)
+            for values in ({field: getattr(renewal.payment, field) for field in PAYMENT_FIELDS} for renewal in failed)
+        ])
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=renewal.payment.user_id,
+                title="Renew your subscription",
+                message=(
+                    f"Your {renewal.subscription.get_subscription_type_display().lower()} subscription ends on "
+                    f"{timezone.localtime(renewal.period_start):%B %d, %Y}. Complete the renewal payment to keep access."
+                ),
+                notification_type='payment',
+                priority='high',
+            )
+            for renewal in ordered
+        ])
+
+    summary['created'] += len(created)
+    summary['retried'] += len(retried)
+    summary['ordered'] += len(ordered)
+    summary['failed'] += len(failed)
+    return not circuit_open
+
+
+def deactivate_lapsed(now, grace, chunk_size=1000):
+    """
+    Deactivate subscriptions past end_date + grace, a chunk at a time, and
+    fail the renewal payments they left unpaid. Returns the number deactivated.
+    """
+    lapsed = Subscription.objects.filter(is_active=True, end_date__lt=now - grace).exclude(
+        subscription_type=SubscriptionType.LIFETIME
+    )
+    deactivated = 0
+    while True:
+        ids = list(lapsed.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deactivated
+        with transaction.atomic():
+            deactivated += Subscription.objects.filter(pk__in=ids, is_active=True).update(is_active=False, updated_at=now)
+            unpaid = list(
+                Payment.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(subscription_renewal__subscription_id__in=ids, status=PaymentStatus.PENDING)
+                .values('id', *PAYMENT_FIELDS)
+            )
+            Payment.objects.filter(id__in=[row['id'] for row in unpaid], status=PaymentStatus.PENDING).update(
+                status=PaymentStatus.FAILED, failure_reason=UNPAID_REASON, updated_at=now
+            )
+            apply_changes([(row, {**row, 'status': PaymentStatus.FAILED}) for row in unpaid])
+
+
+def renew_subscriptions(now=None, lead=None, grace=None, concurrency=8, chunk_size=500, gateway=None):
+    """
+    Create renewal orders for subscriptions about to end, retry renewals whose
+    order creation failed, and deactivate lapsed subscriptions. Orders are
+    created concurrency at a time; everything else is bulk/set-based. Only one
+    run at a time (cache lock); returns a summary dict, or None if a run is
+    already in progress.
+    """
+    if not cache.add(RUN_LOCK_KEY, 1, RUN_LOCK_TIMEOUT):
+        return None
+
+    try:
+        now = now or timezone.now()
+        lead = lead or timedelta(days=getattr(settings, 'SUBSCRIPTION_RENEWAL_LEAD_DAYS', 3))
+        grace = grace or timedelta(days=getattr(settings, 'SUBSCRIPTION_GRACE_DAYS', 3))
+        gateway = gateway or get_gateway()
+        summary = {'created': 0, 'retried': 0, 'ordered': 0, 'failed': 0, 'deactivated': 0, 'aborted': False}
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='renewals') as pool:
+            retry_ids = list(retryable_renewals().values_list('id', flat=True))
+            for start in range(0, len(retry_ids), chunk_size):
+                renewals = SubscriptionRenewal.objects.filter(id__in=retry_ids[start:start + chunk_size]).select_related(
+                    'subscription__payment'
+                )
+                items = [(renewal.subscription, renewal) for renewal in renewals]
+                if items and not _process_chunk(items, gateway, pool, now, summary):
+                    summary['aborted'] = True
+                    break
+
+            # Each processed subscription gains a renewal for its period and drops out of the due set
+            due = due_subscriptions(now, lead, grace).select_related('payment').order_by('end_date', 'id')
+            while not summary['aborted']:
+                items = [(subscription, None) for subscription in due[:chunk_size]]
+                if not items:
+                    break
+                if not _process_chunk(items, gateway, pool, now, summary):
+                    summary['aborted'] = True
+
+        if summary['aborted']:
+            logger.error("Payment gateway circuit is open; subscription renewals stopped early")
+        summary['deactivated'] = deactivate_lapsed(now, grace)
+        return summary
+    finally:
+        cache.delete(RUN_LOCK_KEY)
+
+
+def complete_renewal(payment):
+    """Extend the subscription a renewal payment paid for; a no-op for other payments and repeats"""
+    renewal = SubscriptionRenewal.objects.filter(payment=payment).first()
+    if renewal is None:
+        return False
+    return bool(Subscription.objects.filter(pk=renewal.subscription_id, end_date=renewal.period_start).update(
+        end_date=renewal.period_end,
+        is_active=True,
+        payment=payment,
+        updated_at=timezone.now(),
+    ))
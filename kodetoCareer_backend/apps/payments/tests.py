@@ -1,3 +1,367 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.courses.models import Category, Course, Enrollment
+from .coupons import CouponError, confirm_coupon, release_coupon, reserve_coupon
+from .expiry import EXPIRED_REASON, _locked_chunk, expirable_payments, expire_pending_payments
+from .gateway import CircuitOpenError, GatewayRejected
+from .models import (
+    Coupon, Payment, PaymentStatus, Subscription, SubscriptionRenewal, WebhookEvent, WebhookEventStatus,
+)
+from .webhooks import process_webhook_events, record_event
+
+
+def make_payment(user, **fields):
+    fields.setdefault('amount', Decimal('100.00'))
+    fields.setdefault('final_amount', fields['amount'])
+    fields.setdefault('payment_method', 'razorpay')
+    fields.setdefault('payment_id', f"pay-{Payment.objects.count() + 1}")
+    return Payment.objects.create(user=user, **fields)
+
+
+def make_coupon(**fields):
+    now = timezone.now()
+    fields.setdefault('code', 'SAVE10')
+    fields.setdefault('discount_percentage', Decimal('10'))
+    fields.setdefault('valid_from', now - timedelta(days=1))
+    fields.setdefault('valid_to', now + timedelta(days=1))
+    return Coupon.objects.create(**fields)
+
+
+def backdate(payment, **delta):
+    Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(**delta))
+
+
+class ExpirePendingPaymentsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        self.coupon = make_coupon(max_uses=5, used_count=1)
+
+    def test_expires_stale_pending_payments_and_releases_their_coupon_uses(self):
+        stale = make_payment(self.user, coupon=self.coupon, coupon_reserved=True)
+        backdate(stale, hours=2)
+
+        summary = expire_pending_payments(ttl=timedelta(hours=1))
+
+        self.assertEqual(summary, {'expired': 1, 'coupons_released': 1})
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, PaymentStatus.FAILED)
+        self.assertEqual(stale.failure_reason, EXPIRED_REASON)
+        self.assertFalse(stale.coupon_reserved)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+
+    def test_leaves_recent_settled_and_renewal_payments_alone(self):
+        recent = make_payment(self.user)
+        completed = make_payment(self.user, status=PaymentStatus.COMPLETED)
+        renewal = make_payment(self.user)
+        subscription = Subscription.objects.create(
+            user=self.user, subscription_type='monthly', payment=completed,
+            start_date=timezone.now() - timedelta(days=30), end_date=timezone.now(),
+        )
+        SubscriptionRenewal.objects.create(
+            subscription=subscription, payment=renewal,
+            period_start=subscription.end_date, period_end=subscription.end_date + timedelta(days=30),
+        )
+        backdate(completed, hours=2)
+        backdate(renewal, hours=2)
+
+        summary = expire_pending_payments(ttl=timedelta(hours=1))
+
+        self.assertEqual(summary['expired'], 0)
+        statuses = dict(Payment.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[recent.pk], PaymentStatus.PENDING)
+        self.assertEqual(statuses[completed.pk], PaymentStatus.COMPLETED)
+        self.assertEqual(statuses[renewal.pk], PaymentStatus.PENDING)
+
+    def test_works_through_several_chunks(self):
+        for _ in range(5):
+            backdate(make_payment(self.user), hours=2)
+
+        summary = expire_pending_payments(ttl=timedelta(hours=1), chunk_size=2)
+
+        self.assertEqual(summary['expired'], 5)
+        self.assertFalse(Payment.objects.filter(status=PaymentStatus.PENDING).exists())
+
+    def test_locked_chunk_is_valid_for_update_on_postgresql(self):
+        # SQLite ignores FOR UPDATE, so compile the query as PostgreSQL would run it.
+        # PostgreSQL refuses FOR UPDATE on the nullable side of an outer join.
+        postgres = PostgresDatabaseWrapper({**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql'})
+        query = _locked_chunk(expirable_payments(timezone.now(), timedelta(hours=1)), 500).query
+        with mock.patch.object(postgres, 'get_autocommit', return_value=False):
+            sql, params = query.get_compiler(connection=postgres).as_sql()
+
+        self.assertNotIn('OUTER JOIN', sql)
+        self.assertIn('FOR UPDATE OF "payments_payment" SKIP LOCKED', sql)
+
+
+class CouponReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        self.coupon = make_coupon(max_uses=3, max_uses_per_user=2)
+
+    def checkout(self, user=None):
+        # Mirrors CreatePaymentView: the reservation shares the payment's transaction
+        user = user or self.user
+        with transaction.atomic():
+            reserve_coupon(self.coupon, user)
+            return make_payment(user, coupon=self.coupon, coupon_reserved=True)
+
+    def used_count(self):
+        self.coupon.refresh_from_db()
+        return self.coupon.used_count
+
+    def test_reserve_counts_pending_and_completed_uses_against_the_per_user_limit(self):
+        self.checkout()
+        Payment.objects.update(status=PaymentStatus.COMPLETED)
+        self.checkout()
+
+        with self.assertRaisesMessage(CouponError, 'already been used by this user'):
+            self.checkout()
+        self.assertEqual(self.used_count(), 2)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_released_and_failed_payments_do_not_count_against_the_user(self):
+        payment = self.checkout()
+        Payment.objects.filter(pk=payment.pk).update(status=PaymentStatus.FAILED)
+        release_coupon(payment)
+        self.checkout()
+        self.checkout()
+
+        self.assertEqual(self.used_count(), 2)
+
+    def test_reserve_stops_at_max_uses(self):
+        for number in range(3):
+            self.checkout(User.objects.create_user(username=f"u{number}", email=f"u{number}@example.com", password='pw'))
+
+        with self.assertRaisesMessage(CouponError, 'expired or invalid'):
+            self.checkout()
+        self.assertEqual(self.used_count(), 3)
+
+    def test_reserve_rejects_inactive_and_expired_coupons(self):
+        Coupon.objects.filter(pk=self.coupon.pk).update(valid_to=timezone.now() - timedelta(minutes=1))
+
+        with self.assertRaisesMessage(CouponError, 'expired or invalid'):
+            self.checkout()
+        self.assertEqual(self.used_count(), 0)
+
+    def test_release_returns_the_use_once(self):
+        payment = self.checkout()
+
+        self.assertTrue(release_coupon(payment))
+        self.assertFalse(release_coupon(payment))
+        self.assertFalse(release_coupon(Payment.objects.get(pk=payment.pk)))
+        self.assertEqual(self.used_count(), 0)
+
+    def test_confirm_retakes_a_released_use_even_past_max_uses(self):
+        payment = self.checkout()
+        release_coupon(payment)
+        Coupon.objects.filter(pk=self.coupon.pk).update(used_count=3)
+
+        confirm_coupon(payment)
+        confirm_coupon(payment)
+
+        self.assertEqual(self.used_count(), 4)
+        payment.refresh_from_db()
+        self.assertTrue(payment.coupon_reserved)
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+@mock.patch('apps.payments.views.queue_receipt')
+@mock.patch('apps.payments.views.get_gateway')
+class CreatePaymentViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            category=category, title='Python', slug='python', description='Basics', price=100, duration_hours=10,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, **data):
+        return self.client.post('/api/v1/payments/create-payment/', {'course_id': self.course.id, **data}, format='json')
+
+    def test_creates_a_gateway_order(self, get_gateway, queue_receipt):
+        get_gateway.return_value.create_order.return_value = {'id': 'order_1'}
+
+        response = self.create()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['razorpay_order_id'], 'order_1')
+        get_gateway.return_value.create_order.assert_called_once_with(
+            amount=10000, currency='INR', receipt=Payment.objects.get().payment_id,
+        )
+
+    def test_fully_discounted_order_completes_without_the_gateway(self, get_gateway, queue_receipt):
+        queue_receipt.return_value.status = 'pending'
+        coupon = make_coupon(code='FREE', discount_percentage=Decimal('100'))
+
+        response = self.create(coupon_code='FREE')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['status'], response.data['amount']), ('completed', Decimal('0')))
+        get_gateway.assert_not_called()
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, PaymentStatus.COMPLETED)
+        self.assertTrue(payment.coupon_reserved)
+        self.assertTrue(Enrollment.objects.filter(student=self.user, course=self.course).exists())
+        queue_receipt.assert_called_once_with(payment)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.used_count, 1)
+
+    def test_rejected_order_is_a_bad_request(self, get_gateway, queue_receipt):
+        get_gateway.return_value.create_order.side_effect = GatewayRejected('amount below minimum')
+        make_coupon(max_uses=5)
+
+        response = self.create(coupon_code='SAVE10')
+
+        self.assertEqual(response.status_code, 400)
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, PaymentStatus.FAILED)
+        self.assertFalse(payment.coupon_reserved)
+        self.assertEqual(Coupon.objects.get().used_count, 0)
+
+    def test_unavailable_gateway_is_retryable(self, get_gateway, queue_receipt):
+        get_gateway.return_value.create_order.side_effect = CircuitOpenError('circuit open')
+
+        response = self.create()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(Payment.objects.get().status, PaymentStatus.FAILED)
+
+
+def captured_payload(payment_id='pay_1', order_id='order_1', event='payment.captured', created_at=1700000000):
+    return {
+        'event': event,
+        'created_at': created_at,
+        'payload': {'payment': {'entity': {'id': payment_id, 'order_id': order_id, 'error_description': 'Declined'}}},
+    }
+
+
+@override_settings(ALLOWED_HOSTS=['*'], BACKGROUND_TASKS_EAGER=True)
+@mock.patch('apps.payments.webhooks.queue_receipt')
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            category=category, title='Python', slug='python', description='Basics', price=100, duration_hours=10,
+        )
+        self.payment = make_payment(self.user, course=self.course, gateway_payment_id='order_1')
+
+    def deliver(self, payload, event_id=None, secret=None):
+        body = json.dumps(payload).encode()
+        secret = secret or settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['WEBHOOK_SECRET']
+        headers = {'HTTP_X_RAZORPAY_SIGNATURE': hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()}
+        if event_id:
+            headers['HTTP_X_RAZORPAY_EVENT_ID'] = event_id
+        # Run the processing queued for after the request's transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/v1/payments/webhook/razorpay/', body, content_type='application/json', **headers)
+
+    def test_duplicate_delivery_is_stored_and_applied_once(self, queue_receipt):
+        for _ in range(2):
+            response = self.deliver(captured_payload(), event_id='evt_1')
+            self.assertEqual(response.status_code, 200)
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.event_id, event.status, event.attempts), ('evt_1', WebhookEventStatus.PROCESSED, 1))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentStatus.COMPLETED)
+        self.assertEqual(self.payment.gateway_payment_id, 'pay_1')
+        self.assertEqual(Enrollment.objects.filter(student=self.user, course=self.course).count(), 1)
+        queue_receipt.assert_called_once()
+
+    def test_deliveries_without_an_event_id_dedupe_on_the_signed_body(self, queue_receipt):
+        self.deliver(captured_payload())
+        self.deliver(captured_payload())
+        self.deliver(captured_payload(created_at=1700000001))
+
+        self.assertEqual(WebhookEvent.objects.count(), 2)
+        self.assertTrue(WebhookEvent.objects.filter(event_id__startswith='sha256:').exists())
+
+    def test_bad_signature_is_rejected_and_not_stored(self, queue_receipt):
+        response = self.deliver(captured_payload(), event_id='evt_1', secret='wrong')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_late_failure_does_not_undo_a_capture(self, queue_receipt):
+        self.deliver(captured_payload(created_at=200), event_id='evt_captured')
+        self.deliver(captured_payload(event='payment.failed', created_at=100), event_id='evt_failed')
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, PaymentStatus.COMPLETED)
+        self.assertEqual(set(WebhookEvent.objects.values_list('status', flat=True)), {WebhookEventStatus.PROCESSED})
+
+    def test_events_wait_behind_an_earlier_event_of_the_same_payment(self, queue_receipt):
+        # The payment's order is not committed yet, so its first event must be retried
+        for event_id, event, created_at in (('evt_failed', 'payment.failed', 100), ('evt_captured', 'payment.captured', 200)):
+            body = json.dumps(captured_payload(order_id='order_2', event=event, created_at=created_at)).encode()
+            record_event(body, json.loads(body), event_id=event_id)
+        now = timezone.now()
+
+        summary = process_webhook_events(now=now)
+
+        self.assertEqual((summary['processed'], summary['failed']), (0, 1))
+        statuses = dict(WebhookEvent.objects.values_list('event_id', 'status'))
+        self.assertEqual(statuses, {'evt_failed': WebhookEventStatus.FAILED, 'evt_captured': WebhookEventStatus.PENDING})
+
+        # Once the payment exists both apply, in gateway order: failed, then captured
+        payment = make_payment(self.user, course=self.course, gateway_payment_id='order_2')
+        summary = process_webhook_events(now=now + timedelta(hours=2))
+
+        self.assertEqual((summary['processed'], summary['failed']), (2, 0))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, PaymentStatus.COMPLETED)
+        self.assertEqual(payment.failure_reason, '')
+
+
+class ExportPaymentsCommandTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='pw')
+        make_payment(user, status=PaymentStatus.COMPLETED)
+        make_payment(user)
+
+    def test_writes_text_formats_through_the_command_stdout(self):
+        stdout = StringIO()
+
+        call_command('export_payments', '--status', 'completed', stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('payment_id,'))
+        self.assertIn(',completed,', lines[1])
+
+    def test_gzip_needs_an_output_file_when_stdout_is_text_only(self):
+        with self.assertRaisesMessage(CommandError, '--gzip needs --output'):
+            call_command('export_payments', '--gzip', stdout=StringIO())
+
+    def test_gzip_to_an_output_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'payments.jsonl.gz')
+            call_command('export_payments', '--format', 'jsonl', '--gzip', '--output', path, stderr=StringIO())
+            with gzip.open(path, 'rt') as export:
+                rows = [json.loads(line) for line in export]
+
+        self.assertEqual(sorted(row['status'] for row in rows), ['completed', 'pending'])
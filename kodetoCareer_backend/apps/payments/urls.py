@@ -10,7 +10,8 @@ from .views import (
     PaymentReceiptView,
     RazorpayWebhookView,
     UserSubscriptionView,
-    payment_analytics
+    payment_analytics,
+    export_payments
 )
 
 app_name = 'payments'
@@ -36,4 +37,5 @@ urlpatterns = [
     
     # Analytics (admin only)
     path('analytics/', payment_analytics, name='payment_analytics'),
+    path('export/', export_payments, name='export_payments'),
 ]
\ No newline at end of file
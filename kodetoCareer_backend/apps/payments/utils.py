@@ -1,133 +1,145 @@
 # apps/payments/utils.py
-import razorpay
 from django.conf import settings
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
-from django.utils import timezone
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
+from functools import lru_cache
 from io import BytesIO
+from xml.sax.saxutils import escape
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize Razorpay client
 def get_razorpay_client():
-    """Get configured Razorpay client"""
-    return razorpay.Client(auth=(
-        settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['KEY_ID'],
-        settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['KEY_SECRET']
-    ))
+    """Get the Razorpay client behind the shared, pooled gateway"""
+    from .gateway import get_gateway
+    return get_gateway().client
+
+@lru_cache(maxsize=None)
+def receipt_styles():
+    """Sample stylesheet, built once per process and shared by every receipt it renders"""
+    return getSampleStyleSheet()
+
+RECEIPT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (0,-1), colors.lightgrey),
+    ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+    ('FONTSIZE', (0,0), (-1,-1), 10),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+    ('GRID', (0,0), (-1,-1), 1, colors.black)
+])
+
+PURCHASE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.grey),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,-1), 10),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+    ('GRID', (0,0), (-1,-1), 1, colors.black)
+])
+
+def receipt_context(payment):
+    """Plain data for a receipt, so rendering needs no database and can run in another process"""
+    item_name = "Unknown Item"
+    if payment.course:
+        item_name = payment.course.title
+    elif payment.bundle:
+        item_name = payment.bundle.name
+    
+    return {
+        'payment_id': payment.payment_id,
+        'date': payment.created_at.strftime('%B %d, %Y'),
+        'status': payment.get_status_display(),
+        'customer_name': payment.user.get_full_name() or payment.user.username,
+        'customer_email': payment.user.email,
+        'item_name': item_name,
+        'amount': str(payment.amount),
+        'discount_amount': str(payment.discount_amount),
+        'final_amount': str(payment.final_amount),
+    }
+
+def render_receipt_pdf(context):
+    """Render a receipt context to PDF bytes"""
+    styles = receipt_styles()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    
+    # Header
+    story.append(Paragraph("Payment Receipt", styles['Title']))
+    story.append(Spacer(1, 20))
+    
+    # Company Info
+    company_info = Paragraph("""
+        <b>Your Learning Platform</b><br/>
+        Email: support@yourplatform.com<br/>
+        Phone: +91 1234567890
+    """, styles['Normal'])
+    story.append(company_info)
+    story.append(Spacer(1, 20))
+    
+    # Receipt Details
+    receipt_data = [
+        ['Receipt Number:', f"RCP-{context['payment_id']}"],
+        ['Date:', context['date']],
+        ['Payment ID:', context['payment_id']],
+        ['Status:', context['status']],
+    ]
+    receipt_table = Table(receipt_data, colWidths=[2*inch, 3*inch])
+    receipt_table.setStyle(RECEIPT_TABLE_STYLE)
+    story.append(receipt_table)
+    story.append(Spacer(1, 20))
+    
+    # Customer Details (names are user input, so escape them for Paragraph markup)
+    story.append(Paragraph("<b>Customer Details</b>", styles['Heading2']))
+    customer_info = f"""
+        Name: {escape(context['customer_name'])}<br/>
+        Email: {escape(context['customer_email'])}<br/>
+    """
+    story.append(Paragraph(customer_info, styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Purchase Details
+    story.append(Paragraph("<b>Purchase Details</b>", styles['Heading2']))
+    purchase_data = [
+        ['Item', 'Original Price', 'Discount', 'Final Amount'],
+        [context['item_name'], f"₹{context['amount']}", f"₹{context['discount_amount']}", f"₹{context['final_amount']}"]
+    ]
+    purchase_table = Table(purchase_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1.5*inch])
+    purchase_table.setStyle(PURCHASE_TABLE_STYLE)
+    story.append(purchase_table)
+    story.append(Spacer(1, 30))
+    
+    # Footer
+    footer_text = """
+        <b>Thank you for your purchase!</b><br/>
+        This is a computer generated receipt and does not require signature.<br/>
+        For support, contact us at support@yourplatform.com
+    """
+    story.append(Paragraph(footer_text, styles['Normal']))
+    
+    doc.build(story)
+    return buffer.getvalue()
 
 class PaymentReceiptGenerator:
     """Generate PDF receipts for payments"""
     
     def __init__(self, payment):
         self.payment = payment
-        self.styles = getSampleStyleSheet()
+        self.styles = receipt_styles()
     
     def generate_pdf(self):
         """Generate PDF receipt"""
         try:
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            story = []
-            
-            # Header
-            header_style = self.styles['Title']
-            header = Paragraph("Payment Receipt", header_style)
-            story.append(header)
-            story.append(Spacer(1, 20))
-            
-            # Company Info
-            company_info = Paragraph("""
-                <b>Your Learning Platform</b><br/>
-                Email: support@yourplatform.com<br/>
-                Phone: +91 1234567890
-            """, self.styles['Normal'])
-            story.append(company_info)
-            story.append(Spacer(1, 20))
-            
-            # Receipt Details
-            receipt_data = [
-                ['Receipt Number:', f"RCP-{self.payment.payment_id}"],
-                ['Date:', self.payment.created_at.strftime('%B %d, %Y')],
-                ['Payment ID:', self.payment.payment_id],
-                ['Status:', self.payment.get_status_display()],
-            ]
-            
-            receipt_table = Table(receipt_data, colWidths=[2*inch, 3*inch])
-            receipt_table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (0,-1), colors.lightgrey),
-                ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                ('FONTSIZE', (0,0), (-1,-1), 10),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-                ('GRID', (0,0), (-1,-1), 1, colors.black)
-            ]))
-            story.append(receipt_table)
-            story.append(Spacer(1, 20))
-            
-            # Customer Details
-            customer_title = Paragraph("<b>Customer Details</b>", self.styles['Heading2'])
-            story.append(customer_title)
-            
-            customer_info = f"""
-                Name: {self.payment.user.get_full_name() or self.payment.user.username}<br/>
-                Email: {self.payment.user.email}<br/>
-            """
-            customer_para = Paragraph(customer_info, self.styles['Normal'])
-            story.append(customer_para)
-            story.append(Spacer(1, 20))
-            
-            # Purchase Details
-            purchase_title = Paragraph("<b>Purchase Details</b>", self.styles['Heading2'])
-            story.append(purchase_title)
-            
-            item_name = "Unknown Item"
-            if self.payment.course:
-                item_name = self.payment.course.title
-            elif self.payment.bundle:
-                item_name = self.payment.bundle.title
-            
-            purchase_data = [
-                ['Item', 'Original Price', 'Discount', 'Final Amount'],
-                [item_name, f"₹{self.payment.amount}", f"₹{self.payment.discount_amount}", f"₹{self.payment.final_amount}"]
-            ]
-            
-            purchase_table = Table(purchase_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1.5*inch])
-            purchase_table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.grey),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0,0), (-1,-1), 10),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-                ('GRID', (0,0), (-1,-1), 1, colors.black)
-            ]))
-            story.append(purchase_table)
-            story.append(Spacer(1, 30))
-            
-            # Footer
-            footer_text = """
-                <b>Thank you for your purchase!</b><br/>
-                This is a computer generated receipt and does not require signature.<br/>
-                For support, contact us at support@yourplatform.com
-            """
-            footer = Paragraph(footer_text, self.styles['Normal'])
-            story.append(footer)
-            
-            # Build PDF
-            doc.build(story)
-            buffer.seek(0)
-            return buffer
-            
+            return BytesIO(render_receipt_pdf(receipt_context(self.payment)))
         except Exception as e:
             logger.error(f"Error generating PDF receipt: {str(e)}")
             return None
@@ -231,14 +243,10 @@ class PaymentValidator:
     @staticmethod
     def validate_coupon_usage(coupon, user):
         """Validate coupon usage for user"""
-        from .models import Payment, PaymentStatus
+        from .coupons import user_redemptions
         
-        # Check if user has already used this coupon
-        if Payment.objects.filter(
-            user=user, 
-            coupon=coupon, 
-            status=PaymentStatus.COMPLETED
-        ).exists():
+        # Completed payments and live reservations both count towards the per-user limit
+        if user_redemptions(coupon, user) >= coupon.max_uses_per_user:
             return False, "Coupon has already been used by this user"
         
         return True, None
@@ -284,36 +292,25 @@ class PaymentAnalytics:
     @staticmethod
     def get_revenue_by_period(start_date, end_date):
         """Get revenue for a specific period"""
-        from .models import Payment, PaymentStatus
-        from django.db.models import Sum
-        
-        payments = Payment.objects.filter(
-            created_at__date__range=[start_date, end_date],
-            status=PaymentStatus.COMPLETED
-        )
-        
-        total_revenue = payments.aggregate(
-            total=Sum('final_amount')
-        )['total'] or 0
+        from .revenue import revenue_report
         
+        totals = revenue_report(start_date, end_date)['totals']
         return {
-            'total_revenue': total_revenue,
-            'transaction_count': payments.count(),
-            'average_transaction_value': total_revenue / payments.count() if payments.count() > 0 else 0
+            'total_revenue': totals['net_amount'],
+            'transaction_count': totals['completed_count'],
+            'average_transaction_value': totals['average_transaction_value']
         }
     
     @staticmethod
     def get_payment_method_stats():
         """Get payment method statistics"""
-        from .models import Payment, PaymentStatus
-        from django.db.models import Count, Sum
+        from .models import DailyRevenue
+        from django.db.models import Sum
         
-        stats = Payment.objects.filter(
-            status=PaymentStatus.COMPLETED
-        ).values('payment_method').annotate(
-            count=Count('id'),
-            revenue=Sum('final_amount')
-        )
+        stats = DailyRevenue.objects.values('payment_method').annotate(
+            count=Sum('completed_count'),
+            revenue=Sum('net_amount')
+        ).order_by('payment_method')
         
         return list(stats)
     
@@ -331,35 +328,11 @@ class PaymentAnalytics:
         
         return list(failed_payments)
 
-# Background tasks (if using Celery)
+# Background tasks
 def process_payment_receipt(payment_id):
     """Background task to generate and save payment receipt"""
-    try:
-        from .models import Payment, PaymentReceipt
-        
-        payment = Payment.objects.get(id=payment_id)
-        generator = PaymentReceiptGenerator(payment)
-        pdf_buffer = generator.generate_pdf()
-        
-        if pdf_buffer:
-            receipt, created = PaymentReceipt.objects.get_or_create(
-                payment=payment,
-                defaults={
-                    'receipt_number': f"RCP-{payment.payment_id}-{timezone.now().strftime('%Y%m%d')}"
-                }
-            )
-            
-            # Save PDF file
-            pdf_filename = f"receipt_{payment.payment_id}.pdf"
-            receipt.pdf_file.save(pdf_filename, pdf_buffer)
-            receipt.save()
-            
-            logger.info(f"Receipt generated for payment {payment_id}")
-            return True
-            
-    except Exception as e:
-        logger.error(f"Error processing receipt for payment {payment_id}: {str(e)}")
-        return False
+    from .receipts import generate_receipt
+    return generate_receipt(payment_id)
 
 def send_payment_notifications(payment_id):
     """Background task to send payment notifications"""
@@ -1,12 +1,14 @@
 # apps/payments/views.py
-import razorpay
 import hmac
 import hashlib
+import json
 import uuid
 from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework import status
@@ -17,27 +19,28 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from .models import Payment, PaymentStatus, Coupon, PaymentReceipt, Subscription
+from .models import Payment, PaymentStatus, PaymentReceipt, Subscription
 from .serializers import (
     PaymentCreateSerializer, PaymentSerializer, PaymentVerificationSerializer,
     CouponValidationSerializer, CouponSerializer, PaymentReceiptSerializer,
     SubscriptionSerializer, PaymentCreateResponseSerializer,
     PaymentVerificationResponseSerializer
 )
+from .coupons import CouponError, confirm_coupon, get_coupon, release_coupon, reserve_coupon
+from .gateway import GatewayRejected, PaymentGatewayError, get_gateway
+from .receipts import queue_receipt
+from .webhooks import process_delivery, record_event
+from apps.common.background import run_in_background
+from apps.common.idempotency import idempotent
 from apps.courses.models import Course, CustomCourseBundle
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(
-    settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['KEY_ID'],
-    settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['KEY_SECRET']
-))
-
 class CreatePaymentView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @idempotent('create_payment')
     def post(self, request):
         serializer = PaymentCreateSerializer(data=request.data)
         if not serializer.is_valid():
@@ -66,64 +69,90 @@ class CreatePaymentView(APIView):
             discount_amount = Decimal('0.00')
             coupon = None
             if validated_data.get('coupon_code'):
-                try:
-                    coupon = Coupon.objects.get(code=validated_data['coupon_code'])
-                    if coupon.is_valid():
-                        discount_amount = coupon.get_discount_amount(item_price)
-                    else:
-                        return Response(
-                            {'error': 'Coupon is expired or invalid'}, 
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                except Coupon.DoesNotExist:
+                coupon = get_coupon(validated_data['coupon_code'])
+                if coupon is None:
                     return Response(
                         {'error': 'Invalid coupon code'}, 
                         status=status.HTTP_400_BAD_REQUEST
                     )
+                discount_amount = coupon.get_discount_amount(item_price)
             
             final_amount = item_price - discount_amount
             if final_amount < 0:
                 final_amount = Decimal('0.00')
             
-            # Create payment record in database
-            payment = Payment.objects.create(
-                user=user,
-                course=course,
-                bundle=bundle,
-                amount=item_price,
-                discount_amount=discount_amount,
-                final_amount=final_amount,
-                coupon=coupon,
-                payment_method=validated_data['payment_method'],
-                payment_id=str(uuid.uuid4()),  # Temporary ID, will be updated after Razorpay order
-                status=PaymentStatus.PENDING
-            )
-            
-            # Create Razorpay order
-            razorpay_order_data = {
-                'amount': int(final_amount * 100),  # Amount in paise
-                'currency': 'INR',
-                'receipt': payment.payment_id,
-                'payment_capture': '1'  # Auto capture
-            }
-            
-            razorpay_order = razorpay_client.order.create(data=razorpay_order_data)
-            
-            # Update payment with Razorpay order ID
-            payment.gateway_payment_id = razorpay_order['id']
-            payment.save()
-            
-            # Update coupon usage if applicable
-            if coupon:
-                coupon.used_count += 1
-                coupon.save()
+            # Reserve the coupon use and create the payment record in one transaction,
+            # so the use is returned if the insert fails
+            try:
+                with transaction.atomic():
+                    if coupon:
+                        reserve_coupon(coupon, user)
+                    payment = Payment.objects.create(
+                        user=user,
+                        course=course,
+                        bundle=bundle,
+                        amount=item_price,
+                        discount_amount=discount_amount,
+                        final_amount=final_amount,
+                        coupon=coupon,
+                        coupon_reserved=coupon is not None,
+                        payment_method=validated_data['payment_method'],
+                        payment_id=str(uuid.uuid4()),  # Temporary ID, will be updated after Razorpay order
+                        status=PaymentStatus.PENDING
+                    )
+            except CouponError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            response_data = {
-                'payment_db_id': str(payment.id),
-                'razorpay_order_id': razorpay_order['id'],
-                'amount': final_amount,
-                'currency': 'INR',
-            }
+            if final_amount == 0:
+                # Nothing to charge (e.g. a 100% coupon), and the gateway rejects zero-amount orders
+                payment.status = PaymentStatus.COMPLETED
+                payment.save(update_fields=['status', 'updated_at'])
+                confirm_coupon(payment)
+                payment.complete_enrollment()
+                receipt = queue_receipt(payment)
+                response_data = {
+                    'payment_db_id': str(payment.id),
+                    'status': 'completed',
+                    'amount': final_amount,
+                    'currency': 'INR',
+                    'receipt_status': receipt.status,
+                }
+            else:
+                # Create Razorpay order (bounded by the gateway's timeouts and circuit breaker)
+                try:
+                    razorpay_order = get_gateway().create_order(
+                        amount=int(final_amount * 100),  # Amount in paise
+                        currency='INR',
+                        receipt=payment.payment_id
+                    )
+                except PaymentGatewayError as e:
+                    rejected = isinstance(e, GatewayRejected)
+                    logger.warning(f"Payment gateway {'rejected' if rejected else 'unavailable for'} payment {payment.payment_id}: {e}")
+                    payment.status = PaymentStatus.FAILED
+                    payment.failure_reason = "Rejected by payment gateway" if rejected else "Payment gateway unavailable"
+                    payment.save(update_fields=['status', 'failure_reason', 'updated_at'])
+                    release_coupon(payment)
+                    # Only an unreachable gateway or an open circuit is worth retrying
+                    if rejected:
+                        return Response(
+                            {'error': 'The payment gateway could not accept this order'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    return Response(
+                        {'error': 'Payment gateway is temporarily unavailable, please try again'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE
+                    )
+
+                # Update payment with Razorpay order ID
+                payment.gateway_payment_id = razorpay_order['id']
+                payment.save()
+
+                response_data = {
+                    'payment_db_id': str(payment.id),
+                    'razorpay_order_id': razorpay_order['id'],
+                    'amount': final_amount,
+                    'currency': 'INR',
+                }
             
             if course:
                 response_data['course_title'] = course.title
@@ -142,6 +171,7 @@ class CreatePaymentView(APIView):
 class VerifyPaymentView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @idempotent('verify_payment')
     def post(self, request):
         serializer = PaymentVerificationSerializer(data=request.data)
         if not serializer.is_valid():
@@ -161,40 +191,33 @@ class VerifyPaymentView(APIView):
             razorpay_payment_id = validated_data['razorpay_payment_id']
             razorpay_signature = validated_data['razorpay_signature']
             
-            # Create signature verification string
-            generated_signature = hmac.new(
-                key=settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY']['KEY_SECRET'].encode(),
-                msg=(razorpay_order_id + "|" + razorpay_payment_id).encode(),
-                digestmod=hashlib.sha256
-            ).hexdigest()
-            
-            if hmac.compare_digest(generated_signature, razorpay_signature):
+            if get_gateway().verify_checkout_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature):
                 # Payment is verified
                 payment.gateway_payment_id = razorpay_payment_id
                 payment.status = PaymentStatus.COMPLETED
                 payment.save()
+                confirm_coupon(payment)
                 
                 # Complete enrollment
                 enrollment_success = payment.complete_enrollment()
                 
-                # Generate receipt
-                receipt = self.generate_receipt(payment)
+                # Receipt PDF is rendered in the background; poll the receipt endpoint for it
+                receipt = queue_receipt(payment)
                 
                 response_data = {
                     'status': 'success',
                     'message': 'Payment verified successfully',
-                    'payment_id': payment.payment_id
+                    'payment_id': payment.payment_id,
+                    'receipt_status': receipt.status
                 }
                 
-                if receipt:
-                    response_data['receipt_url'] = request.build_absolute_uri(receipt.pdf_file.url) if receipt.pdf_file else None
-                
                 return Response(response_data, status=status.HTTP_200_OK)
             else:
                 # Signature verification failed
                 payment.status = PaymentStatus.FAILED
                 payment.failure_reason = "Signature verification failed"
                 payment.save()
+                release_coupon(payment)
                 
                 return Response(
                     {'status': 'failed', 'message': 'Payment verification failed'},
@@ -212,19 +235,6 @@ class VerifyPaymentView(APIView):
                 {'error': 'Payment verification failed'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def generate_receipt(self, payment):
-        """Generate receipt for successful payment"""
-        try:
-            receipt_number = f"RCP-{payment.payment_id}-{timezone.now().strftime('%Y%m%d')}"
-            receipt, created = PaymentReceipt.objects.get_or_create(
-                payment=payment,
-                defaults={'receipt_number': receipt_number}
-            )
-            return receipt
-        except Exception as e:
-            logger.error(f"Error generating receipt: {str(e)}")
-            return None
 
 class ValidateCouponView(APIView):
     permission_classes = [IsAuthenticated]
@@ -236,9 +246,14 @@ class ValidateCouponView(APIView):
         
         validated_data = serializer.validated_data
         
+        coupon = get_coupon(validated_data['code'])
+        if coupon is None:
+            return Response(
+                {'error': 'Invalid coupon code', 'is_valid': False},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         try:
-            coupon = Coupon.objects.get(code=validated_data['code'])
-            
             if not coupon.is_valid():
                 return Response(
                     {'error': 'Coupon is expired or invalid', 'is_valid': False},
@@ -266,11 +281,6 @@ class ValidateCouponView(APIView):
                 'final_price': price - discount_amount
             })
             
-        except Coupon.DoesNotExist:
-            return Response(
-                {'error': 'Invalid coupon code', 'is_valid': False},
-                status=status.HTTP_400_BAD_REQUEST
-            )
         except (Course.DoesNotExist, CustomCourseBundle.DoesNotExist):
             return Response(
                 {'error': 'Course or bundle not found'},
@@ -305,36 +315,46 @@ class PaymentReceiptView(RetrieveAPIView):
     lookup_url_kwarg = 'payment_id'
     
     def get_queryset(self):
-        return PaymentReceipt.objects.filter(payment__user=self.request.user)
+        return PaymentReceipt.objects.filter(payment__user=self.request.user).select_related(
+            'payment__user', 'payment__course', 'payment__bundle', 'payment__coupon'
+        )
+    
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Payments completed before receipts were queued get one on first request
+            payment = get_object_or_404(
+                Payment, id=self.kwargs['payment_id'], user=self.request.user, status=PaymentStatus.COMPLETED
+            )
+            return queue_receipt(payment)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RazorpayWebhookView(APIView):
     permission_classes = [AllowAny]
     
     def post(self, request):
-        """Handle Razorpay webhooks"""
+        """Store verified Razorpay webhooks in the inbox and acknowledge at once"""
+        # Verify webhook signature if webhook secret is configured
+        webhook_secret = settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY'].get('WEBHOOK_SECRET')
+        if webhook_secret:
+            signature = request.META.get('HTTP_X_RAZORPAY_SIGNATURE')
+            if not self.verify_webhook_signature(request.body, signature, webhook_secret):
+                return HttpResponse(status=400)
+        
         try:
-            # Verify webhook signature if webhook secret is configured
-            webhook_secret = settings.PAYMENT_GATEWAY_SETTINGS['RAZORPAY'].get('WEBHOOK_SECRET')
-            if webhook_secret:
-                signature = request.META.get('HTTP_X_RAZORPAY_SIGNATURE')
-                if not self.verify_webhook_signature(request.body, signature, webhook_secret):
-                    return HttpResponse(status=400)
-            
-            webhook_data = request.data
-            event = webhook_data.get('event')
-            payment_entity = webhook_data.get('payload', {}).get('payment', {}).get('entity', {})
-            
-            if event == 'payment.captured':
-                self.handle_payment_captured(payment_entity)
-            elif event == 'payment.failed':
-                self.handle_payment_failed(payment_entity)
-            
-            return HttpResponse(status=200)
-            
-        except Exception as e:
-            logger.error(f"Webhook error: {str(e)}")
-            return HttpResponse(status=500)
+            payload = json.loads(request.body)
+        except ValueError:
+            return HttpResponse(status=400)
+        
+        event, created = record_event(
+            request.body, payload, event_id=request.META.get('HTTP_X_RAZORPAY_EVENT_ID')
+        )
+        if created:
+            # Processing happens off the request; the inbox command retries anything that fails or is lost
+            run_in_background(process_delivery, event.payment_key)
+        
+        return HttpResponse(status=200)
     
     def verify_webhook_signature(self, payload, signature, secret):
         """Verify webhook signature"""
@@ -347,37 +367,6 @@ class RazorpayWebhookView(APIView):
             return hmac.compare_digest(generated_signature, signature)
         except Exception:
             return False
-    
-    def handle_payment_captured(self, payment_entity):
-        """Handle successful payment"""
-        try:
-            razorpay_payment_id = payment_entity.get('id')
-            payment = Payment.objects.get(gateway_payment_id=razorpay_payment_id)
-            
-            if payment.status == PaymentStatus.PENDING:
-                payment.status = PaymentStatus.COMPLETED
-                payment.save()
-                payment.complete_enrollment()
-                
-        except Payment.DoesNotExist:
-            logger.error(f"Payment not found for Razorpay ID: {razorpay_payment_id}")
-        except Exception as e:
-            logger.error(f"Error handling payment captured: {str(e)}")
-    
-    def handle_payment_failed(self, payment_entity):
-        """Handle failed payment"""
-        try:
-            razorpay_payment_id = payment_entity.get('id')
-            payment = Payment.objects.get(gateway_payment_id=razorpay_payment_id)
-            
-            payment.status = PaymentStatus.FAILED
-            payment.failure_reason = payment_entity.get('error_description', 'Payment failed')
-            payment.save()
-            
-        except Payment.DoesNotExist:
-            logger.error(f"Payment not found for Razorpay ID: {razorpay_payment_id}")
-        except Exception as e:
-            logger.error(f"Error handling payment failed: {str(e)}")
 
 # User subscription views
 class UserSubscriptionView(RetrieveAPIView):
@@ -391,41 +380,102 @@ class UserSubscriptionView(RetrieveAPIView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def payment_analytics(request):
-    """Get payment analytics data"""
+    """
+    Revenue analytics from the daily rollup. Query params: start_date and
+    end_date (YYYY-MM-DD, last 30 days by default) and group_by, a comma
+    separated list of day, week, month, course and payment_method.
+    """
     if not request.user.is_staff:
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    from django.db.models import Sum, Count
-    from django.utils import timezone
     from datetime import timedelta
+    from django.utils.dateparse import parse_date
+    from .revenue import GROUPINGS, revenue_report
     
     # Get date range (last 30 days by default)
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=30)
-    
-    payments = Payment.objects.filter(
-        created_at__range=[start_date, end_date],
-        status=PaymentStatus.COMPLETED
-    )
+    start_param = request.query_params.get('start_date', '')
+    end_param = request.query_params.get('end_date', '')
+    try:
+        start_date = parse_date(start_param) if start_param else None
+        end_date = parse_date(end_param) if end_param else None
+    except ValueError:
+        start_date = end_date = None
+    if (start_param and not start_date) or (end_param and not end_date):
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    end_date = end_date or timezone.localdate()
+    start_date = start_date or end_date - timedelta(days=30)
+
+    group_by = [name for name in request.query_params.get('group_by', '').split(',') if name]
+    unknown = [name for name in group_by if name not in GROUPINGS]
+    if unknown:
+        return Response(
+            {'error': f"Unknown group_by {', '.join(unknown)}; use {', '.join(GROUPINGS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
+    report = revenue_report(start_date, end_date, group_by)
+    totals = report['totals']
     analytics_data = {
-        'total_revenue': payments.aggregate(Sum('final_amount'))['final_amount__sum'] or 0,
-        'total_transactions': payments.count(),
-        'successful_payments': payments.filter(status=PaymentStatus.COMPLETED).count(),
-        'failed_payments': Payment.objects.filter(
-            created_at__range=[start_date, end_date],
-            status=PaymentStatus.FAILED
-        ).count(),
-        'average_transaction_value': payments.aggregate(
-            avg_amount=Sum('final_amount')
-        )['avg_amount'] or 0,
-        'payment_methods': payments.values('payment_method').annotate(
-            count=Count('id')
-        ),
+        'total_revenue': totals['net_amount'],
+        'gross_revenue': totals['gross_amount'],
+        'total_discounts': totals['discount_amount'],
+        'total_transactions': totals['completed_count'],
+        'successful_payments': totals['completed_count'],
+        'failed_payments': totals['failed_count'],
+        'average_transaction_value': totals['average_transaction_value'],
+        'payment_methods': [
+            {'payment_method': row['payment_method'], 'count': row['completed_count'], 'revenue': row['net_amount']}
+            for row in report['payment_methods']
+        ],
+        'series': report['series'],
         'date_range': {
-            'start_date': start_date.date(),
-            'end_date': end_date.date()
+            'start_date': start_date,
+            'end_date': end_date
         }
     }
     
-    return Response(analytics_data)
\ No newline at end of file
+    return Response(analytics_data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_payments(request):
+    """
+    Stream payments as CSV or JSON lines for finance. Query params:
+    file_format (csv or jsonl), start_date and end_date (YYYY-MM-DD),
+    status (comma separated) and gzip=1 to compress on the fly.
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    from django.http import StreamingHttpResponse
+    from django.utils.dateparse import parse_date
+    from .export import FORMATS, export_queryset, stream_export
+    
+    file_format = request.query_params.get('file_format', 'csv')
+    if file_format not in FORMATS:
+        return Response({'error': f"file_format must be one of {', '.join(FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    start_param = request.query_params.get('start_date', '')
+    end_param = request.query_params.get('end_date', '')
+    try:
+        start_date = parse_date(start_param) if start_param else None
+        end_date = parse_date(end_param) if end_param else None
+    except ValueError:
+        start_date = end_date = None
+    if (start_param and not start_date) or (end_param and not end_date):
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+    statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+    if any(value not in PaymentStatus.values for value in statuses):
+        return Response({'error': f"status must be among {', '.join(PaymentStatus.values)}"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    compress = request.query_params.get('gzip') in ('1', 'true')
+    content_type, extension = FORMATS[file_format]
+    filename = f"payments-{timezone.localdate():%Y%m%d}.{extension}"
+    if compress:
+        content_type, filename = 'application/gzip', f"{filename}.gz"
+    
+    payments = export_queryset(start_date, end_date, statuses)
+    response = StreamingHttpResponse(stream_export(payments, file_format, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
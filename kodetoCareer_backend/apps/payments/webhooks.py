@@ -0,0 +1,187 @@
+# apps/payments/webhooks.py
+import hashlib
+import logging
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .coupons import confirm_coupon
+from .models import Payment, PaymentStatus, WebhookEvent, WebhookEventStatus
+from .receipts import queue_receipt
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 10
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+# Events due this long ago lost their background task; fresh deliveries sweep a few of them
+STALE_AFTER = timedelta(minutes=5)
+SWEEP_BATCH_SIZE = 10
+
+DUE_STATUSES = (WebhookEventStatus.PENDING, WebhookEventStatus.FAILED)
+
+
+class WebhookRetry(Exception):
+    """The event cannot be applied yet (e.g. its payment is not committed); retry later"""
+
+
+def _payment_entity(payload):
+    return payload.get('payload', {}).get('payment', {}).get('entity', {})
+
+
+def record_event(body, payload, event_id=None):
+    """
+    Store a verified delivery in the inbox; returns (event, created). Retried
+    deliveries of the same event id resolve to the stored row.
+    """
+    entity = _payment_entity(payload)
+    # Deliveries without the event id header fall back to a digest of the signed body
+    event_id = event_id or f"sha256:{hashlib.sha256(body).hexdigest()}"
+    defaults = {
+        'event_type': payload.get('event', ''),
+        'payment_key': entity.get('order_id') or entity.get('id') or '',
+        'gateway_created_at': payload.get('created_at'),
+        'payload': payload,
+    }
+    # get_or_create absorbs the IntegrityError when concurrent deliveries race on the insert
+    return WebhookEvent.objects.get_or_create(event_id=event_id, defaults=defaults)
+
+
+def _find_payment(entity):
+    # Before checkout is verified gateway_payment_id holds the order id, afterwards the payment id
+    gateway_ids = [value for value in (entity.get('id'), entity.get('order_id')) if value]
+    payment = Payment.objects.select_for_update().filter(gateway_payment_id__in=gateway_ids).first()
+    if payment is None:
+        raise WebhookRetry(f"No payment for gateway ids {gateway_ids}")
+    return payment
+
+
+def handle_payment_captured(entity):
+    payment = _find_payment(entity)
+    # A failed attempt can be followed by a successful one on the same order
+    if payment.status in (PaymentStatus.PENDING, PaymentStatus.FAILED):
+        payment.status = PaymentStatus.COMPLETED
+        payment.gateway_payment_id = entity['id']
+        payment.failure_reason = ''
+        payment.save(update_fields=['status', 'gateway_payment_id', 'failure_reason', 'updated_at'])
+    if payment.status == PaymentStatus.COMPLETED:
+        confirm_coupon(payment)
+        payment.complete_enrollment()
+        queue_receipt(payment)
+
+
+def handle_payment_failed(entity):
+    payment = _find_payment(entity)
+    # Never let a late failure event undo a completed or refunded payment
+    if payment.status == PaymentStatus.PENDING:
+        payment.status = PaymentStatus.FAILED
+        payment.failure_reason = entity.get('error_description') or 'Payment failed'
+        payment.save(update_fields=['status', 'failure_reason', 'updated_at'])
+
+
+EVENT_HANDLERS = {
+    'payment.captured': handle_payment_captured,
+    'payment.failed': handle_payment_failed,
+}
+
+
+def retry_delay(attempts):
+    ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def _apply(event):
+    handler = EVENT_HANDLERS.get(event.event_type)
+    if handler is not None:
+        handler(_payment_entity(event.payload))
+
+
+def _process_key(payment_key, now):
+    """
+    Apply the due events of one payment in gateway order, stopping at the
+    first failure so later events never overtake it. Returns (processed, failed).
+    """
+    processed = failed = 0
+    with transaction.atomic():
+        # Row locks serialize workers on the same payment; rows another worker
+        # finished while we waited no longer match and drop out
+        events = list(
+            WebhookEvent.objects.select_for_update()
+            .filter(payment_key=payment_key, status__in=DUE_STATUSES)
+            .order_by('gateway_created_at', 'id')
+        )
+        for event in events:
+            if event.next_attempt_at > now:
+                break
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    _apply(event)
+            except Exception as e:
+                if not isinstance(e, WebhookRetry):
+                    logger.exception(f"Webhook event {event.event_id} failed")
+                event.last_error = str(e)
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = WebhookEventStatus.DEAD
+                    logger.error(f"Webhook event {event.event_id} gave up after {event.attempts} attempts")
+                else:
+                    event.status = WebhookEventStatus.FAILED
+                    event.next_attempt_at = now + retry_delay(event.attempts)
+                event.save(update_fields=['attempts', 'status', 'last_error', 'next_attempt_at', 'updated_at'])
+                failed += 1
+                if event.status == WebhookEventStatus.DEAD:
+                    continue
+                break
+
+            event.status = WebhookEventStatus.PROCESSED
+            event.processed_at = now
+            event.last_error = ''
+            event.save(update_fields=['attempts', 'status', 'processed_at', 'last_error', 'updated_at'])
+            processed += 1
+    return processed, failed
+
+
+def process_webhook_events(payment_key=None, batch_size=100, now=None, due_before=None):
+    """
+    Work through due inbox events, payment by payment; due_before narrows
+    them to events due by then. Returns counts of processed and failed events.
+    """
+    now = now or timezone.now()
+    due = WebhookEvent.objects.filter(status__in=DUE_STATUSES, next_attempt_at__lte=due_before or now)
+    if payment_key is not None:
+        due = due.filter(payment_key=payment_key)
+
+    keys = list(due.order_by().values_list('payment_key', flat=True).distinct()[:batch_size])
+    summary = {'payments': len(keys), 'processed': 0, 'failed': 0}
+    for key in keys:
+        processed, failed = _process_key(key, now)
+        summary['processed'] += processed
+        summary['failed'] += failed
+    return summary
+
+
+def process_delivery(payment_key, now=None):
+    """
+    Apply a fresh delivery's events, then sweep a few other payments whose
+    events have been due for over STALE_AFTER. Deliveries are processed on
+    the in-process background pool, which a restart empties; the stored
+    events stay due, so later deliveries finish them even when
+    process_webhook_events is not running from cron.
+    """
+    now = now or timezone.now()
+    summary = process_webhook_events(payment_key=payment_key, now=now)
+    process_webhook_events(batch_size=SWEEP_BATCH_SIZE, now=now, due_before=now - STALE_AFTER)
+    return summary
+
+
+def replay_events(queryset):
+    """Queue stored events to be applied again, e.g. after an incident"""
+    return queryset.update(
+        status=WebhookEventStatus.PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+        last_error='',
+        updated_at=timezone.now(),
+    )
@@ -1,33 +1,44 @@
 # apps/progress/admin.py
 from django.contrib import admin
+from apps.common.admin import PerformanceModelAdmin
 from .models import LessonProgress, CourseProgress, BundleProgress, StudyStreak, LearningGoal
 
 @admin.register(LessonProgress)
-class LessonProgressAdmin(admin.ModelAdmin):
+class LessonProgressAdmin(PerformanceModelAdmin):
     list_display = ['user', 'lesson', 'progress_percentage', 'is_completed', 'updated_at']
     list_filter = ['is_completed', 'created_at']
     search_fields = ['user__username', 'lesson__title']
+    list_select_related = ['user', 'lesson__section__course']
+    autocomplete_fields = ['user', 'lesson']
 
 @admin.register(CourseProgress)
-class CourseProgressAdmin(admin.ModelAdmin):
+class CourseProgressAdmin(PerformanceModelAdmin):
     list_display = ['user', 'course', 'completion_percentage', 'is_completed', 'updated_at']
     list_filter = ['is_completed', 'created_at']
     search_fields = ['user__username', 'course__title']
+    list_select_related = ['user', 'course']
+    autocomplete_fields = ['user', 'course']
 
 @admin.register(BundleProgress)
-class BundleProgressAdmin(admin.ModelAdmin):
+class BundleProgressAdmin(PerformanceModelAdmin):
     list_display = ['user', 'bundle', 'completion_percentage', 'is_completed', 'updated_at']
     list_filter = ['is_completed', 'created_at']
-    search_fields = ['user__username', 'bundle__title']
+    search_fields = ['user__username', 'bundle__name']
+    list_select_related = ['user', 'bundle__student']
+    autocomplete_fields = ['user', 'bundle']
 
 @admin.register(StudyStreak)
-class StudyStreakAdmin(admin.ModelAdmin):
+class StudyStreakAdmin(PerformanceModelAdmin):
     list_display = ['user', 'current_streak', 'longest_streak', 'total_study_days', 'last_activity_date']
     search_fields = ['user__username']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 @admin.register(LearningGoal)
-class LearningGoalAdmin(admin.ModelAdmin):
+class LearningGoalAdmin(PerformanceModelAdmin):
     list_display = ['user', 'goal_type', 'current_value', 'target_value', 'is_achieved', 'deadline']
     list_filter = ['goal_type', 'is_achieved', 'created_at']
     search_fields = ['user__username']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
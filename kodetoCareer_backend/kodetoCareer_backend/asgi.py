@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kodetoCareer_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup so the app registry is ready
+from apps.live_classes.streams import live_class_socket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Django serves HTTP (including the SSE streams); live-class WebSockets are handled directly
+    if scope['type'] == 'websocket':
+        return await live_class_socket(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import dj_database_url
+from corsheaders.defaults import default_headers
 from decouple import config
 from pathlib import Path
 
@@ -91,6 +92,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'kodetoCareer_backend.wsgi.application'
+# Live-class WebSocket/SSE streams need the ASGI app (daphne kodetoCareer_backend.asgi:application)
+ASGI_APPLICATION = 'kodetoCareer_backend.asgi.application'
 
 
 # Database
@@ -101,6 +104,24 @@ DATABASES = {
     )
 }
 
+# Cache
+# Shared Redis cache in production; per-process memory cache for local development
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,9 +153,57 @@ PAYMENT_GATEWAY_SETTINGS = {
         'KEY_SECRET': RAZORPAY_KEY_SECRET,
         'WEBHOOK_SECRET': RAZORPAY_WEBHOOK_SECRET if 'RAZORPAY_WEBHOOK_SECRET' in locals() else None,
         'MODE': 'TEST',  # Change to 'LIVE' in production
+        'BASE_URL': config('RAZORPAY_BASE_URL', default=None),  # e.g. a run_fake_gateway URL for load tests
+        'CONNECT_TIMEOUT': 3.05,
+        'READ_TIMEOUT': 10,
+        'MAX_RETRIES': 2,
+        'POOL_SIZE': 20,
+        'CIRCUIT_FAILURE_THRESHOLD': 5,
+        'CIRCUIT_RESET_SECONDS': 30,
     }
 }
 
+# Assessments: late submissions within this window after the deadline are still accepted
+ASSESSMENT_SUBMISSION_GRACE_SECONDS = 60
+
+# Course note previews: first N pages rendered to WebP at this width in pixels
+NOTE_PREVIEW_PAGES = 1
+NOTE_PREVIEW_WIDTH = 320
+
+# Idempotency-Key responses are replayed for this long; duplicates wait this long for an in-flight request
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_SECONDS = 5
+
+# Pending payments older than this are expired by expire_pending_payments, releasing their coupon use
+PENDING_PAYMENT_TTL_MINUTES = config('PENDING_PAYMENT_TTL_MINUTES', default=60, cast=int)
+
+# Subscriptions get a renewal order this many days before they end and lapse this many days after
+SUBSCRIPTION_RENEWAL_LEAD_DAYS = 3
+SUBSCRIPTION_GRACE_DAYS = 3
+
+# Live-class push events fan out through Redis pub/sub across processes; in-memory (single process) without it
+LIVE_EVENTS_REDIS_URL = REDIS_URL
+LIVE_EVENTS_KEEPALIVE_SECONDS = 15
+
+# Live-class presence lapses this long after a client's last heartbeat; flush_presence then closes the session.
+# Presence needs the Redis cache; without it joins and leaves are written straight to attendance
+LIVE_PRESENCE_TIMEOUT_SECONDS = 60
+
+# run_live_class_scheduler sleeps until the next class starts or ends, but never longer than this (seconds)
+LIVE_CLASS_SCHEDULER_MAX_SLEEP = 60
+
+# Students get automatic reminders this many minutes before a class starts; emails go out on this many SMTP connections
+LIVE_CLASS_REMINDER_OFFSETS_MINUTES = [24 * 60, 15]
+LIVE_CLASS_REMINDER_EMAIL_WORKERS = 4
+# A reminder stuck sending this long without progress (its process died) is sent again
+LIVE_CLASS_REMINDER_SENDING_TIMEOUT_MINUTES = 30
+
+# Joining within this many minutes of a class's scheduled start counts as on time in attendance rollups
+LIVE_CLASS_PUNCTUALITY_GRACE_MINUTES = 5
+
+# Processes used to render receipt PDFs in batches (defaults to min(4, CPU count))
+RECEIPT_WORKERS = config('RECEIPT_WORKERS', default=0, cast=int)
+
 JITSI_DOMAIN = 'meet.jit.si'  
 JITSI_APP_ID = None  # Your Jitsi app ID (optional)
 JITSI_APP_SECRET = None
@@ -187,6 +256,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
 ]
+# Browser clients send Idempotency-Key on payment calls
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # CSRF trusted domains (important for forms, login, payments)
 CSRF_TRUSTED_ORIGINS = [
@@ -204,10 +275,10 @@ CSRF_TRUSTED_ORIGINS = [
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST ='smtp.gmail.com',
-EMAIL_PORT = 587,
-EMAIL_USE_TLS =True,
-EMAIL_HOST_USER ='tatasalt431@gmail.com',
+EMAIL_HOST ='smtp.gmail.com'
+EMAIL_PORT = 587
+EMAIL_USE_TLS =True
+EMAIL_HOST_USER ='tatasalt431@gmail.com'
 EMAIL_HOST_PASSWORD ='fubpsexmiwyexpaf'
 
 # Payment Gateway Settings